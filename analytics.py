@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    characters INTEGER NOT NULL,
+    audio_seconds REAL NOT NULL,
+    generation_seconds REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+VISITORS = "visitors"
+
+
+def text_characters(path):
+    """Character count of a transcript file, 0 if it is missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return len(f.read())
+    except OSError:
+        return 0
+
+
+class AnalyticsStore:
+    """Visitor and usage counters plus per-episode stats, in SQLite (WAL).
+
+    Recording only touches memory; a background thread flushes the batch
+    every flush_interval seconds (and at exit) in one transaction. Counters
+    are flushed as increments and sessions with INSERT OR IGNORE, so any
+    number of processes can share the database without losing updates or
+    double-counting a session.
+    """
+
+    def __init__(self, db_path, flush_interval=5.0, legacy_counter_file=None):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._pending_counters = {}
+        self._pending_sessions = {}
+        self._pending_episodes = []
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            if legacy_counter_file:
+                self._migrate_counter_file(conn, legacy_counter_file)
+            self._totals = self._read_totals(conn)
+
+        self._thread = threading.Thread(target=self._run, name="analytics-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _migrate_counter_file(self, conn, path):
+        """Seed the visitor count from the old visitor_counter.json once"""
+        if conn.execute("SELECT 1 FROM counters WHERE name = ?", (VISITORS,)).fetchone():
+            return
+        try:
+            with open(path, 'r') as f:
+                visitors = int(json.load(f).get("visitors", 0))
+        except (OSError, ValueError, AttributeError):
+            visitors = 0
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, ?)", (VISITORS, visitors))
+
+    def _read_totals(self, conn):
+        return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+
+    def record_session(self, session_id):
+        """Count a browser session; repeated calls for one session are free"""
+        with self._lock:
+            self._pending_sessions.setdefault(session_id, time.time())
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._pending_counters[name] = self._pending_counters.get(name, 0) + amount
+
+    def record_episode(self, source, chunks, characters, audio_seconds, generation_seconds):
+        with self._lock:
+            self._pending_episodes.append(
+                (source, chunks, characters, audio_seconds, generation_seconds, time.time())
+            )
+            self._pending_counters[f"episodes_{source}"] = self._pending_counters.get(f"episodes_{source}", 0) + 1
+
+    def counter(self, name):
+        """Value as of the last flush, plus this process's pending increments.
+
+        Never touches the database, so it is safe on every rerun.
+        """
+        with self._lock:
+            value = self._totals.get(name, 0) + self._pending_counters.get(name, 0)
+            if name == VISITORS:
+                # Upper bound until the flush drops sessions already counted
+                value += len(self._pending_sessions)
+            return value
+
+    def visitor_count(self):
+        return self.counter(VISITORS)
+
+    def flush(self):
+        """Write every pending update in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                counters, self._pending_counters = self._pending_counters, {}
+                sessions, self._pending_sessions = self._pending_sessions, {}
+                episodes, self._pending_episodes = self._pending_episodes, []
+
+            try:
+                with self._connect() as conn:
+                    increments = dict(counters)
+                    if sessions:
+                        before = conn.total_changes
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO sessions (session_id, first_seen) VALUES (?, ?)",
+                            sessions.items()
+                        )
+                        new_sessions = conn.total_changes - before
+                        if new_sessions:
+                            increments[VISITORS] = increments.get(VISITORS, 0) + new_sessions
+                    conn.executemany(
+                        "INSERT INTO counters (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                        increments.items()
+                    )
+                    conn.executemany(
+                        "INSERT INTO episodes (source, chunks, characters, audio_seconds, "
+                        "generation_seconds, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        episodes
+                    )
+                    totals = self._read_totals(conn)
+            except sqlite3.Error:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    for name, amount in counters.items():
+                        self._pending_counters[name] = self._pending_counters.get(name, 0) + amount
+                    for session_id, first_seen in sessions.items():
+                        self._pending_sessions.setdefault(session_id, first_seen)
+                    self._pending_episodes[:0] = episodes
+                raise
+
+            with self._lock:
+                self._totals = totals
+
+    def episode_stats(self):
+        """Totals over every recorded episode, grouped by source"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT source, COUNT(*), SUM(chunks), SUM(characters), SUM(audio_seconds), "
+                "SUM(generation_seconds) FROM episodes GROUP BY source"
+            ).fetchall()
+        return {
+            source: {"episodes": count, "chunks": chunks, "characters": characters,
+                     "audio_seconds": audio_seconds, "generation_seconds": generation_seconds}
+            for source, count, chunks, characters, audio_seconds, generation_seconds in rows
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Analytics flush failed: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"Analytics flush failed: {str(e)}")
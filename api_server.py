@@ -0,0 +1,329 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from aiohttp import web
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from audio_utils import StreamEncoder, audio_duration
+from tts_scheduler import SynthesisError
+import audio_encoder
+import enhancer
+import metrics
+import pipeline
+import resources
+
+READ_BLOCK_BYTES = 64 * 1024
+
+_DONE = object()
+
+
+class Backends:
+    """What the handlers talk to: the Vertex model, a PodcastGenerator
+    factory and the LLM cache (None to disable)"""
+
+    def __init__(self, get_model, generator_factory, llm_cache=None, analytics_store=None):
+        self.get_model = get_model
+        self.generator_factory = generator_factory
+        self.llm_cache = llm_cache
+        self.analytics_store = analytics_store
+
+
+BACKENDS = web.AppKey("backends", Backends)
+SLOTS = web.AppKey("slots", asyncio.Semaphore)
+WORK_DIRECTORY = web.AppKey("work_directory", str)
+
+
+def real_backends():
+    return Backends(resources.get_generative_model,
+                    lambda workdir: PodcastGenerator(output_directory=workdir),
+                    resources.get_llm_cache(),
+                    resources.get_analytics())
+
+
+def fake_backends(tts_latency=0.2, llm_latency=0.5):
+    """Local stand-ins so the service can be load tested without credentials"""
+    import fakes
+    from tts_scheduler import TtsScheduler
+
+    model = fakes.FakeGenerativeModel(fakes.make_transcript(40), latency=llm_latency)
+    client = fakes.FakeTextToSpeechClient(latency=tts_latency, latency_jitter=tts_latency / 2)
+    scheduler = TtsScheduler(base_delay=0.05, max_delay=1.0)
+    Config.TTS_CACHE_ENABLED = False
+    return Backends(lambda: model,
+                    lambda workdir: PodcastGenerator(client=client, scheduler=scheduler,
+                                                     output_directory=workdir))
+
+
+async def _iterate(iterator):
+    """Drive a blocking iterator from the default executor, one item per
+    thread hop, so the event loop never waits on Vertex or TTS.
+
+    When the request is cancelled mid-item, the executor thread is still
+    inside the iterator: that next() is waited for before the iterator is
+    closed, so nothing touches the request's files once this has finished.
+    """
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        while True:
+            # Shielded so a cancelled request leaves the future tracking the thread
+            pending = loop.run_in_executor(None, next, iterator, _DONE)
+            item = await asyncio.shield(pending)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        if pending is not None:
+            if not pending.done():
+                await asyncio.wait([pending])
+            if not pending.cancelled():
+                # Its result or error no longer matters
+                pending.exception()
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            # Stops in-flight synthesis when the client goes away
+            close()
+
+
+async def _read_text(request):
+    try:
+        payload = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Request body must be JSON"}),
+                                 content_type="application/json")
+    text = payload.get("text") if isinstance(payload, dict) else None
+    if not isinstance(text, str) or not text.strip():
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Missing \"text\""}),
+                                 content_type="application/json")
+    return payload, text
+
+
+def _error_response(error):
+    status = 400 if isinstance(error, ValueError) else 502 if isinstance(error, SynthesisError) else 500
+    return web.json_response({"error": str(error)}, status=status)
+
+
+async def handle_enhance(request):
+    """POST {"text": ...} -> {"enhanced": ...}; with ?stream=1 the transcript
+    is streamed as plain text, one line at a time"""
+    _, text = await _read_text(request)
+    backends = request.app[BACKENDS]
+    loop = asyncio.get_running_loop()
+
+    async with request.app[SLOTS]:
+        with metrics.span("api_enhance"):
+            model = await loop.run_in_executor(None, backends.get_model)
+            if request.query.get("stream") not in ("1", "true"):
+                try:
+                    enhanced = await loop.run_in_executor(
+                        None, enhancer.enhance_document, model, text, backends.llm_cache)
+                except Exception as e:
+                    return _error_response(e)
+                return web.json_response({"enhanced": enhanced})
+
+            response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+            await response.prepare(request)
+            lines = _iterate(enhancer.stream_enhanced_lines(model, text, backends.llm_cache))
+            try:
+                async for line in lines:
+                    await response.write((line + "\n").encode('utf-8'))
+            finally:
+                await lines.aclose()
+            await response.write_eof()
+            return response
+
+
+async def handle_generate(request):
+    """POST {"text": transcript} -> audio.
+
+    WAV and MP3 output is streamed chunk by chunk as it is synthesized;
+    other formats are sent once encoded. With "enhance": true the text is
+    treated as source material and enhanced on the fly. Nothing outlives the
+    request, so any worker process can serve any request.
+    """
+    payload, text = await _read_text(request)
+    backends = request.app[BACKENDS]
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="request_", dir=request.app[WORK_DIRECTORY])
+    stream = None
+
+    try:
+        async with request.app[SLOTS]:
+            with metrics.span("api_generate"):
+                generator = await loop.run_in_executor(None, backends.generator_factory, workdir)
+                if payload.get("enhance"):
+                    model = await loop.run_in_executor(None, backends.get_model)
+                    segments = pipeline.stream_source_to_podcast(
+                        model, text, generator, "episode", llm_cache=backends.llm_cache)
+                else:
+                    transcript_path = os.path.join(workdir, "transcript.txt")
+                    with open(transcript_path, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                    segments = generator.stream_podcast(transcript_path, "episode")
+
+                stream = _iterate(segments)
+                # Surface errors as a proper status while it can still be sent
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    return web.json_response({"error": "No audio content was generated"}, status=400)
+                except Exception as e:
+                    return _error_response(e)
+
+                file_format = generator.config["file_format"].lower()
+                streamable = generator.mp3_passthrough or file_format == "wav"
+                if streamable:
+                    content_type = generator.chunk_mime_type
+                    filename = f"podcast.{generator.chunk_extension}"
+                else:
+                    content_type = audio_encoder.mime_type(file_format)
+                    filename = audio_encoder.output_path_for("podcast.wav", file_format)
+                response = web.StreamResponse(headers={
+                    "Content-Type": content_type,
+                    "Content-Disposition": f"inline; filename=\"{filename}\"",
+                })
+                await response.prepare(request)
+
+                chunks = 1
+                if streamable:
+                    encoder = StreamEncoder(generator.mp3_passthrough)
+                    await response.write(encoder.body(first.audio_content))
+                    async for segment in stream:
+                        chunks += 1
+                        await response.write(encoder.body(segment.audio_content))
+                else:
+                    async for _ in stream:
+                        chunks += 1
+                    output_path = await asyncio.wrap_future(
+                        generator.encode_episode(generator.get_output_path("episode")))
+                    with open(output_path, 'rb') as f:
+                        while True:
+                            block = await loop.run_in_executor(None, f.read, READ_BLOCK_BYTES)
+                            if not block:
+                                break
+                            await response.write(block)
+
+                await response.write_eof()
+                if backends.analytics_store is not None:
+                    audio_seconds = audio_duration(generator.get_output_path("episode"))
+                    backends.analytics_store.record_episode(
+                        "api", chunks, len(text), audio_seconds, time.perf_counter() - start)
+                return response
+    finally:
+        # Wait for any synthesis still writing into workdir before removing it
+        if stream is not None:
+            await stream.aclose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok", "pid": os.getpid()})
+
+
+async def handle_metrics(request):
+    if not metrics.scrape_allowed(request.remote, request.headers.get("Authorization"), Config.METRICS_TOKEN):
+        raise web.HTTPForbidden()
+    return web.Response(text=metrics.REGISTRY.render_prometheus(),
+                        content_type="text/plain", charset="utf-8")
+
+
+async def handle_preflight(request):
+    return web.Response(status=204)
+
+
+async def _add_cors_headers(request, response):
+    allowed = [origin.strip() for origin in Config.API_CORS_ORIGINS.split(",") if origin.strip()]
+    origin = request.headers.get("Origin")
+    if "*" in allowed:
+        response.headers["Access-Control-Allow-Origin"] = "*"
+    elif origin in allowed:
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Vary"] = "Origin"
+    else:
+        return
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+
+
+async def _create_slots(app):
+    # Requests beyond this wait for a slot instead of oversubscribing TTS.
+    # Created on startup: before Python 3.10 a semaphore binds to the loop
+    # current at construction, and run_app starts a new one.
+    app[SLOTS] = asyncio.Semaphore(Config.API_MAX_CONCURRENT_REQUESTS)
+
+
+def create_app(backends=None):
+    app = web.Application(client_max_size=Config.API_MAX_BODY_BYTES)
+    app[BACKENDS] = backends or real_backends()
+    app[WORK_DIRECTORY] = Config.API_WORK_DIRECTORY
+    os.makedirs(Config.API_WORK_DIRECTORY, exist_ok=True)
+    app.on_startup.append(_create_slots)
+
+    app.router.add_post("/enhance", handle_enhance)
+    app.router.add_post("/generate", handle_generate)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_route("OPTIONS", "/{tail:.*}", handle_preflight)
+    app.on_response_prepare.append(_add_cors_headers)
+    return app
+
+
+def serve(host, port, fake=False, tts_latency=0.2, llm_latency=0.5, workers=1):
+    """Run one of workers worker processes' event loop.
+
+    Workers bind with SO_REUSEPORT so the kernel spreads connections across
+    them, and each one keeps to its share of the TTS quota.
+    """
+    resources.share_tts_quota(workers)
+    if fake:
+        backends = fake_backends(tts_latency, llm_latency)
+    else:
+        backends = real_backends()
+        resources.warm_up()
+    web.run_app(create_app(backends), host=host, port=port, reuse_port=True, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the /enhance and /generate API')
+    parser.add_argument('--host', default=Config.API_HOST)
+    parser.add_argument('--port', type=int, default=Config.API_PORT)
+    parser.add_argument('--workers', type=int, default=Config.API_WORKERS, help='Worker processes')
+    parser.add_argument('--config', help='Path to configuration file (JSON or .env format)')
+    parser.add_argument('--fake-backends', action='store_true',
+                        help='Use local fake Vertex and TTS backends (for load testing)')
+    parser.add_argument('--fake-tts-latency', type=float, default=0.2)
+    parser.add_argument('--fake-llm-latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.config:
+        Config.load_file(args.config)
+
+    options = (args.host, args.port, args.fake_backends, args.fake_tts_latency, args.fake_llm_latency,
+               max(1, args.workers))
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    if args.workers <= 1:
+        serve(*options)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=serve, args=options, daemon=True) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
+import json
 import os
 
 # Load environment variables
@@ -10,6 +11,9 @@ class Config:
     VERTEX_PROJECT = os.getenv('VERTEX_PROJECT')
     VERTEX_LOCATION = os.getenv('VERTEX_LOCATION', 'us-central1')
     VERTEX_MODEL = os.getenv('VERTEX_MODEL', 'gemini-1.5-pro-002')
+    # Imported in the background by resources.warm_up, before the first
+    # request needs them (PDF and URL libraries are left to first use)
+    WARM_UP_MODULES = os.getenv('WARM_UP_MODULES', 'vertexai,google.cloud.texttospeech_v1beta1,audio_postprocess')
 
     # Text-to-Speech settings
     TTS_LANGUAGE_CODE = os.getenv('TTS_LANGUAGE_CODE', 'en-US')
@@ -21,6 +25,110 @@ class Config:
     TTS_GUEST_SPEAKER = os.getenv('TTS_GUEST_SPEAKER', 'R')
     TTS_OUTPUT_DIRECTORY = os.getenv('TTS_OUTPUT_DIRECTORY', 'output')
     TTS_FILE_FORMAT = os.getenv('TTS_FILE_FORMAT', 'wav')
+    TTS_AUDIO_BITRATE = os.getenv('TTS_AUDIO_BITRATE', '32k')
+    # ffmpeg processes encoding episodes at once
+    TTS_ENCODER_PROCESSES = int(os.getenv('TTS_ENCODER_PROCESSES', '2'))
+    # For mp3 output, request MP3 from the TTS API and join frames directly
+    TTS_MP3_PASSTHROUGH = os.getenv('TTS_MP3_PASSTHROUGH', 'true').lower() == 'true'
+    TTS_MAX_CONCURRENCY = int(os.getenv('TTS_MAX_CONCURRENCY', '4'))
+    # Per-request input budget, kept below the service's 5000-byte limit
+    TTS_MAX_REQUEST_BYTES = int(os.getenv('TTS_MAX_REQUEST_BYTES', '4500'))
+    # Budget of an episode's first request; later ones double up to the
+    # maximum, so the first audio is ready early (0 packs every request full)
+    TTS_FIRST_REQUEST_BYTES = int(os.getenv('TTS_FIRST_REQUEST_BYTES', '500'))
+
+    # Post-processing of LINEAR16 episodes (0 turns a step off)
+    AUDIO_POSTPROCESS = os.getenv('AUDIO_POSTPROCESS', 'true').lower() == 'true'
+    AUDIO_CROSSFADE_MS = int(os.getenv('AUDIO_CROSSFADE_MS', '10'))
+    # Silence between consecutive TTS chunks, not between every turn: turns
+    # inside one chunk keep the pauses TTS put there
+    AUDIO_SEAM_GAP_MS = int(os.getenv('AUDIO_SEAM_GAP_MS', '150'))
+    AUDIO_TRIM_SILENCE_DB = float(os.getenv('AUDIO_TRIM_SILENCE_DB', '-50'))
+    AUDIO_TRIM_PAD_MS = int(os.getenv('AUDIO_TRIM_PAD_MS', '40'))
+    # Applied to the combined episode after any TTS_VOLUME_GAIN_DB. Parts
+    # played while the episode is synthesized are never normalized
+    AUDIO_TARGET_LOUDNESS_DB = float(os.getenv('AUDIO_TARGET_LOUDNESS_DB', '-18'))
+    AUDIO_PEAK_CEILING_DB = float(os.getenv('AUDIO_PEAK_CEILING_DB', '-1'))
+
+    # Text-to-Speech quota (0 disables a limit) and retries of quota and
+    # transient errors
+    TTS_REQUESTS_PER_MINUTE = int(os.getenv('TTS_REQUESTS_PER_MINUTE', '500'))
+    TTS_CHARACTERS_PER_MINUTE = int(os.getenv('TTS_CHARACTERS_PER_MINUTE', '150000'))
+    TTS_MAX_RETRIES = int(os.getenv('TTS_MAX_RETRIES', '5'))
+    TTS_RETRY_BASE_DELAY = float(os.getenv('TTS_RETRY_BASE_DELAY', '1.0'))
+    TTS_RETRY_MAX_DELAY = float(os.getenv('TTS_RETRY_MAX_DELAY', '32.0'))
+
+    # Synthesized audio cache
+    TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+    TTS_CACHE_DIRECTORY = os.getenv('TTS_CACHE_DIRECTORY', os.path.join('cache', 'tts'))
+    TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+    # Shared cache for LLM enhancements and extracted URL content
+    CONTENT_CACHE_DATABASE = os.getenv('CONTENT_CACHE_DATABASE', os.path.join('cache', 'content.sqlite3'))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    URL_CACHE_TTL_SECONDS = int(os.getenv('URL_CACHE_TTL_SECONDS', '3600'))
+    URL_CACHE_MAX_BYTES = int(os.getenv('URL_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    URL_FETCH_TIMEOUT = float(os.getenv('URL_FETCH_TIMEOUT', '15'))
+    URL_CONNECT_TIMEOUT = float(os.getenv('URL_CONNECT_TIMEOUT', '5'))
+    URL_MAX_BYTES = int(os.getenv('URL_MAX_BYTES', str(5 * 1024 * 1024)))
+    URL_FETCH_MAX_CONCURRENCY = int(os.getenv('URL_FETCH_MAX_CONCURRENCY', '8'))
+    URL_FETCH_PER_HOST = int(os.getenv('URL_FETCH_PER_HOST', '2'))
+    URL_PARSE_WORKERS = int(os.getenv('URL_PARSE_WORKERS', '2'))
+    URL_FETCH_USER_AGENT = os.getenv('URL_FETCH_USER_AGENT', 'Mozilla/5.0 (compatible; PodcastGenerator/1.0)')
+
+    # PDF extraction
+    PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '500'))
+    PDF_MAX_CHARS = int(os.getenv('PDF_MAX_CHARS', '2000000'))
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(os.cpu_count() or 1)))
+    PDF_CACHE_TTL_SECONDS = int(os.getenv('PDF_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+
+    # Background generation jobs
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '2'))
+    JOB_DIRECTORY = os.getenv('JOB_DIRECTORY', os.path.join(TTS_OUTPUT_DIRECTORY, 'jobs'))
+    # Finished jobs are deleted, workdir and all, once older than this many
+    # seconds or beyond the newest JOB_RETENTION_COUNT; 0 turns a limit off
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(24 * 3600)))
+    JOB_RETENTION_COUNT = int(os.getenv('JOB_RETENTION_COUNT', '100'))
+    # Databases live outside TTS_OUTPUT_DIRECTORY, which holds served audio
+    STATE_DIRECTORY = os.getenv('STATE_DIRECTORY', 'state')
+    JOB_DATABASE = os.getenv('JOB_DATABASE', os.path.join(STATE_DIRECTORY, 'jobs.sqlite3'))
+
+    # Usage analytics (visitor sessions, per-episode stats)
+    ANALYTICS_DATABASE = os.getenv('ANALYTICS_DATABASE', os.path.join(STATE_DIRECTORY, 'analytics.sqlite3'))
+    ANALYTICS_FLUSH_SECONDS = float(os.getenv('ANALYTICS_FLUSH_SECONDS', '5'))
+    # Pre-SQLite visitor counter, imported once
+    VISITOR_COUNTER_FILE = os.getenv('VISITOR_COUNTER_FILE', 'visitor_counter.json')
+
+    # Batch rendering (python app_generic.py --batch)
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '2'))
+
+    # Headless API (python api_server.py); index.html expects port 5000
+    API_HOST = os.getenv('API_HOST', '0.0.0.0')
+    API_PORT = int(os.getenv('API_PORT', '5000'))
+    API_WORKERS = int(os.getenv('API_WORKERS', '2'))
+    API_MAX_CONCURRENT_REQUESTS = int(os.getenv('API_MAX_CONCURRENT_REQUESTS', '8'))
+    API_MAX_BODY_BYTES = int(os.getenv('API_MAX_BODY_BYTES', str(4 * 1024 * 1024)))
+    API_CORS_ORIGINS = os.getenv('API_CORS_ORIGINS', '*')
+    API_WORK_DIRECTORY = os.getenv('API_WORK_DIRECTORY', os.path.join(TTS_OUTPUT_DIRECTORY, 'api'))
+
+    # Episode file server (serves generated audio with HTTP Range support,
+    # and the UI process's /metrics). It always runs, but browsers only use
+    # it for episodes when EPISODE_PUBLIC_URL says where they reach it,
+    # e.g. http://localhost:8502 locally or a proxied route in production.
+    # Without a public URL, episodes are published to EPISODE_STATIC_DIRECTORY
+    # and sent by Streamlit's static file serving (server.enableStaticServing,
+    # files up to 200 MB) at EPISODE_STATIC_URL, relative to the page; the
+    # directory must be static/ next to app_ui.py.
+    EPISODE_SERVER_HOST = os.getenv('EPISODE_SERVER_HOST', '0.0.0.0')
+    EPISODE_SERVER_PORT = int(os.getenv('EPISODE_SERVER_PORT', '8502'))
+    EPISODE_PUBLIC_URL = os.getenv('EPISODE_PUBLIC_URL', '')
+    EPISODE_STATIC_DIRECTORY = os.getenv('EPISODE_STATIC_DIRECTORY', os.path.join('static', 'episodes'))
+    EPISODE_STATIC_URL = os.getenv('EPISODE_STATIC_URL', 'app/static/episodes')
+
+    # /metrics answers loopback clients, and others presenting this bearer token
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 
     # Speaker Names and Personalities
     SPEAKER_1_NAME = os.getenv('SPEAKER_1_NAME', 'Alex')
@@ -36,9 +144,15 @@ class Config:
     TOP_K = int(os.getenv('TOP_K', '40'))
     TOP_P = float(os.getenv('TOP_P', '0.8'))
 
+    # Long documents are enhanced in sections of at most this many tokens
+    LONG_DOC_SECTION_TOKENS = int(os.getenv('LONG_DOC_SECTION_TOKENS', '6000'))
+    ENHANCE_MAX_CONCURRENCY = int(os.getenv('ENHANCE_MAX_CONCURRENCY', '4'))
+
     # Speaker Configuration
     SPEAKER_1_VOICE = os.getenv('SPEAKER_1_VOICE', 'S')
     SPEAKER_2_VOICE = os.getenv('SPEAKER_2_VOICE', 'R')
+    # Further speakers as "Name=Voice,Name=Voice" (e.g. "Sam=T,Priya=U")
+    SPEAKER_VOICES = os.getenv('SPEAKER_VOICES', '')
 
     # Conversation Structure
     OPENING_WORDS_MIN = int(os.getenv('OPENING_WORDS_MIN', '30'))
@@ -83,9 +197,49 @@ class Config:
             'TTS_PITCH',
             'TTS_VOLUME_GAIN_DB',
             'TTS_OUTPUT_DIRECTORY',
-            'TTS_FILE_FORMAT'
+            'TTS_FILE_FORMAT',
+            'TTS_MAX_CONCURRENCY',
+            'TTS_MAX_REQUEST_BYTES'
         ]
         
         missing = [var for var in required_vars if not getattr(cls, var)]
         if missing:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
\ No newline at end of file
+            raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
+
+    @classmethod
+    def load_file(cls, path):
+        """Override settings from a JSON object or a dotenv-style file.
+
+        Values are coerced to the type of the existing setting and exported
+        to the environment, so worker processes started afterwards see them.
+        """
+        if path.lower().endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                values = json.load(f)
+            if not isinstance(values, dict):
+                raise ValueError(f"Configuration file must contain a JSON object: {path}")
+        else:
+            values = dotenv_values(path)
+
+        for name, value in values.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = 'true' if value else 'false'
+            os.environ[name] = str(value)
+            if name.isupper() and hasattr(cls, name):
+                setattr(cls, name, cls._coerce(name, value))
+
+    @classmethod
+    def _coerce(cls, name, value):
+        current = getattr(cls, name)
+        try:
+            if isinstance(current, bool):
+                return str(value).lower() == 'true'
+            if isinstance(current, int):
+                return int(value)
+            if isinstance(current, float):
+                return float(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value!r}")
+        return str(value)
@@ -1,14 +1,34 @@
-from google.cloud import texttospeech_v1beta1
 import os
 import argparse
 import json
 from datetime import datetime
 from app_config import Config
+from tts_cache import make_cache_key
+from tts_scheduler import SynthesisError
+import resources
+import metrics
+from chunk_planner import iter_chunks
+from episode_index import EpisodeIndex, index_path, plan_incremental
+from transcript_parser import TranscriptParser
 import io
-from pydub import AudioSegment
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from audio_utils import Mp3Assembler, WavAssembler, find_mp3_start
+import audio_encoder
+
+class PodcastSegment:
+    """A synthesized chunk of the episode, delivered in transcript order"""
+
+    def __init__(self, index, count, audio_content, path, mime_type):
+        self.index = index
+        self.count = count
+        self.audio_content = audio_content
+        self.path = path
+        self.mime_type = mime_type
 
 class PodcastGenerator:
-    def __init__(self):
+    def __init__(self, client=None, max_concurrency=None, cache=None, output_directory=None,
+                 scheduler=None):
         Config.validate_config()
         
         self.config = {
@@ -17,78 +37,42 @@ class PodcastGenerator:
             "speaking_rate": Config.TTS_SPEAKING_RATE,
             "pitch": Config.TTS_PITCH,
             "volume_gain_db": Config.TTS_VOLUME_GAIN_DB,
-            "output_directory": Config.TTS_OUTPUT_DIRECTORY,
-            "file_format": Config.TTS_FILE_FORMAT
+            "output_directory": output_directory or Config.TTS_OUTPUT_DIRECTORY,
+            "file_format": Config.TTS_FILE_FORMAT,
+            "bitrate": Config.TTS_AUDIO_BITRATE,
+            "encoder_processes": Config.TTS_ENCODER_PROCESSES,
+            "max_concurrency": max_concurrency or Config.TTS_MAX_CONCURRENCY,
+            "max_request_bytes": Config.TTS_MAX_REQUEST_BYTES,
+            "first_request_bytes": Config.TTS_FIRST_REQUEST_BYTES
         }
+        # MP3 output can skip the PCM decode/encode cycle entirely
+        self.mp3_passthrough = (
+            Config.TTS_MP3_PASSTHROUGH and self.config["file_format"].lower() == "mp3"
+        )
+        self.chunk_extension = "mp3" if self.mp3_passthrough else "wav"
+        self.chunk_mime_type = "audio/mpeg" if self.mp3_passthrough else "audio/wav"
         
         os.makedirs(self.config["output_directory"], exist_ok=True)
-        self.client = texttospeech_v1beta1.TextToSpeechClient()
+        # Any object with a compatible synthesize_speech() can be plugged in,
+        # e.g. fakes.FakeTextToSpeechClient for offline runs; by default the
+        # process-wide client and its gRPC channel are reused
+        self.client = client or resources.get_tts_client()
+        self.cache = cache if cache is not None else resources.get_audio_cache()
+        self.scheduler = scheduler or resources.get_tts_scheduler()
+        self.parser = TranscriptParser()
 
+    @metrics.timed("episode")
     def create_podcast(self, input_file, output_filename=None):
         """Generate podcast from input transcript file"""
         try:
-            if not os.path.exists(input_file):
-                raise FileNotFoundError(f"Input file not found: {input_file}")
-
-            # Read all lines from the file
-            with open(input_file, 'r', encoding='utf-8') as file:
-                all_lines = [line.strip() for line in file.readlines() if line.strip()]
-
             # Generate base filename if not provided
             if not output_filename:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 output_filename = f"podcast_{timestamp}"
 
-            # Process in smaller chunks (5 lines per chunk)
-            chunk_size = 5
-            chunks = [all_lines[i:i + chunk_size] for i in range(0, len(all_lines), chunk_size)]
-            chunk_paths = []
-
-            # Generate audio for each chunk
-            for i, chunk_lines in enumerate(chunks):
-                print(f"Processing chunk {i + 1}/{len(chunks)}")
-                
-                multi_speaker_markup = texttospeech_v1beta1.MultiSpeakerMarkup()
-                for line in chunk_lines:
-                    turn = self._process_line(line)
-                    if turn:
-                        multi_speaker_markup.turns.append(turn)
-
-                if multi_speaker_markup.turns:
-                    audio_content = self.generate_audio_chunk(multi_speaker_markup)
-                    if audio_content:
-                        # Save individual chunk
-                        chunk_filename = f"{output_filename}_chunk_{i+1}.wav"
-                        chunk_path = os.path.join(self.config["output_directory"], chunk_filename)
-                        with open(chunk_path, 'wb') as f:
-                            f.write(audio_content)
-                        chunk_paths.append(chunk_path)
-                        print(f"Generated audio for chunk {i + 1} - Size: {len(audio_content)} bytes")
-                        print(f"Saved chunk file: {chunk_filename}")
-                    else:
-                        print(f"Failed to generate audio for chunk {i + 1}")
-                else:
-                    print(f"No valid turns in chunk {i + 1}")
-
-            if not chunk_paths:
-                raise ValueError("No audio content was generated")
-
-            # Combine chunks using pydub
-            print(f"\nCombining {len(chunk_paths)} chunks...")
-            combined_filename = f"{output_filename}_combined.wav"
-            combined_path = os.path.join(self.config["output_directory"], combined_filename)
-            
-            # Combine audio files
-            combined = AudioSegment.empty()
-            for i, chunk_path in enumerate(chunk_paths, 1):
-                print(f"Adding chunk {i} to combined audio: {os.path.basename(chunk_path)}")
-                audio = AudioSegment.from_wav(chunk_path)
-                combined += audio
-
-            # Export combined file
-            print(f"Exporting combined file to: {combined_filename}")
-            combined.export(combined_path, format="wav")
-            
+            chunk_paths = [segment.path for segment in self.stream_podcast(input_file, output_filename)]
+            combined_path = self.get_output_path(output_filename)
+
             # Verify file sizes
             print("\nFile size verification:")
             total_chunk_size = 0
@@ -101,94 +85,352 @@ class PodcastGenerator:
             print(f"Total chunks size: {total_chunk_size} bytes")
             print(f"Combined file size: {final_size} bytes")
             print(f"Combined file path: {combined_path}")
+            if self.cache is not None:
+                stats = self.cache.stats()
+                print(f"Audio cache: {stats['hits']} hits, {stats['misses']} misses")
+            stats = self.scheduler.stats()
+            print(f"TTS scheduler: {stats['retries']} retries, "
+                  f"{stats['throttled_seconds']:.1f}s waiting for quota")
 
-            return combined_path
+            output_path = self.encode_episode(combined_path).result()
+            if output_path != combined_path:
+                print(f"Encoded {self.config['file_format']} file: {output_path} "
+                      f"({os.path.getsize(output_path)} bytes)")
+            return output_path
 
         except Exception as e:
             print(f"Error during podcast generation: {str(e)}")
             raise
 
-    def _process_line(self, line):
-        if not line or line.startswith("(") or line.startswith("["):
-            return None
+    def stream_podcast(self, input_file, output_filename, checkpoint=None, transcript=None,
+                       previous_index=None):
+        """Yield a PodcastSegment for each chunk as soon as it and every
+        earlier chunk are synthesized.
 
-        if ': ' in line:
-            speaker, text = line.split(': ', 1)
-            turn = texttospeech_v1beta1.MultiSpeakerMarkup.Turn()
-            
-            if speaker.lower() == Config.SPEAKER_1_NAME.lower():
-                turn.speaker = Config.SPEAKER_1_VOICE
-                turn.text = text.strip()
-                print(f"Processed {Config.SPEAKER_1_NAME}'s line: {text[:50]}...")
-            elif speaker.lower() == Config.SPEAKER_2_NAME.lower():
-                turn.speaker = Config.SPEAKER_2_VOICE
-                turn.text = text.strip()
-                print(f"Processed {Config.SPEAKER_2_NAME}'s line: {text[:50]}...")
-            else:
-                print(f"Unknown speaker: {speaker}")
-                return None
-            
-            return turn
-        return None
+        The combined file and its episode index are complete once the
+        generator is exhausted. With a checkpoint (see
+        batch_runner.EpisodeCheckpoint), chunks finished by an earlier run are
+        read back from disk instead of being synthesized. A transcript already
+        parsed from input_file is used as is.
 
-    def generate_audio_chunk(self, multi_speaker_markup):
-        """Generate audio for a chunk of conversation"""
-        try:
-            synthesis_input = texttospeech_v1beta1.SynthesisInput(
-                multi_speaker_markup=multi_speaker_markup
-            )
+        If an earlier render left an index (at previous_index, or this
+        output's own), only the chunks whose turns were edited are
+        synthesized again and the rest reuse their audio.
+        """
+        previous = EpisodeIndex.load(previous_index or self.get_index_path(output_filename))
+        if transcript is not None:
+            plan = self.plan_transcript(transcript, previous)
+        elif not os.path.exists(input_file):
+            raise FileNotFoundError(f"Input file not found: {input_file}")
+        else:
+            plan = self.plan_podcast(input_file, previous)
+        print(f"Transcript: {plan.transcript.summary()}")
+        print(f"Chunk plan: {plan.summary()}")
+        reused = sum(1 for chunk in plan.chunks if chunk.audio_path)
+        if reused:
+            print(f"Reusing {reused}/{plan.request_count} chunks from the previous render")
+        yield from self._stream_chunks(plan.chunks, output_filename, plan.request_count, checkpoint, previous)
 
-            voice = texttospeech_v1beta1.VoiceSelectionParams(
-                language_code=self.config["language_code"],
-                name=self.config["voice_name"]
-            )
+    def stream_podcast_from_lines(self, lines, output_filename):
+        """Like stream_podcast, but for transcript lines that are still being
+        produced (e.g. streamed from the LLM).
 
-            audio_config = texttospeech_v1beta1.AudioConfig(
-                audio_encoding=texttospeech_v1beta1.AudioEncoding.LINEAR16,
-                speaking_rate=self.config["speaking_rate"],
-                pitch=self.config["pitch"],
-                volume_gain_db=self.config["volume_gain_db"]
+        Each chunk is sent to TTS as soon as it is full, while later lines are
+        still arriving; the first one is cut at first_request_bytes, so TTS
+        starts after a few turns rather than a full request's worth. Segment
+        counts are unknown up front and reported as None.
+        """
+        chunks = iter_chunks(self.parser.iter_turns(lines), self.config["max_request_bytes"],
+                             self.config["first_request_bytes"])
+        yield from self._stream_chunks(chunks, output_filename, None)
+
+    def _stream_chunks(self, chunks, output_filename, count, checkpoint=None, previous=None):
+        combined_path = self.get_output_path(output_filename)
+        index = EpisodeIndex(None, self._cache_key([]))
+        generated = 0
+        total = count or "?"
+
+        # Generate audio for each chunk, keeping up to max_concurrency
+        # requests in flight; results come back in transcript order and
+        # their samples are streamed straight into the combined file
+        # A chunk that cannot be synthesized fails the whole episode rather
+        # than leaving a gap in it
+        with self._open_assembler(combined_path) as assembler:
+            try:
+                for i, (chunk, audio_content) in enumerate(self._synthesize_chunks(chunks, checkpoint)):
+                    # Chunk files are named by content, so a regeneration
+                    # never overwrites audio that a later chunk still reuses
+                    key = self._cache_key(chunk.turns)
+                    chunk_filename = f"{output_filename}_chunk_{key[:16]}.{self.chunk_extension}"
+                    chunk_path = os.path.join(self.config["output_directory"], chunk_filename)
+                    with metrics.span("combine"):
+                        if not os.path.isfile(chunk_path):
+                            self._write_chunk_file(chunk_path, audio_content)
+                        assembler.append(audio_content)
+                    index.add_chunk(key, chunk_path, chunk)
+                    if chunk.audio_path:
+                        index.reused += 1
+                    if checkpoint is not None:
+                        checkpoint.record(key, chunk_path)
+                    generated += 1
+                    print(f"Saved chunk {i + 1}/{total}: {chunk_filename} ({len(audio_content)} bytes)")
+                    yield PodcastSegment(i, count, audio_content, chunk_path, self.chunk_mime_type)
+            except SynthesisError as e:
+                raise SynthesisError(f"Chunk {generated + 1}/{total} failed: {e}") from e
+
+        if not generated:
+            os.remove(combined_path)
+            raise ValueError("No audio content was generated")
+
+        # Spans are final only once the assembler has committed every seam
+        index.set_spans(assembler.chunk_spans)
+        index.sample_rate = assembler.sample_rate
+        index.save(self.get_index_path(output_filename))
+        if previous is not None:
+            self._remove_replaced_chunks(previous, index, output_filename)
+
+    def _write_chunk_file(self, path, audio_content):
+        # Renamed into place so a crash never leaves a truncated chunk under
+        # a name that later runs trust
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(audio_content)
+        os.replace(temporary_path, path)
+
+    def _remove_replaced_chunks(self, previous, index, output_filename):
+        """Delete this output's chunk files that only the previous render used"""
+        kept = {chunk.path for chunk in index.chunks}
+        prefix = os.path.join(self.config["output_directory"], f"{output_filename}_chunk_")
+        for chunk in previous.chunks:
+            if chunk.path not in kept and chunk.path.startswith(prefix):
+                try:
+                    os.remove(chunk.path)
+                except OSError:
+                    pass
+
+    def _open_assembler(self, combined_path):
+        if self.mp3_passthrough:
+            return Mp3Assembler(combined_path)
+        if not Config.AUDIO_POSTPROCESS:
+            return WavAssembler(combined_path)
+        from audio_postprocess import ProcessedWavAssembler
+
+        # Seams, silences and loudness are fixed up in the combined file; the
+        # chunk files and streamed segments stay as TTS returned them
+        return ProcessedWavAssembler(
+            combined_path,
+            crossfade_ms=Config.AUDIO_CROSSFADE_MS,
+            gap_ms=Config.AUDIO_SEAM_GAP_MS,
+            trim_db=Config.AUDIO_TRIM_SILENCE_DB,
+            trim_pad_ms=Config.AUDIO_TRIM_PAD_MS,
+            target_db=Config.AUDIO_TARGET_LOUDNESS_DB,
+            peak_ceiling_db=Config.AUDIO_PEAK_CEILING_DB
+        )
+
+    def _build_markup(self, chunk):
+        from google.cloud import texttospeech_v1beta1
+
+        multi_speaker_markup = texttospeech_v1beta1.MultiSpeakerMarkup()
+        for speaker, text in chunk.turns:
+            multi_speaker_markup.turns.append(
+                texttospeech_v1beta1.MultiSpeakerMarkup.Turn(speaker=speaker, text=text)
             )
+        return multi_speaker_markup
+
+    def get_index_path(self, output_filename):
+        """Path of the episode index (see episode_index) for a base output filename"""
+        return index_path(self.config["output_directory"], output_filename)
+
+    def get_output_path(self, output_filename):
+        """Path of the combined episode for a base output filename"""
+        return os.path.join(self.config["output_directory"],
+                            f"{output_filename}_combined.{self.chunk_extension}")
 
-            response = self.client.synthesize_speech(
+    def encode_episode(self, wav_path):
+        """Encode the combined WAV to the configured output format.
+
+        ffmpeg runs from a shared thread pool; the returned Future resolves
+        to the encoded file's path (wav_path itself for WAV output or when
+        MP3 is already assembled from the TTS response).
+        """
+        if self.mp3_passthrough:
+            future = Future()
+            future.set_result(wav_path)
+            return future
+        return metrics.observe_future(audio_encoder.encode_async(
+            wav_path,
+            self.config["file_format"],
+            self.config["bitrate"],
+            self.config["encoder_processes"]
+        ), "export")
+
+    @metrics.timed("plan")
+    def plan_podcast(self, input_file, previous=None):
+        """Pack the transcript's turns into synthesis requests without calling TTS"""
+        return self.plan_transcript(self.parser.parse_file(input_file), previous)
+
+    def plan_transcript(self, transcript, previous=None):
+        """ChunkPlan for an already parsed transcript_parser.Transcript.
+
+        previous is the EpisodeIndex of an earlier render; chunks it already
+        has audio for keep their boundaries and are not synthesized again.
+        """
+        plan = plan_incremental(transcript.turns, self.config["max_request_bytes"], previous,
+                                self._cache_key([]), self.config["first_request_bytes"])
+        plan.transcript = transcript
+        return plan
+
+    def _synthesize_chunks(self, chunks, checkpoint=None):
+        """Synthesize chunks concurrently, yielding (chunk, audio) pairs in
+        input order.
+
+        chunks may be a lazy iterator; at most max_concurrency requests are
+        in flight and each is submitted as soon as its chunk is available.
+        """
+        max_workers = max(1, self.config["max_concurrency"])
+        if max_workers == 1:
+            for chunk in chunks:
+                yield chunk, self.generate_audio_chunk(chunk, checkpoint)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append((chunk, executor.submit(self.generate_audio_chunk, chunk, checkpoint)))
+                # Hand back finished results early, and block on the oldest
+                # request once the window is full
+                while pending and (pending[0][1].done() or len(pending) >= max_workers):
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        finally:
+            # Don't keep synthesizing if the consumer stopped early
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cache_key(self, turns):
+        return make_cache_key(turns, {
+            "language_code": self.config["language_code"],
+            "voice_name": self.config["voice_name"],
+            "speaking_rate": self.config["speaking_rate"],
+            "pitch": self.config["pitch"],
+            "volume_gain_db": self.config["volume_gain_db"],
+            # Same names as AudioEncoding, without importing the TTS SDK
+            "audio_encoding": "MP3" if self.mp3_passthrough else "LINEAR16",
+        })
+
+    def _audio_encoding(self):
+        from google.cloud import texttospeech_v1beta1
+
+        if self.mp3_passthrough:
+            return texttospeech_v1beta1.AudioEncoding.MP3
+        return texttospeech_v1beta1.AudioEncoding.LINEAR16
+
+    def generate_audio_chunk(self, chunk, checkpoint=None):
+        """Generate audio for a chunk of conversation (a chunk_planner.PlannedChunk)"""
+        if chunk.audio_path:
+            # Unchanged since the previous render of this episode
+            try:
+                with open(chunk.audio_path, 'rb') as f:
+                    audio_content = f.read()
+                metrics.CACHE_REQUESTS.inc(cache="episode", result="hit")
+                return audio_content
+            except OSError:
+                metrics.CACHE_REQUESTS.inc(cache="episode", result="miss")
+
+        cache_key = None
+        if checkpoint is not None:
+            cache_key = self._cache_key(chunk.turns)
+            resumed = checkpoint.load(cache_key)
+            if resumed:
+                return resumed
+
+        if self.cache is not None:
+            cache_key = cache_key or self._cache_key(chunk.turns)
+            cached = self.cache.get(cache_key)
+            if cached:
+                return cached
+
+        # The request protobuf is only built for chunks that need synthesis
+        from google.cloud import texttospeech_v1beta1
+
+        synthesis_input = texttospeech_v1beta1.SynthesisInput(
+            multi_speaker_markup=self._build_markup(chunk)
+        )
+
+        voice = texttospeech_v1beta1.VoiceSelectionParams(
+            language_code=self.config["language_code"],
+            name=self.config["voice_name"]
+        )
+
+        audio_config = texttospeech_v1beta1.AudioConfig(
+            audio_encoding=self._audio_encoding(),
+            speaking_rate=self.config["speaking_rate"],
+            pitch=self.config["pitch"],
+            volume_gain_db=self.config["volume_gain_db"]
+        )
+
+        # Retries quota and transient errors; raises SynthesisError for
+        # anything that still fails
+        characters = sum(len(text) for _, text in chunk.turns)
+        with metrics.span("tts_chunk"):
+            response = self.scheduler.synthesize(
+                self.client,
+                characters,
                 input=synthesis_input,
                 voice=voice,
                 audio_config=audio_config
             )
 
             if not response.audio_content:
-                print("No audio content in response")
-                return None
+                raise SynthesisError("No audio content in response")
+        metrics.TTS_INPUT_CHARACTERS.inc(characters)
+        metrics.TTS_AUDIO_BYTES.inc(len(response.audio_content))
 
-            return response.audio_content
+        if self.cache is not None:
+            self.cache.put(cache_key, response.audio_content)
 
-        except Exception as e:
-            print(f"Error generating audio chunk: {str(e)}")
-            return None
+        return response.audio_content
 
     def _find_mp3_start(self, data):
-        if data.startswith(b'ID3'):
-            size = ((data[6] & 0x7f) << 21) | ((data[7] & 0x7f) << 14) | \
-                   ((data[8] & 0x7f) << 7) | (data[9] & 0x7f)
-            start = 10 + size
-        else:
-            start = 0
-
-        for i in range(start, len(data) - 1):
-            if data[i] == 0xFF and data[i+1] & 0xE0 == 0xE0:
-                return i
-
-        return -1
+        return find_mp3_start(data)
 
 def main():
     parser = argparse.ArgumentParser(description='Generate podcast from transcript')
-    parser.add_argument('input_file', help='Path to input transcript file')
-    parser.add_argument('--config', help='Path to configuration file')
+    parser.add_argument('input_file', nargs='?', help='Path to input transcript file')
+    parser.add_argument('--config', help='Path to configuration file (JSON or .env format)')
     parser.add_argument('--output', help='Output filename')
+    parser.add_argument('--batch', metavar='PATH',
+                        help='Render every transcript in a directory or manifest file')
+    parser.add_argument('--workers', type=int, help='Worker processes for --batch')
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help='Write stage latencies and counters as JSON ("-" for stdout)')
     args = parser.parse_args()
 
+    if bool(args.input_file) == bool(args.batch):
+        parser.error('pass either an input file or --batch')
+    if args.config:
+        Config.load_file(args.config)
+
+    if args.batch:
+        # Imported here because batch_runner builds on this module
+        import batch_runner
+        summary = batch_runner.run_batch(args.batch, args.workers)
+        print(summary.report())
+        if args.metrics_json:
+            metrics.write_report(args.metrics_json)
+        if summary.failed:
+            raise SystemExit(1)
+        return
+
     generator = PodcastGenerator()
-    output_path = generator.create_podcast(args.input_file, args.output)
+    try:
+        output_path = generator.create_podcast(args.input_file, args.output)
+    finally:
+        if args.metrics_json:
+            metrics.write_report(args.metrics_json)
     print(f"Podcast saved as: {output_path}")
 
 if __name__ == "__main__":
@@ -1,153 +1,139 @@
 import streamlit as st
-from app_generic import PodcastGenerator
+import streamlit.components.v1 as components
+import audio_encoder
+import content_sources
+import enhancer
+import episode_index
+import episode_server
+import job_queue
+import pdf_extract
+import resources
+import transcript_parser
+import json
 import os
-import base64
-from google.cloud import aiplatform
-import vertexai
-from vertexai.preview.generative_models import GenerativeModel
-import requests
+import uuid
 from urllib.parse import urlparse
-from newspaper import Article
-import PyPDF2
 from app_config import Config
-import json
-from pathlib import Path
 
 def setup_vertex():
-    """Initialize Vertex AI"""
+    """Get the process-wide Vertex AI model"""
     try:
-        vertexai.init(
-            project=Config.VERTEX_PROJECT,
-            location=Config.VERTEX_LOCATION
-        )
-        model = GenerativeModel(Config.VERTEX_MODEL)
-        return model
+        return resources.get_generative_model()
     except Exception as e:
         st.error(f"Error initializing Vertex AI: {str(e)}")
         return None
 
+def get_model():
+    """Vertex AI model for enhancement, fetched when content is first
+    enhanced rather than on every page load; stops the run if it fails"""
+    model = setup_vertex()
+    if model is None:
+        st.error("Failed to initialize Vertex AI. Please check your credentials.")
+        st.stop()
+    return model
+
 def enhance_transcript(model, transcript_text):
     """Enhance the transcript using Vertex AI"""
-    prompt = """
-Create a natural, engaging podcast conversation between two hosts - discussing the content from [INSERT URL]. The conversation should include:
-HOSTS' PERSONALITIES:
-
-{Config.SPEAKER_1_NAME}: {Config.SPEAKER_1_PERSONALITY}
-{Config.SPEAKER_2_NAME}: {Config.SPEAKER_2_PERSONALITY}
-
-CONVERSATION STRUCTURE:
-
-Opening banter ({Config.OPENING_WORDS_MIN}-{Config.OPENING_WORDS_MAX} words)
-- High-energy greeting
-- Excited sharing of their day
-- Enthusiastic pivot to topic
-
-Main Discussion ({Config.MAIN_DISCUSSION_MIN}-{Config.MAIN_DISCUSSION_MAX} words)
-- Dynamic back-and-forth exploration of points
-- Lots of "Yes, and!" moments
-- Excited interruptions to add details
-- Both hosts building on each other's enthusiasm
-- Quick-paced but clear delivery
-- Shared excitement over discoveries
-- Playful banter throughout
-
-NATURAL SPEECH ELEMENTS:
-- "!" for shared excitement
-- "!!" for extra enthusiasm
-- "Oh wow!" for amazement
-- "Yes!" for strong agreement
-- "Haha " for energetic laughter
-- "Right?!" for enthusiastic confirmation
-- "I know!!" for excited agreement
-
-Example:
-{Config.SPEAKER_1_NAME}: Oh my gosh! Jamie, you're going to LOVE this!!
-Jamie: Yes! Is this about that amazing thing you mentioned?!
-{Config.SPEAKER_1_NAME}: It totally is! And it's even better than I thought!!
-Jamie: No way! Tell me everything!!
-{Config.SPEAKER_1_NAME}: Okay, okay! So you know how... [excited explanation]
-Jamie: That's incredible! And you know what else this reminds me of?!
-
-CONVERSATION ELEMENTS:
-- High-energy exchanges
-- Enthusiastic building on each other's points
-- Excited sharing of insights
-- Quick, energetic pace
-- Shared moments of discovery
-- Playful, positive dynamics
-- Mutual enthusiasm for details
-
-STYLE GUIDELINES:
-
-Keep everything in plain text
-No special characters or markup
-Use regular punctuation for emphasis
-Write out all sounds phonetically
-Use regular quotation marks when needed
-
-The final conversation should sound like two friends genuinely excited to share interesting information with their audience. Embrace the natural messiness of real conversation while maintaining engaging content delivery.
-
-{transcript}
-
-Provide only the enhanced transcript with no additional text or formatting.
-    """.format(transcript=transcript_text, Config=Config)
-
     try:
-        response = model.generate_content(prompt)
-        # Clean up any potential formatting
-        enhanced_text = response.text.strip()
-        # Remove any markdown or special characters
-        enhanced_text = enhanced_text.replace('*', '').replace('#', '').replace('`', '')
-        # Remove any blank lines
-        enhanced_text = '\n'.join(line for line in enhanced_text.split('\n') if line.strip())
-        return enhanced_text
+        return enhancer.enhance_document(model, transcript_text, resources.get_llm_cache())
     except Exception as e:
         st.error(f"Error enhancing transcript: {str(e)}")
         return transcript_text
 
-def get_audio_player_html(audio_path):
+def get_audio_player_html(audio_url, mime_type="audio/mpeg", autoplay=False):
     """Generate HTML code for a custom audio player"""
     audio_placeholder = f"""
-        <audio controls style="width: 100%;">
-            <source src="data:audio/mp3;base64,{audio_path}" type="audio/mp3">
+        <audio controls preload="metadata" {'autoplay' if autoplay else ''} style="width: 100%;">
+            <source src="{audio_url}" type="{mime_type}">
             Your browser does not support the audio element.
         </audio>
     """
     return audio_placeholder
 
-def extract_url_content(url):
-    """Extract raw content from URL using newspaper3k"""
-    try:
-        # Create Article object
-        article = Article(url)
-        
-        # Download and parse article
-        article.download()
-        article.parse()
-        
-        # Get the main text content
-        content = article.text.strip()
-        
-        if not content:
-            raise Exception("No content extracted from the article")
-            
-        return content
-    except Exception as e:
-        st.error(f"Error extracting content from URL: {str(e)}")
-        return None
+def get_live_player_html(parts_url):
+    """Player for the parts of a running job published at parts_url.
+
+    It polls the parts manifest, decodes each new part and schedules it
+    right after the previous one, so the parts play continuously and in
+    order while later ones are still being synthesized.
+    """
+    return f"""
+        <div style="font-family: sans-serif; display: flex; gap: 0.75rem; align-items: center;">
+            <button id="play" style="padding: 0.4rem 1rem;">▶ Play</button>
+            <span id="status">Waiting for the first segment...</span>
+        </div>
+        <script>
+        const base = {json.dumps(parts_url)};
+        const context = new (window.AudioContext || window.webkitAudioContext)();
+        const button = document.getElementById("play");
+        const status = document.getElementById("status");
+        let next = 0;
+        let scheduledUntil = 0;
+
+        button.onclick = () => {{
+            if (context.state === "running") {{
+                context.suspend();
+                button.textContent = "▶ Play";
+            }} else {{
+                context.resume();
+                button.textContent = "❚❚ Pause";
+            }}
+        }};
+        context.resume().then(() => {{
+            if (context.state === "running") button.textContent = "❚❚ Pause";
+        }});
+
+        async function poll() {{
+            let finished = false;
+            try {{
+                const manifest = await (await fetch(base + "{episode_server.MANIFEST_NAME}",
+                                                    {{cache: "no-store"}})).json();
+                while (next < manifest.parts.length) {{
+                    const data = await (await fetch(base + encodeURIComponent(manifest.parts[next]))).arrayBuffer();
+                    const source = context.createBufferSource();
+                    source.buffer = await context.decodeAudioData(data);
+                    source.connect(context.destination);
+                    const at = Math.max(scheduledUntil, context.currentTime + 0.1);
+                    source.start(at);
+                    scheduledUntil = at + source.buffer.duration;
+                    next += 1;
+                }}
+                finished = manifest.finished;
+                status.textContent = next + " segment" + (next === 1 ? "" : "s") +
+                    (finished ? "" : ", more on the way...");
+            }} catch (error) {{
+                // Not published yet
+            }}
+            if (!finished) setTimeout(poll, 1000);
+        }}
+        poll();
+        </script>
+    """
 
-def extract_pdf_content(pdf_file):
+def extract_url_content(urls):
+    """Extract and merge raw content from one or more URLs using newspaper3k"""
+    results = content_sources.fetch_articles(urls, resources.get_url_cache())
+    for result in results:
+        if result.error:
+            st.warning(f"Error extracting content from {result.url}: {result.error}")
+    return content_sources.merge_articles(results) or None
+
+def extract_pdf_content(pdf_file, page_range=None):
     """Extract text content from PDF file"""
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        text = pdf_extract.extract_pdf_text(
+            pdf_file.getvalue(),
+            page_range=page_range,
+            max_pages=Config.PDF_MAX_PAGES,
+            max_chars=Config.PDF_MAX_CHARS,
+            workers=Config.PDF_WORKERS,
+            cache=resources.get_pdf_cache()
+        )
         
-        if not text.strip():
+        if not text:
             raise Exception("No content extracted from PDF")
             
-        return text.strip()
+        return text
     except Exception as e:
         st.error(f"Error extracting content from PDF: {str(e)}")
         return None
@@ -160,22 +146,14 @@ def is_valid_url(url):
     except:
         return False
 
-def increment_visitor_count():
-    """Increment and return the visitor count"""
-    counter_file = Path("visitor_counter.json")
-    
+def track_visitor():
+    """Count this browser session once and return the visitor count"""
     try:
-        if counter_file.exists():
-            with open(counter_file, "r") as f:
-                data = json.load(f)
-                count = data.get("visitors", 0) + 1
-        else:
-            count = 1
-            
-        with open(counter_file, "w") as f:
-            json.dump({"visitors": count}, f)
-            
-        return count
+        analytics_store = resources.get_analytics()
+        if 'analytics_session_id' not in st.session_state:
+            st.session_state.analytics_session_id = uuid.uuid4().hex
+            analytics_store.record_session(st.session_state.analytics_session_id)
+        return analytics_store.visitor_count()
     except Exception as e:
         st.error(f"Error tracking visitors: {str(e)}")
         return 0
@@ -187,11 +165,10 @@ def main():
     if 'raw_content' not in st.session_state:
         st.session_state.raw_content = None
 
-    # Initialize Vertex AI
-    model = setup_vertex()
-    if model is None:
-        st.error("Failed to initialize Vertex AI. Please check your credentials.")
-        return
+    # Always started: it serves this process's /metrics even when browsers
+    # get episodes through Streamlit's static file serving
+    episode_server.ensure_started(lambda job_id: job_queue.get_job_queue().get(job_id))
+    resources.warm_up()
 
     st.set_page_config(
         page_title="Podcast Generator",
@@ -199,7 +176,7 @@ def main():
         layout="centered"
     )
 
-    visitor_count = increment_visitor_count()
+    visitor_count = track_visitor()
     st.markdown(
         f"""
         <div style='position: fixed; 
@@ -224,6 +201,11 @@ def main():
         ["Upload File", "Enter URL"],
         horizontal=True
     )
+    quick_mode = st.toggle(
+        "⚡ Quick mode: start the audio while the script is still being written",
+        help="Enhancement and speech synthesis run as one pipeline; "
+             "the transcript can be edited once it is complete."
+    )
 
     if input_method == "Upload File":
         uploaded_file = st.file_uploader(
@@ -235,7 +217,17 @@ def main():
         
         if uploaded_file is not None:
             if uploaded_file.type == "application/pdf":
-                current_content = extract_pdf_content(uploaded_file)
+                pages = st.text_input(
+                    "Pages to include (optional):",
+                    placeholder="e.g. 1-50",
+                    help=f"At most {Config.PDF_MAX_PAGES} pages are extracted"
+                )
+                try:
+                    page_range = pdf_extract.parse_page_range(pages)
+                except ValueError as e:
+                    st.error(str(e))
+                    page_range = None
+                current_content = extract_pdf_content(uploaded_file, page_range)
             else:  # txt file
                 current_content = uploaded_file.getvalue().decode()
             
@@ -243,27 +235,36 @@ def main():
                 st.session_state.raw_content = current_content
                 
                 if st.session_state.enhanced_transcript is None:
-                    with st.spinner("Enhancing content with AI..."):
-                        st.session_state.enhanced_transcript = enhance_transcript(model, current_content)
+                    if quick_mode:
+                        start_pipelined_job(get_model(), current_content)
+                    else:
+                        with st.spinner("Enhancing content with AI..."):
+                            st.session_state.enhanced_transcript = enhance_transcript(get_model(), current_content)
 
     else:  # URL input
-        url = st.text_input("Enter URL:", placeholder="https://example.com/article")
-        
-        if url and is_valid_url(url):
+        url_text = st.text_area("Enter URLs (one per line):", placeholder="https://example.com/article")
+        urls = [line.strip() for line in url_text.splitlines() if line.strip()]
+        invalid_urls = [url for url in urls if not is_valid_url(url)]
+        url = "\n".join(urls)
+
+        if urls and not invalid_urls:
             if st.session_state.get('last_url') != url:
                 # First, get the raw content using newspaper3k
-                with st.spinner("Extracting content from URL..."):
-                    raw_content = extract_url_content(url)
+                with st.spinner("Extracting content from URLs..."):
+                    raw_content = extract_url_content(urls)
                     if raw_content:
                         st.session_state.raw_content = raw_content
                         # Then enhance it
-                        with st.spinner("Enhancing content with AI..."):
-                            st.session_state.enhanced_transcript = enhance_transcript(model, raw_content)
-                            st.session_state.last_url = url
+                        if quick_mode:
+                            start_pipelined_job(get_model(), raw_content)
+                        else:
+                            with st.spinner("Enhancing content with AI..."):
+                                st.session_state.enhanced_transcript = enhance_transcript(get_model(), raw_content)
+                        st.session_state.last_url = url
                     else:
-                        st.error("Failed to extract content from the URL")
-        elif url:
-            st.error("Please enter a valid URL")
+                        st.error("Failed to extract content from the URLs")
+        elif invalid_urls:
+            st.error(f"Please enter valid URLs: {', '.join(invalid_urls)}")
 
     # Show content in tabs if available
     if st.session_state.get('raw_content') and input_method == "Enter URL":
@@ -303,55 +304,178 @@ def main():
         )
         st.session_state.enhanced_transcript = edited_text
 
+    transcript = None
+    if st.session_state.get('enhanced_transcript'):
+        transcript = show_transcript_report(st.session_state.enhanced_transcript)
+
     # Generate button (outside tabs)
     if st.button("Generate Podcast 🎯", type="primary"):
-        temp_path = os.path.join("temp", "transcript.txt")
-        os.makedirs("temp", exist_ok=True)
-        
-        with open(temp_path, "w", encoding='utf-8') as f:
-            f.write(st.session_state.enhanced_transcript)
+        try:
+            # Chunks unchanged since the last version of this episode are reused
+            st.session_state.job_id = job_queue.get_job_queue().submit(
+                st.session_state.enhanced_transcript, transcript,
+                previous_job_id=st.session_state.get('job_id')
+            )
+        except Exception as e:
+            st.error(f"Error generating podcast: {str(e)}")
+
+    if st.session_state.get('job_id'):
+        job = job_queue.get_job_queue().get(st.session_state.job_id)
+        if job is None:
+            st.session_state.job_id = None
+        elif job.finished:
+            show_job_result(job)
+        else:
+            show_job_progress(job.id)
+
+def show_transcript_report(text):
+    """Parse the transcript (once per edit) and flag lines that won't be spoken"""
+    parsed = st.session_state.get('parsed_transcript')
+    if parsed is None or parsed[0] != text:
+        parsed = (text, transcript_parser.parse_transcript(text))
+        st.session_state.parsed_transcript = parsed
+    transcript = parsed[1]
+
+    st.caption(f"Transcript: {transcript.summary()}")
+    unknown = transcript.unknown_speakers()
+    if unknown:
+        st.warning("These speakers have no voice and will be skipped: " +
+                   ", ".join(f"{name} ({count} lines)" for name, count in sorted(unknown.items())))
+    if not transcript.turns:
+        st.warning("No lines of the form \"Speaker: text\" were found")
+    return transcript
+
+def start_pipelined_job(model, source_text):
+    """Enhance and synthesize in one job so audio starts before the script is done"""
+    st.session_state.job_id = job_queue.get_job_queue().submit_source(
+        source_text, model, resources.get_llm_cache()
+    )
+    # Filled in from the job's transcript once it completes
+    st.session_state.enhanced_transcript = ""
+
+@st.fragment(run_every="1s")
+def show_job_progress(job_id):
+    """Poll a running job without rerunning the whole page"""
+    job = job_queue.get_job_queue().get(job_id)
+    if job is None:
+        # Pruned while this was polling
+        st.session_state.job_id = None
+        st.rerun()
+    if job.finished:
+        if st.session_state.enhanced_transcript == "":
+            transcript_path = os.path.join(job.workdir, "transcript.txt")
+            if os.path.exists(transcript_path):
+                with open(transcript_path, encoding='utf-8') as f:
+                    st.session_state.enhanced_transcript = f.read()
+        st.rerun()
+
+    # Play the parts as soon as the first is ready instead of waiting for
+    # the whole episode
+    if job.chunks:
+        show_live_player(job)
+
+    if job.status == job_queue.QUEUED:
+        st.info("Waiting for a free worker...")
+    elif job.chunks_total:
+        st.progress(job.progress, text=f"Segment {job.chunks_done}/{job.chunks_total} ready")
+    elif job.chunks_done:
+        st.info(f"{job.chunks_done} segments ready, the script is still being written...")
+    else:
+        st.progress(0.0, text="Synthesizing the first segment...")
+
+def show_live_player(job):
+    """One player for all of a job's parts, so they play continuously and
+    in order: the episode server's growing stream when browsers can reach
+    it, otherwise the in-page player fed by the published parts. It is
+    rendered first with the same HTML on every rerun, so the browser keeps
+    it playing while the progress updates and after the job finishes,
+    until another job replaces it."""
+    st.session_state.live_job_id = job.id
+    if episode_server.enabled():
+        st.markdown(
+            get_audio_player_html(episode_server.live_url(job.id), job.chunks[0][2], autoplay=True),
+            unsafe_allow_html=True
+        )
+    else:
+        components.html(get_live_player_html(episode_server.static_url(job.id)), height=50)
+
+def show_episode_navigation(index):
+    """Chapter and line pickers; returns the seconds to start playback at"""
+    chapters = index.chapters()
+    offsets = [offset for offset in index.turn_offsets() if offset.line is not None]
+    if not offsets:
+        return None
 
-        with st.spinner("Generating your podcast..."):
-            try:
-                generator = PodcastGenerator()
-                output_path = generator.create_podcast(temp_path)
-                
-                # Read the audio file and create player
-                with open(output_path, "rb") as f:
-                    audio_bytes = f.read()
-                    audio_base64 = base64.b64encode(audio_bytes).decode()
-                    
-                    st.success("🎉 Podcast generated successfully!")
-                    
-                    # Display audio player
-                    st.write("### Listen to your podcast")
-                    st.markdown(get_audio_player_html(audio_base64), unsafe_allow_html=True)
-                    
-                    # Download buttons
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.download_button(
-                            label="Download Podcast 📥",
-                            data=audio_bytes,
-                            file_name=os.path.basename(output_path),
-                            mime="audio/mp3"
-                        )
-                    with col2:
-                        # Add option to download the transcript
-                        transcript_to_download = st.session_state.enhanced_transcript
-                        
-                        st.download_button(
-                            label="Download Transcript 📝",
-                            data=transcript_to_download,
-                            file_name="transcript.txt",
-                            mime="text/plain"
-                        )
-            except Exception as e:
-                st.error(f"Error generating podcast: {str(e)}")
-            finally:
-                # Cleanup
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+    col1, col2 = st.columns(2)
+    with col1:
+        chapter = st.selectbox(
+            "Chapter",
+            [None] + chapters,
+            format_func=lambda c: "From the start" if c is None else
+                f"{int(c['start'] // 60)}:{int(c['start'] % 60):02d}  {c['title']}",
+            key="episode_chapter"
+        )
+    with col2:
+        offset = st.selectbox(
+            "Jump to line",
+            [None] + offsets,
+            format_func=lambda o: "—" if o is None else
+                f"Line {o.line}: {o.text[:episode_index.CHAPTER_TITLE_CHARS]}",
+            key="episode_line"
+        )
+    if offset is not None:
+        return index.seconds(offset.start)
+    if chapter is not None:
+        return chapter["start"]
+    return None
+
+def get_download_link_html(url, label):
+    """Link that saves url instead of opening it"""
+    return f'<a href="{url}" download>{label}</a>'
+
+def show_job_result(job):
+    if job.chunks and st.session_state.get('live_job_id') == job.id:
+        show_live_player(job)
+
+    if job.status == job_queue.FAILED:
+        st.error(f"Error generating podcast: {job.error}")
+        return
+
+    mime_type = audio_encoder.mime_type(Config.TTS_FILE_FORMAT)
+    transcript_path = os.path.join(job.workdir, episode_server.TRANSCRIPT_NAME)
+
+    st.success("🎉 Podcast generated successfully!")
+    index = episode_index.EpisodeIndex.load(episode_index.index_path(job.workdir, "episode"))
+    if index is not None and index.reused:
+        st.caption(f"Reused {index.reused} of {len(index.chunks)} segments from the previous version")
+
+    # Display audio player
+    st.write("### Listen to your podcast")
+    start = show_episode_navigation(index) if index is not None else None
+
+    # The page only holds URLs; the file is streamed from disk with Range
+    # support (by the episode server, or Streamlit's static file serving)
+    # so the player can seek
+    audio_url = episode_server.episode_url(job.id, job.output_path)
+    if start:
+        # Media fragment: the browser starts playback at this offset
+        audio_url += f"#t={start:.2f}"
+    st.markdown(
+        get_audio_player_html(audio_url, mime_type, autoplay=bool(start)),
+        unsafe_allow_html=True
+    )
+
+    # Download links
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(get_download_link_html(
+            episode_server.episode_url(job.id, job.output_path, download=True), "Download Podcast 📥"
+        ), unsafe_allow_html=True)
+    with col2:
+        # Add option to download the transcript
+        st.markdown(get_download_link_html(
+            episode_server.episode_url(job.id, transcript_path, download=True), "Download Transcript 📝"
+        ), unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Output format -> (file extension, MIME type, ffmpeg codec arguments)
+OUTPUT_FORMATS = {
+    "wav": ("wav", "audio/wav", None),
+    "mp3": ("mp3", "audio/mpeg", ["-c:a", "libmp3lame"]),
+    "ogg": ("ogg", "audio/ogg", ["-c:a", "libopus"]),
+    "opus": ("ogg", "audio/ogg", ["-c:a", "libopus"]),
+    "aac": ("m4a", "audio/mp4", ["-c:a", "aac", "-movflags", "+faststart"]),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _format_spec(file_format):
+    try:
+        return OUTPUT_FORMATS[file_format.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported output format: {file_format}. "
+                         f"Choose one of: {', '.join(OUTPUT_FORMATS)}")
+
+
+def mime_type(file_format):
+    return _format_spec(file_format)[1]
+
+
+def output_path_for(wav_path, file_format):
+    """Path of the encoded file that sits next to wav_path"""
+    extension = _format_spec(file_format)[0]
+    return f"{os.path.splitext(wav_path)[0]}.{extension}"
+
+
+def encode_file(wav_path, file_format, bitrate):
+    """Encode a WAV file with ffmpeg and return the encoded file's path"""
+    extension, _, codec_args = _format_spec(file_format)
+    if codec_args is None:
+        return wav_path
+
+    output_path = output_path_for(wav_path, file_format)
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+               "-i", wav_path, *codec_args, "-b:a", bitrate, output_path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {extension}: {result.stderr.strip()}")
+    return output_path
+
+
+def get_encoder_pool(max_workers):
+    """Thread pool shared by every encode in this process. ffmpeg does the
+    work in a process of its own, so a thread only waits for it to exit."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="encoder")
+        return _pool
+
+
+def encode_async(wav_path, file_format, bitrate, max_workers):
+    """Run an encode on the shared pool and return its Future"""
+    if _format_spec(file_format)[2] is None:
+        future = Future()
+        future.set_result(wav_path)
+        return future
+    return get_encoder_pool(max_workers).submit(encode_file, wav_path, file_format, bitrate)
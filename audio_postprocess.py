@@ -0,0 +1,226 @@
+import math
+import mmap
+
+import numpy as np
+
+from audio_utils import COPY_BLOCK_BYTES, WavAssembler, parse_wav, wav_header
+
+# Span of the episode file mapped at once while applying gain
+GAIN_WINDOW_BYTES = 16 * 1024 * 1024
+
+# Largest magnitude of a 16-bit sample, as a float
+_FULL_SCALE = 32768.0
+
+
+def db_to_amplitude(db):
+    return 10.0 ** (db / 20.0)
+
+
+def _equal_power_ramps(length):
+    """Fade-in and fade-out gains whose powers sum to one at every sample"""
+    phase = (np.arange(length, dtype=np.float32) + 0.5) * (math.pi / (2 * length))
+    return np.sin(phase)[:, None], np.cos(phase)[:, None]
+
+
+def _to_int16(samples):
+    return np.clip(np.rint(samples), -32768, 32767).astype('<i2')
+
+
+class ProcessedWavAssembler(WavAssembler):
+    """WavAssembler that cleans up the seams between LINEAR16 chunks.
+
+    Each chunk is trimmed to its audible part (plus trim_pad_ms). At every
+    seam the previous chunk fades out, gap_ms of silence follows and the
+    next chunk fades in. With no gap the two are crossfaded instead. On
+    close the whole episode is brought to target_db RMS, with the gain
+    capped so peaks stay under peak_ceiling_db. Silent samples do not count
+    towards the RMS.
+
+    Samples are handled as NumPy views of each chunk and only the
+    crossfade_ms held back at the end of a chunk is copied. Loudness is
+    measured while writing and applied in one block-wise pass over a memory
+    map of the file. Time is linear in episode length and memory is bounded
+    by the largest chunk. A setting of 0 turns its step off.
+
+    A chunk's span in chunk_spans runs from its first written sample (after
+    the gap, or where the crossfade begins) to its last, and is final once
+    the next chunk is appended or the assembler is closed. A chunk trimmed
+    to nothing gets an empty span where it would have been.
+    """
+
+    def __init__(self, path, crossfade_ms=10, gap_ms=150, trim_db=-50.0, trim_pad_ms=40,
+                 target_db=-18.0, peak_ceiling_db=-1.0):
+        super().__init__(path)
+        self.crossfade_ms = crossfade_ms
+        self.gap_ms = gap_ms
+        self.trim_db = trim_db
+        self.trim_pad_ms = trim_pad_ms
+        self.target_db = target_db
+        self.peak_ceiling_db = peak_ceiling_db
+        self._tail = None
+        # Span of the chunk whose tail is held back
+        self._tail_span = None
+        self._sum_squares = 0.0
+        self._loud_samples = 0
+        self._peak = 0
+
+    def append(self, data):
+        """Append the samples of an in-memory WAV buffer"""
+        info = parse_wav(data)
+        self._check_format(info)
+        self._append_samples(memoryview(data)[info.data_offset:info.data_offset + info.data_length])
+        return info
+
+    def append_file(self, path):
+        """Append the samples of a WAV file via a read-only memory map"""
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                info = parse_wav(view)
+                self._check_format(info)
+                self._append_samples(view[info.data_offset:info.data_offset + info.data_length])
+            finally:
+                view.release()
+        return info
+
+    def _check_format(self, info):
+        if info.format.audio_format != 1 or info.format.bits_per_sample != 16:
+            raise ValueError(f"Post-processing needs 16-bit PCM, got {info.format}")
+        super()._check_format(info)
+
+    def _frames(self, milliseconds):
+        return int(self.format.sample_rate * milliseconds / 1000)
+
+    @property
+    def _threshold(self):
+        # Samples at or below this magnitude count as silence
+        return int(_FULL_SCALE * db_to_amplitude(self.trim_db)) if self.trim_db else 0
+
+    def _append_samples(self, view):
+        usable = len(view) - len(view) % (2 * self.format.channels)
+        samples = np.frombuffer(view[:usable], dtype='<i2').reshape(-1, self.format.channels)
+        if self.trim_db:
+            samples = self._trim(samples)
+            if not len(samples):
+                # Placed after the held-back tail once that is written
+                self.chunk_spans.append(None)
+                return
+
+        fade = self._frames(self.crossfade_ms)
+        body = samples
+        start = self.num_samples
+        if self._tail is not None:
+            if self.gap_ms or not fade:
+                self._fade_out_tail()
+                self._write(np.zeros((self._frames(self.gap_ms), self.format.channels), dtype='<i2'))
+                start = self.num_samples
+                head = min(fade, len(samples))
+                if head:
+                    fade_in, _ = _equal_power_ramps(head)
+                    self._write(_to_int16(samples[:head] * fade_in))
+                body = samples[head:]
+            else:
+                overlap = min(len(self._tail), len(samples))
+                self._write(self._tail[:len(self._tail) - overlap])
+                start = self.num_samples
+                if overlap:
+                    fade_in, fade_out = _equal_power_ramps(overlap)
+                    self._write(_to_int16(self._tail[len(self._tail) - overlap:] * fade_out
+                                          + samples[:overlap] * fade_in))
+                self._end_tail_span()
+                body = samples[overlap:]
+
+        # The end of the chunk is held back until the next seam is known
+        hold = min(fade, len(body))
+        self._write(body[:len(body) - hold])
+        self._tail = body[len(body) - hold:].copy()
+        self._tail_span = [start, self.num_samples]
+        self.chunk_spans.append(self._tail_span)
+
+    def _trim(self, samples):
+        threshold = self._threshold
+        audible = np.flatnonzero(((samples > threshold) | (samples < -threshold)).any(axis=1))
+        if not len(audible):
+            return samples[:0]
+        pad = self._frames(self.trim_pad_ms)
+        return samples[max(0, audible[0] - pad):audible[-1] + 1 + pad]
+
+    def _fade_out_tail(self):
+        if self._tail is not None and len(self._tail):
+            _, fade_out = _equal_power_ramps(len(self._tail))
+            self._write(_to_int16(self._tail * fade_out))
+        self._tail = None
+        self._end_tail_span()
+
+    def _end_tail_span(self):
+        """Close the span of the chunk whose tail was just written, and place
+        the empty spans of silent chunks that followed it"""
+        if self._tail_span is None:
+            return
+        self._tail_span[1] = self.num_samples
+        for position in range(len(self.chunk_spans) - 1, -1, -1):
+            if self.chunk_spans[position] is not None:
+                break
+            self.chunk_spans[position] = [self.num_samples, self.num_samples]
+        self._tail_span = None
+
+    def _write(self, samples):
+        if not len(samples):
+            return
+        samples = np.ascontiguousarray(samples)
+        if self.target_db:
+            threshold = self._threshold
+            loud = samples[(samples > threshold) | (samples < -threshold)].astype(np.float64)
+            self._sum_squares += float(np.dot(loud, loud))
+            self._loud_samples += len(loud)
+            self._peak = max(self._peak, int(samples.max()), -int(samples.min()))
+        self._copy(memoryview(samples).cast('B'))
+
+    def loudness_gain(self):
+        """Linear gain that brings the episode to target_db, or 1.0"""
+        if not self.target_db or not self._loud_samples:
+            return 1.0
+        rms = math.sqrt(self._sum_squares / self._loud_samples) / _FULL_SCALE
+        gain = db_to_amplitude(self.target_db) / rms
+        if self._peak:
+            gain = min(gain, db_to_amplitude(self.peak_ceiling_db) * _FULL_SCALE / self._peak)
+        # Skip the rewrite for inaudible changes (under 0.1 dB)
+        return 1.0 if abs(20 * math.log10(gain)) < 0.1 else gain
+
+    def _apply_gain(self, gain):
+        self._file.flush()
+        header_length = len(wav_header(self._fmt_chunk, 0))
+        block = COPY_BLOCK_BYTES // 2
+        scratch = np.empty(block, dtype=np.float32)
+        # Map one window at a time so resident memory stays flat however
+        # long the episode is
+        for window_start in range(0, self.data_length, GAIN_WINDOW_BYTES):
+            window_length = min(GAIN_WINDOW_BYTES, self.data_length - window_start)
+            episode = np.memmap(self.path, dtype='<i2', mode='r+', offset=header_length + window_start,
+                                shape=(window_length // 2,))
+            try:
+                for start in range(0, len(episode), block):
+                    view = episode[start:start + block]
+                    scaled = np.multiply(view, gain, out=scratch[:len(view)])
+                    np.rint(scaled, out=scaled)
+                    np.clip(scaled, -32768, 32767, out=scaled)
+                    view[:] = scaled
+                episode.flush()
+            finally:
+                del episode
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.format is not None:
+                self._fade_out_tail()
+                gain = self.loudness_gain()
+                if gain != 1.0:
+                    self._apply_gain(gain)
+            # Silent chunks before any audible one
+            self.chunk_spans = [span or [0, 0] for span in self.chunk_spans]
+        except BaseException:
+            self._file.close()
+            raise
+        super().close()
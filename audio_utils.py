@@ -0,0 +1,365 @@
+import array
+import mmap
+import struct
+from collections import namedtuple
+
+WavFormat = namedtuple("WavFormat", ["audio_format", "channels", "sample_rate", "bits_per_sample"])
+
+# Copy sample data in slices this large so memory stays flat however long
+# the episode gets
+COPY_BLOCK_BYTES = 1024 * 1024
+
+# Size field used by streaming WAV writers that cannot know the length
+STREAMING_WAV_LENGTH = 0xFFFFFFFF
+
+
+class WavInfo:
+    """Location of the PCM payload inside a RIFF/WAVE buffer"""
+
+    def __init__(self, wav_format, fmt_chunk, data_offset, data_length):
+        self.format = wav_format
+        self.fmt_chunk = fmt_chunk
+        self.data_offset = data_offset
+        self.data_length = data_length
+
+    @property
+    def block_align(self):
+        return self.format.channels * self.format.bits_per_sample // 8
+
+    @property
+    def num_samples(self):
+        return self.data_length // self.block_align
+
+
+def parse_wav(data):
+    """Parse the RIFF header of a WAV buffer without decoding any samples"""
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[0:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        raise ValueError("Not a RIFF/WAVE buffer")
+
+    fmt_chunk = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', view, offset + 4)[0]
+        body = offset + 8
+
+        if chunk_id == b'fmt ':
+            fmt_chunk = bytes(view[body:body + chunk_size])
+        elif chunk_id == b'data':
+            if fmt_chunk is None:
+                raise ValueError("WAV data chunk precedes fmt chunk")
+            # Streaming writers leave the size as 0 or 0xFFFFFFFF
+            available = len(view) - body
+            if chunk_size == 0 or chunk_size > available:
+                chunk_size = available
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', fmt_chunk)
+            wav_format = WavFormat(audio_format, channels, sample_rate, bits)
+            return WavInfo(wav_format, fmt_chunk, body, chunk_size)
+
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise ValueError("WAV buffer has no data chunk")
+
+
+def wav_header(fmt_chunk, data_length):
+    """Build a RIFF header for data_length bytes of PCM described by fmt_chunk"""
+    fmt_size = len(fmt_chunk)
+    riff_size = 4 + (8 + fmt_size + (fmt_size & 1)) + 8 + data_length
+    header = b'RIFF' + struct.pack('<I', min(riff_size, 0xFFFFFFFF)) + b'WAVE'
+    header += b'fmt ' + struct.pack('<I', fmt_size) + fmt_chunk + (b'\x00' if fmt_size & 1 else b'')
+    header += b'data' + struct.pack('<I', min(data_length, 0xFFFFFFFF))
+    return header
+
+
+class WavAssembler:
+    """Concatenate WAV chunks into one file by copying raw PCM.
+
+    The header is written once and patched with the final sizes on close.
+    Every chunk must share the format of the first one. chunk_spans holds
+    the [start, end) samples of each appended chunk in the combined file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = None
+        self.data_length = 0
+        self.chunk_spans = []
+        self._fmt_chunk = None
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def sample_rate(self):
+        return self.format.sample_rate if self.format else None
+
+    @property
+    def num_samples(self):
+        """Samples (per channel) written so far"""
+        if self.format is None:
+            return 0
+        return self.data_length // (self.format.channels * self.format.bits_per_sample // 8)
+
+    def append(self, data):
+        """Append the samples of an in-memory WAV buffer"""
+        info = parse_wav(data)
+        self._check_format(info)
+        start = self.num_samples
+        self._copy(memoryview(data)[info.data_offset:info.data_offset + info.data_length])
+        self.chunk_spans.append([start, self.num_samples])
+        return info
+
+    def append_file(self, path):
+        """Append the samples of a WAV file via a read-only memory map"""
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                info = parse_wav(view)
+                self._check_format(info)
+                start = self.num_samples
+                self._copy(view[info.data_offset:info.data_offset + info.data_length])
+                self.chunk_spans.append([start, self.num_samples])
+            finally:
+                view.release()
+        return info
+
+    def _check_format(self, info):
+        if self.format is None:
+            self.format = info.format
+            self._fmt_chunk = info.fmt_chunk
+            self._file.write(wav_header(self._fmt_chunk, 0))
+        elif info.format != self.format:
+            raise ValueError(f"WAV format mismatch: expected {self.format}, got {info.format}")
+
+    def _copy(self, view):
+        for start in range(0, len(view), COPY_BLOCK_BYTES):
+            self._file.write(view[start:start + COPY_BLOCK_BYTES])
+        self.data_length += len(view)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.format is not None:
+                if self.data_length > 0xFFFFFFFF - 64:
+                    raise ValueError("Combined audio exceeds the 4 GiB WAV size limit")
+                self._file.seek(0)
+                self._file.write(wav_header(self._fmt_chunk, self.data_length))
+        finally:
+            self._file.close()
+
+
+# MPEG audio Layer III tables, indexed by the header's version bits
+_MP3_BITRATES_KBPS = {
+    "1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    3: ("1", (44100, 48000, 32000)),
+    2: ("2", (22050, 24000, 16000)),
+    0: ("2", (11025, 12000, 8000)),  # MPEG 2.5
+}
+
+Mp3FrameHeader = namedtuple("Mp3FrameHeader", ["sample_rate", "channels", "frame_length", "samples_per_frame"])
+
+
+def parse_mp3_frame_header(data, offset):
+    """Decode the Layer III frame header at offset, or return None if there
+    is no valid header there"""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+
+    version_bits = (data[offset + 1] >> 3) & 0x03
+    layer_bits = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = data[offset + 2] >> 4
+    sample_rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+    channel_mode = data[offset + 3] >> 6
+
+    if (version_bits not in _MP3_SAMPLE_RATES or layer_bits != 1
+            or bitrate_index in (0, 15) or sample_rate_index == 3):
+        return None
+
+    table, sample_rates = _MP3_SAMPLE_RATES[version_bits]
+    sample_rate = sample_rates[sample_rate_index]
+    bitrate = _MP3_BITRATES_KBPS[table][bitrate_index] * 1000
+    if table == "1":
+        frame_length = 144 * bitrate // sample_rate + padding
+        samples_per_frame = 1152
+    else:
+        frame_length = 72 * bitrate // sample_rate + padding
+        samples_per_frame = 576
+
+    channels = 1 if channel_mode == 3 else 2
+    return Mp3FrameHeader(sample_rate, channels, frame_length, samples_per_frame)
+
+
+def skip_id3v2(data):
+    """Offset of the first byte after a leading ID3v2 tag (0 if absent)"""
+    if len(data) >= 10 and bytes(data[0:3]) == b'ID3':
+        size = ((data[6] & 0x7f) << 21) | ((data[7] & 0x7f) << 14) | \
+               ((data[8] & 0x7f) << 7) | (data[9] & 0x7f)
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def find_mp3_start(data):
+    """Offset of the first valid frame header after any ID3v2 tag, or -1"""
+    position = skip_id3v2(data)
+    while True:
+        position = data.find(b'\xff', position)
+        if position == -1:
+            return -1
+        if parse_mp3_frame_header(data, position):
+            return position
+        position += 1
+
+
+def _is_vbr_info_frame(data, offset, frame_length):
+    frame = bytes(data[offset:offset + min(frame_length, 64)])
+    return b'Xing' in frame or b'Info' in frame or b'VBRI' in frame
+
+
+class Mp3Index:
+    """Offsets and lengths of the audio frames in an MP3 buffer.
+
+    Tags and Xing/Info/VBRI header frames are left out, so the indexed frames
+    can be copied back to back into another stream.
+    """
+
+    def __init__(self, data):
+        self.offsets = array.array('Q')
+        self.lengths = array.array('I')
+        self.sample_rate = None
+        self.channels = None
+        self.samples_per_frame = None
+
+        end = len(data)
+        if end >= 128 and bytes(data[end - 128:end - 125]) == b'TAG':
+            end -= 128
+
+        position = find_mp3_start(data)
+        while 0 <= position < end:
+            header = parse_mp3_frame_header(data, position)
+            if header is None or position + header.frame_length > end:
+                # Lost sync: jump to the next candidate instead of walking bytes
+                position = data.find(b'\xff', position + 1, end)
+                continue
+
+            if self.sample_rate is None:
+                self.sample_rate = header.sample_rate
+                self.channels = header.channels
+                self.samples_per_frame = header.samples_per_frame
+                if _is_vbr_info_frame(data, position, header.frame_length):
+                    position += header.frame_length
+                    continue
+
+            self.offsets.append(position)
+            self.lengths.append(header.frame_length)
+            position += header.frame_length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def num_samples(self):
+        return len(self.offsets) * (self.samples_per_frame or 0)
+
+    def runs(self):
+        """Yield (start, end) byte ranges of back-to-back frames"""
+        run_start = run_end = None
+        for offset, length in zip(self.offsets, self.lengths):
+            if offset != run_end:
+                if run_start is not None:
+                    yield run_start, run_end
+                run_start = offset
+            run_end = offset + length
+        if run_start is not None:
+            yield run_start, run_end
+
+
+class Mp3Assembler:
+    """Join MP3 chunks at frame boundaries without decoding or re-encoding.
+
+    Every chunk must share the sample rate and channel count of the first
+    one. chunk_spans holds the [start, end) samples of each appended chunk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sample_rate = None
+        self.channels = None
+        self.num_samples = 0
+        self.chunk_spans = []
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, data):
+        """Append the audio frames of an in-memory MP3 buffer"""
+        index = Mp3Index(data)
+        if not len(index):
+            raise ValueError("MP3 buffer contains no audio frames")
+
+        if self.sample_rate is None:
+            self.sample_rate = index.sample_rate
+            self.channels = index.channels
+        elif (index.sample_rate, index.channels) != (self.sample_rate, self.channels):
+            raise ValueError(f"MP3 format mismatch: expected {self.sample_rate} Hz x{self.channels}, "
+                             f"got {index.sample_rate} Hz x{index.channels}")
+
+        view = memoryview(data)
+        for start, end in index.runs():
+            self._file.write(view[start:end])
+        self.chunk_spans.append([self.num_samples, self.num_samples + index.num_samples])
+        self.num_samples += index.num_samples
+        return index
+
+    def close(self):
+        self._file.close()
+
+
+class StreamEncoder:
+    """Turn per-chunk WAV or MP3 buffers into one continuous byte stream,
+    for players that fetch an episode while it is still being synthesized"""
+
+    def __init__(self, mp3):
+        self.mp3 = mp3
+        self.started = False
+
+    def body(self, audio_content):
+        if self.mp3:
+            # Frames only: per-chunk ID3 tags and Xing headers would confuse players
+            return b"".join(audio_content[start:end] for start, end in Mp3Index(audio_content).runs())
+
+        info = parse_wav(audio_content)
+        samples = audio_content[info.data_offset:info.data_offset + info.data_length]
+        if self.started:
+            return samples
+        self.started = True
+        return wav_header(info.fmt_chunk, STREAMING_WAV_LENGTH) + samples
+
+
+def audio_duration(path):
+    """Duration in seconds of a WAV or MP3 file, read through mmap"""
+    with open(path, 'rb') as f:
+        if not f.seek(0, 2):
+            return 0.0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] == b'RIFF':
+                info = parse_wav(data)
+                return info.num_samples / info.format.sample_rate
+            index = Mp3Index(data)
+            if not index.sample_rate:
+                raise ValueError(f"Unrecognized audio file: {path}")
+            return index.num_samples / index.sample_rate
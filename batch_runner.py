@@ -0,0 +1,326 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from audio_utils import audio_duration
+import analytics
+import metrics
+import resources
+
+CHECKPOINT_FILENAME = "batch_checkpoint.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    name TEXT PRIMARY KEY,
+    input_hash TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    audio_seconds REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    episode TEXT NOT NULL,
+    key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (episode, key)
+);
+"""
+
+# One generator per worker process, reused for every episode it renders
+_generator = None
+
+
+class BatchItem:
+    """A transcript to render and the base filename of its episode"""
+
+    def __init__(self, input_path, name):
+        self.input_path = input_path
+        self.name = name
+
+
+class EpisodeResult:
+    """Outcome of rendering one episode, returned by worker processes"""
+
+    def __init__(self, name, output_path=None, chunks=0, resumed=0, audio_seconds=0.0,
+                 seconds=0.0, error=None, metrics=None, characters=0):
+        self.name = name
+        self.output_path = output_path
+        self.chunks = chunks
+        self.characters = characters
+        self.resumed = resumed
+        self.audio_seconds = audio_seconds
+        self.seconds = seconds
+        self.error = error
+        # Metrics recorded by a worker process, for the parent to merge
+        self.metrics = metrics
+
+
+def load_batch_items(source):
+    """Collect the transcripts of a batch.
+
+    source is a directory (every *.txt file in it), a JSON manifest (a list
+    of paths or of {"input": ..., "output": ...} objects) or a text manifest
+    with one path per line. Relative paths are resolved against the
+    manifest's directory.
+    """
+    if os.path.isdir(source):
+        return _unique_items(
+            BatchItem(os.path.join(source, filename), os.path.splitext(filename)[0])
+            for filename in sorted(os.listdir(source))
+            if filename.lower().endswith('.txt')
+        )
+
+    base_directory = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as f:
+        if source.lower().endswith('.json'):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    items = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            input_path, name = entry["input"], entry.get("output")
+        else:
+            input_path, name = entry, None
+        input_path = os.path.join(base_directory, input_path)
+        items.append(BatchItem(input_path, name or os.path.splitext(os.path.basename(input_path))[0]))
+    return _unique_items(items)
+
+
+def _unique_items(items):
+    items = list(items)
+    seen = set()
+    for item in items:
+        if item.name in seen:
+            raise ValueError(f"Two transcripts map to the same episode name: {item.name}")
+        seen.add(item.name)
+    return items
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """Checkpoint manifest of a batch, kept in SQLite next to its output.
+
+    Worker processes record each chunk file as it is written and the parent
+    records finished episodes, so a restarted run skips both.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def completed_episode(self, name, input_hash):
+        """The finished episode row for this exact transcript, if its output
+        is still on disk"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM episodes WHERE name = ? AND input_hash = ?", (name, input_hash)
+            ).fetchone()
+        if row is None or not os.path.isfile(row["output_path"]):
+            return None
+        return row
+
+    def mark_episode_done(self, name, input_hash, result):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO episodes "
+                "(name, input_hash, output_path, chunks, audio_seconds, finished_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, input_hash, result.output_path, result.chunks, result.audio_seconds, time.time())
+            )
+
+    def chunk_path(self, episode, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path FROM chunks WHERE episode = ? AND key = ?", (episode, key)
+            ).fetchone()
+        return row["path"] if row else None
+
+    def record_chunk(self, episode, key, path):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chunks (episode, key, path) VALUES (?, ?, ?)",
+                (episode, key, path)
+            )
+
+    def episode(self, name):
+        return EpisodeCheckpoint(self, name)
+
+
+class EpisodeCheckpoint:
+    """Chunk files of one episode that are already on disk.
+
+    Passed to PodcastGenerator.stream_podcast; chunks are matched by their
+    synthesis cache key, so edited turns are synthesized again.
+    """
+
+    def __init__(self, store, episode):
+        self.store = store
+        self.episode = episode
+        self.resumed = 0
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        path = self.store.chunk_path(self.episode, key)
+        if not path or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            audio_content = f.read()
+        with self._lock:
+            self.resumed += 1
+        return audio_content
+
+    def record(self, key, path):
+        self.store.record_chunk(self.episode, key, path)
+
+
+def _init_worker(workers):
+    resources.share_tts_quota(workers)
+
+
+def render_episode(input_path, name, output_directory, db_path, ship_metrics=False):
+    """Worker task: render one transcript, resuming from its checkpoint"""
+    global _generator
+    if _generator is None or _generator.config["output_directory"] != output_directory:
+        _generator = PodcastGenerator(output_directory=output_directory)
+
+    start = time.perf_counter()
+    checkpoint = CheckpointStore(db_path).episode(name)
+    with metrics.span("episode"):
+        chunks = sum(1 for _ in _generator.stream_podcast(input_path, name, checkpoint=checkpoint))
+        combined_path = _generator.get_output_path(name)
+        audio_seconds = audio_duration(combined_path)
+        output_path = _generator.encode_episode(combined_path).result()
+
+    # Metrics of a failed episode stay in this worker's registry and travel
+    # with its next successful result
+    shipped = metrics.REGISTRY.drain() if ship_metrics else None
+    return EpisodeResult(name, output_path, chunks, checkpoint.resumed, audio_seconds,
+                         time.perf_counter() - start, metrics=shipped,
+                         characters=analytics.text_characters(input_path))
+
+
+class BatchSummary:
+    def __init__(self):
+        self.rendered = []
+        self.skipped = []
+        self.failed = []
+        self.seconds = 0.0
+
+    @property
+    def audio_seconds(self):
+        return sum(result.audio_seconds for result in self.rendered)
+
+    def report(self):
+        chunks = sum(result.chunks for result in self.rendered)
+        resumed = sum(result.resumed for result in self.rendered)
+        elapsed = max(self.seconds, 1e-9)
+        lines = [
+            f"Batch finished in {self.seconds:.1f}s",
+            f"  Episodes: {len(self.rendered)} rendered, {len(self.skipped)} skipped (already complete), "
+            f"{len(self.failed)} failed",
+            f"  Chunks: {chunks - resumed} synthesized, {resumed} resumed from checkpoint",
+            f"  Audio: {self.audio_seconds:.1f}s generated ({self.audio_seconds / elapsed:.1f}x realtime), "
+            f"{len(self.rendered) * 60 / elapsed:.1f} episodes/min",
+        ]
+        for result in self.failed:
+            lines.append(f"  Failed {result.name}: {result.error}")
+        return "\n".join(lines)
+
+
+def run_batch(source, workers=None, output_directory=None):
+    """Render every transcript of a batch across worker processes.
+
+    Each worker process shares one TTS client between its episodes. Episodes
+    finished by an earlier run are skipped and interrupted ones resume from
+    their last written chunk. Returns a BatchSummary.
+    """
+    output_directory = output_directory or Config.TTS_OUTPUT_DIRECTORY
+    workers = max(1, workers or Config.BATCH_WORKERS)
+    db_path = os.path.join(output_directory, CHECKPOINT_FILENAME)
+    store = CheckpointStore(db_path)
+    analytics_store = resources.get_analytics()
+    summary = BatchSummary()
+    start = time.perf_counter()
+
+    pending = []
+    for item in load_batch_items(source):
+        input_hash = file_hash(item.input_path)
+        row = store.completed_episode(item.name, input_hash)
+        if row is not None:
+            summary.skipped.append(EpisodeResult(item.name, row["output_path"], row["chunks"],
+                                                 audio_seconds=row["audio_seconds"]))
+            print(f"Skipping {item.name}: already rendered to {row['output_path']}")
+        else:
+            pending.append((item, input_hash))
+
+    def finish(item, input_hash, result):
+        if result.metrics:
+            metrics.REGISTRY.merge(result.metrics)
+        store.mark_episode_done(item.name, input_hash, result)
+        analytics_store.record_episode("batch", result.chunks, result.characters,
+                                       result.audio_seconds, result.seconds)
+        summary.rendered.append(result)
+        print(f"Rendered {item.name}: {result.chunks} chunks ({result.resumed} resumed), "
+              f"{result.audio_seconds:.1f}s of audio in {result.seconds:.1f}s")
+
+    def fail(item, error):
+        summary.failed.append(EpisodeResult(item.name, error=str(error)))
+        print(f"Failed to render {item.name}: {error}")
+
+    if workers == 1 or len(pending) <= 1:
+        for item, input_hash in pending:
+            try:
+                finish(item, input_hash, render_episode(item.input_path, item.name, output_directory, db_path))
+            except Exception as e:
+                fail(item, e)
+    else:
+        # Spawned workers re-read Config from the environment, which
+        # Config.load_file has already updated
+        workers = min(workers, len(pending))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(workers,)) as executor:
+            futures = {
+                executor.submit(render_episode, item.input_path, item.name, output_directory, db_path, True):
+                    (item, input_hash)
+                for item, input_hash in pending
+            }
+            for future in as_completed(futures):
+                item, input_hash = futures[future]
+                try:
+                    finish(item, input_hash, future.result())
+                except Exception as e:
+                    fail(item, e)
+
+    summary.seconds = time.perf_counter() - start
+    return summary
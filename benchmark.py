@@ -0,0 +1,492 @@
+"""Offline performance benchmarks.
+
+Usage: python benchmark.py <benchmark> [options]
+"""
+import argparse
+import array
+import contextlib
+import io
+import math
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import audio_encoder
+
+
+def percentile(samples, q):
+    """Linear-interpolated percentile of a list of numbers"""
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def time_runs(function, repeat, warmup=1):
+    """Call function warmup + repeat times; returns the timed durations"""
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def print_header(label, unit):
+    print(f"{label:>10}{'runs':>6}{'p50 s':>10}{'p95 s':>10}{unit:>16}{'peak RSS MB':>13}")
+
+
+def print_row(label, durations, work, unit_scale=1.0):
+    """One result row; throughput is work per second at the median"""
+    p50 = percentile(durations, 0.5)
+    print(f"{label:>10}{len(durations):>6}{p50:>10.4f}{percentile(durations, 0.95):>10.4f}"
+          f"{work * unit_scale / p50:>16.1f}{peak_rss_mb():>13.1f}")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the generator's progress output while timing"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def write_speech_like_wav(path, seconds, sample_rate=24000):
+    """Write a mono LINEAR16 WAV with voiced, pausing, noisy content so
+    encoders see something closer to speech than pure silence"""
+    rng = random.Random(0)
+    samples = array.array('h')
+    for n in range(int(seconds * sample_rate)):
+        t = n / sample_rate
+        envelope = max(0.0, math.sin(2 * math.pi * 1.5 * t))
+        voiced = math.sin(2 * math.pi * 140 * t) + 0.5 * math.sin(2 * math.pi * 280 * t)
+        samples.append(int(8000 * envelope * voiced + rng.gauss(0, 300)))
+
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def bench_encode(args):
+    """Compare encode time against output size for each output format"""
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg is required for the encode benchmark")
+
+    workdir = tempfile.mkdtemp(prefix="bench_encode_")
+    try:
+        wav_path = os.path.join(workdir, "episode.wav")
+        write_speech_like_wav(wav_path, args.seconds)
+        wav_size = os.path.getsize(wav_path)
+        print(f"Source: {args.seconds}s LINEAR16 WAV, {wav_size} bytes")
+        print(f"{'format':<8}{'bitrate':>9}{'encode s':>11}{'bytes':>12}{'ratio':>9}")
+
+        for file_format in args.formats:
+            for bitrate in args.bitrates:
+                start = time.perf_counter()
+                output_path = audio_encoder.encode_file(wav_path, file_format, bitrate)
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(output_path)
+                print(f"{file_format:<8}{bitrate:>9}{elapsed:>11.3f}{size:>12}{wav_size / size:>8.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def write_text_pdf(path, pages, lines_per_page=45):
+    """Write a minimal multi-page PDF with real text content streams"""
+    rng = random.Random(0)
+    words = ["podcast", "audio", "synthesis", "chunk", "latency", "speaker", "transcript",
+             "stream", "episode", "voice", "cache", "pipeline", "benchmark", "segment"]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choice(words) for _ in range(12)) for _ in range(lines_per_page)]
+        text = "".join(f"({line}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text}ET".encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def bench_pdf(args):
+    """Compare sequential and process-pool PDF text extraction"""
+    import pdf_extract
+
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    try:
+        for workers in args.workers:
+            print(f"\nworkers={workers}")
+            print_header("pages", "pages/s")
+            for pages in args.pages:
+                path = os.path.join(workdir, f"doc_{pages}.pdf")
+                write_text_pdf(path, pages)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # The warm-up run also starts the pool, so process start-up
+                # is not counted
+                durations = time_runs(lambda: pdf_extract.extract_pdf_text(data, workers=workers), args.repeat)
+                print_row(pages, durations, pages)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def make_generator(args, workdir):
+    """PodcastGenerator wired to the fake TTS backend"""
+    from app_config import Config
+    from app_generic import PodcastGenerator
+    from tts_scheduler import TtsScheduler
+    import fakes
+
+    Config.TTS_CACHE_ENABLED = args.cache
+    client = fakes.FakeTextToSpeechClient(latency=args.latency, latency_jitter=args.jitter,
+                                          error_rate=args.error_rate, noise=True)
+    # No quota, quick retries: the benchmark measures our side of the calls
+    scheduler = TtsScheduler(max_retries=8, base_delay=0.01, max_delay=0.2)
+    return PodcastGenerator(client=client, max_concurrency=args.concurrency,
+                            scheduler=scheduler, output_directory=workdir)
+
+
+def bench_end_to_end(args):
+    """create_podcast across transcript sizes against the fake TTS backend"""
+    import fakes
+    from audio_utils import audio_duration
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    try:
+        generator = make_generator(args, workdir)
+        print(f"Fake TTS: {args.latency}s latency (+{args.jitter}s jitter), "
+              f"{args.error_rate:.0%} errors, concurrency {generator.config['max_concurrency']}")
+        print_header("turns", "audio s/s")
+        for turns in args.turns:
+            transcript_path = os.path.join(workdir, f"transcript_{turns}.txt")
+            with open(transcript_path, 'w', encoding='utf-8') as f:
+                f.write(fakes.make_transcript(turns))
+
+            outputs = []
+
+            def run():
+                with quiet():
+                    outputs.append(generator.create_podcast(transcript_path, f"episode_{turns}_{len(outputs)}"))
+
+            durations = time_runs(run, args.repeat)
+            print_row(turns, durations, audio_duration(outputs[-1]))
+            for path in os.listdir(workdir):
+                if path.startswith(f"episode_{turns}_"):
+                    os.remove(os.path.join(workdir, path))
+        print(f"TTS calls: {generator.client.calls}, injected errors: {generator.client.errors}, "
+              f"retries: {generator.scheduler.retries}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_combine(args):
+    """Assembling chunk WAVs into one episode"""
+    import fakes
+    from audio_utils import WavAssembler
+
+    if args.postprocess:
+        from audio_postprocess import ProcessedWavAssembler as assembler_class
+    else:
+        assembler_class = WavAssembler
+    workdir = tempfile.mkdtemp(prefix="bench_combine_")
+    try:
+        chunk_path = os.path.join(workdir, "chunk.wav")
+        with open(chunk_path, 'wb') as f:
+            f.write(fakes.pcm_wav(int(args.chunk_seconds * 24000), noise=True))
+        chunk_mb = os.path.getsize(chunk_path) / (1024 * 1024)
+        print(f"Chunk: {args.chunk_seconds}s LINEAR16, {chunk_mb:.1f} MB, "
+              f"{'with' if args.postprocess else 'without'} post-processing")
+        print_header("chunks", "MB/s")
+        for chunks in args.chunks:
+            def run():
+                with assembler_class(os.path.join(workdir, "combined.wav")) as assembler:
+                    for _ in range(chunks):
+                        assembler.append_file(chunk_path)
+
+            print_row(chunks, time_runs(run, args.repeat), chunks * chunk_mb)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_parse(args):
+    """Transcript parsing (TranscriptParser) and chunk planning throughput"""
+    import fakes
+    from transcript_parser import TranscriptParser
+
+    workdir = tempfile.mkdtemp(prefix="bench_parse_")
+    try:
+        args.cache = False
+        generator = make_generator(args, workdir)
+        parser = TranscriptParser()
+        transcripts = {count: fakes.make_transcript(count) for count in args.lines}
+
+        print("Parse")
+        print_header("lines", "lines/s")
+        for count in args.lines:
+            print_row(count, time_runs(lambda: parser.parse(transcripts[count]), args.repeat), count)
+
+        print("\nParse and plan chunks")
+        print_header("lines", "lines/s")
+        for count in args.lines:
+            def run():
+                generator.plan_transcript(parser.parse(transcripts[count]))
+
+            print_row(count, time_runs(run, args.repeat), count)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def import_times(module):
+    """Import module in a fresh interpreter; returns ({module: cumulative
+    seconds}, total seconds) from python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times, times.get(module, 0.0)
+
+
+def bench_startup(args):
+    """Cold import cost of the app's entry modules, each in a fresh
+    interpreter"""
+    print(f"{'module':>20}{'runs':>6}{'p50 s':>10}{'p95 s':>10}")
+    heaviest = {}
+    for module in args.modules:
+        durations = []
+        for _ in range(args.repeat):
+            times, total = import_times(module)
+            durations.append(total)
+        print(f"{module:>20}{len(durations):>6}{percentile(durations, 0.5):>10.4f}"
+              f"{percentile(durations, 0.95):>10.4f}")
+        if module == args.modules[0]:
+            heaviest = times
+
+    # Top-level packages pulled in by the first module, by cumulative time
+    packages = {}
+    for name, seconds in heaviest.items():
+        package = name.lstrip().split(".")[0]
+        packages[package] = max(packages.get(package, 0.0), seconds)
+    print(f"\nHeaviest packages imported by {args.modules[0]}:")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:>20}{seconds:>16.4f} s")
+
+
+def bench_enhance(args):
+    """Whole-document and streamed enhancement against the fake model"""
+    import enhancer
+    import fakes
+
+    transcript = fakes.make_transcript(args.reply_turns)
+    model = fakes.FakeGenerativeModel(transcript, piece_chars=40, piece_delay=args.piece_delay,
+                                      latency=args.latency)
+    print(f"Fake model: {args.latency}s latency, {len(transcript)}-char reply "
+          f"in {len(transcript) // 40} streamed pieces")
+    print_header("chars", "source chars/s")
+    first_lines = {}
+    for chars in args.chars:
+        # Paragraphed prose so long documents are split into sections
+        paragraph = fakes.make_transcript(4).replace("\n", " ")
+        source = "\n\n".join([paragraph] * max(1, chars // len(paragraph)))[:chars]
+        print_row(chars, time_runs(lambda: enhancer.enhance_document(model, source), args.repeat, warmup=0),
+                  len(source))
+
+        def first_line():
+            start = time.perf_counter()
+            lines = enhancer.stream_enhanced_lines(model, source)
+            next(lines)
+            lines.close()
+            return time.perf_counter() - start
+
+        first_lines[chars] = [first_line() for _ in range(args.repeat)]
+
+    print("\nTime to first streamed line:")
+    for chars, durations in first_lines.items():
+        print(f"{chars:>10}  p50 {percentile(durations, 0.5):.3f}s  p95 {percentile(durations, 0.95):.3f}s")
+
+
+def bench_api(args):
+    """Load test the API service, started locally on fake backends unless
+    --url points at a running one"""
+    import asyncio
+    import urllib.request
+
+    import aiohttp
+    import fakes
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, "api_server.py", "--fake-backends",
+                                   "--host", "127.0.0.1", "--port", str(args.port),
+                                   "--workers", str(args.workers),
+                                   "--fake-tts-latency", str(args.latency)],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"{url}/healthz", timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    server.kill()
+                    raise SystemExit("API server did not start")
+                time.sleep(0.2)
+
+    transcript = fakes.make_transcript(args.turns)
+
+    async def one_request(session, results):
+        start = time.perf_counter()
+        async with session.post(f"{url}/generate", json={"text": transcript}) as response:
+            first_byte = None
+            size = 0
+            async for block in response.content.iter_any():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+                size += len(block)
+            results.append((response.status, first_byte or 0.0, time.perf_counter() - start, size))
+
+    async def run():
+        results = []
+        limit = asyncio.Semaphore(args.concurrency)
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async def limited():
+                async with limit:
+                    await one_request(session, results)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(limited() for _ in range(args.requests)))
+            return results, time.perf_counter() - start
+
+    try:
+        results, elapsed = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    ok = [result for result in results if result[0] == 200]
+    print(f"{len(results)} requests, concurrency {args.concurrency}, {len(ok)} OK, "
+          f"{elapsed:.2f}s, {len(results) / elapsed:.2f} req/s")
+    if ok:
+        first_bytes = [result[1] for result in ok]
+        totals = [result[2] for result in ok]
+        print(f"time to first byte  p50 {percentile(first_bytes, 0.5):.3f}s  p95 {percentile(first_bytes, 0.95):.3f}s")
+        print(f"full response       p50 {percentile(totals, 0.5):.3f}s  p95 {percentile(totals, 0.95):.3f}s")
+        print(f"audio bytes per response: {ok[0][3]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run offline performance benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    encode = subparsers.add_parser('encode', help='Output encoding time vs size per format')
+    encode.add_argument('--seconds', type=int, default=300, help='Length of the synthetic episode')
+    encode.add_argument('--formats', nargs='+', default=['mp3', 'ogg', 'aac'])
+    encode.add_argument('--bitrates', nargs='+', default=['32k', '48k', '64k'])
+    encode.set_defaults(func=bench_encode)
+
+    pdf = subparsers.add_parser('pdf', help='PDF text extraction throughput')
+    pdf.add_argument('--pages', nargs='+', type=int, default=[100, 300, 600])
+    pdf.add_argument('--workers', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    pdf.add_argument('--repeat', type=int, default=3)
+    pdf.set_defaults(func=bench_pdf)
+
+    def add_fake_tts_options(subparser):
+        subparser.add_argument('--latency', type=float, default=0.2, help='Fake TTS seconds per call')
+        subparser.add_argument('--jitter', type=float, default=0.1, help='Extra random seconds per call')
+        subparser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls that fail')
+        subparser.add_argument('--concurrency', type=int, help='Requests in flight per episode')
+
+    end_to_end = subparsers.add_parser('end-to-end', help='create_podcast with fake TTS')
+    end_to_end.add_argument('--turns', nargs='+', type=int, default=[20, 100, 400])
+    end_to_end.add_argument('--repeat', type=int, default=5)
+    end_to_end.add_argument('--cache', action='store_true', help='Keep the audio cache enabled')
+    add_fake_tts_options(end_to_end)
+    end_to_end.set_defaults(func=bench_end_to_end)
+
+    combine = subparsers.add_parser('combine', help='Chunk assembly into one WAV')
+    combine.add_argument('--chunks', nargs='+', type=int, default=[10, 50, 200])
+    combine.add_argument('--chunk-seconds', type=float, default=30.0)
+    combine.add_argument('--repeat', type=int, default=5)
+    combine.add_argument('--postprocess', action='store_true',
+                         help='Trim, crossfade and loudness-normalize while combining')
+    combine.set_defaults(func=bench_combine)
+
+    parse = subparsers.add_parser('parse', help='Transcript parsing and chunk planning')
+    parse.add_argument('--lines', nargs='+', type=int, default=[1000, 10000, 100000])
+    parse.add_argument('--repeat', type=int, default=5)
+    add_fake_tts_options(parse)
+    parse.set_defaults(func=bench_parse)
+
+    enhance = subparsers.add_parser('enhance', help='Enhancement with a fake Vertex model')
+    enhance.add_argument('--chars', nargs='+', type=int, default=[5000, 50000, 200000])
+    enhance.add_argument('--latency', type=float, default=0.5, help='Fake model seconds before replying')
+    enhance.add_argument('--piece-delay', type=float, default=0.002, help='Seconds per streamed piece')
+    enhance.add_argument('--reply-turns', type=int, default=40, help='Lines in each fake reply')
+    enhance.add_argument('--repeat', type=int, default=3)
+    enhance.set_defaults(func=bench_enhance)
+
+    startup = subparsers.add_parser('startup', help='Import cost of the entry modules (cold start)')
+    startup.add_argument('--modules', nargs='+',
+                         default=['app_ui', 'api_server', 'app_generic', 'content_sources', 'pdf_extract'])
+    startup.add_argument('--repeat', type=int, default=5)
+    startup.add_argument('--top', type=int, default=10, help='Heaviest packages to list')
+    startup.set_defaults(func=bench_startup)
+
+    api = subparsers.add_parser('api', help='Load test the /generate endpoint')
+    api.add_argument('--url', help='Running API to test (default: start one on fake backends)')
+    api.add_argument('--port', type=int, default=5099)
+    api.add_argument('--workers', type=int, default=2, help='Worker processes of the local server')
+    api.add_argument('--latency', type=float, default=0.2, help='Fake TTS seconds per call')
+    api.add_argument('--requests', type=int, default=40)
+    api.add_argument('--concurrency', type=int, default=8)
+    api.add_argument('--turns', type=int, default=40, help='Transcript lines per request')
+    api.set_defaults(func=bench_api)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
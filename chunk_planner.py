@@ -0,0 +1,149 @@
+import re
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def _byte_length(text):
+    return len(text.encode('utf-8'))
+
+
+def turn_bytes(speaker, text):
+    """Bytes a turn contributes to a synthesis request"""
+    return _byte_length(speaker) + _byte_length(text)
+
+
+def _split_words(text, max_bytes):
+    pieces = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if _byte_length(candidate) <= max_bytes:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        # A single word longer than the budget is cut on character boundaries
+        while _byte_length(word) > max_bytes:
+            cut = len(word.encode('utf-8')[:max_bytes].decode('utf-8', 'ignore'))
+            pieces.append(word[:cut])
+            word = word[cut:]
+        current = word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, max_bytes):
+    """Split text into pieces of at most max_bytes, preferring sentence ends"""
+    if _byte_length(text) <= max_bytes:
+        return [text]
+
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{current} {sentence}" if current else sentence
+        if _byte_length(candidate) <= max_bytes:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        if _byte_length(sentence) <= max_bytes:
+            current = sentence
+        else:
+            *head, current = _split_words(sentence, max_bytes)
+            pieces.extend(head)
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class PlannedChunk:
+    """Consecutive (speaker, text) turns sent as one synthesis request.
+
+    lines holds the transcript line of each turn, where known. audio_path
+    points at audio already rendered for exactly these turns (see
+    episode_index), which is used instead of synthesizing them again.
+    """
+
+    def __init__(self, turns, size, lines=None, audio_path=None):
+        self.turns = turns
+        self.size = size
+        self.lines = lines if lines is not None else [None] * len(turns)
+        self.audio_path = audio_path
+
+
+class ChunkPlan:
+    """Ordered synthesis requests for a transcript"""
+
+    def __init__(self, chunks, max_bytes, transcript=None):
+        self.chunks = chunks
+        self.max_bytes = max_bytes
+        # transcript_parser.Transcript the turns came from, when known
+        self.transcript = transcript
+
+    @property
+    def request_count(self):
+        return len(self.chunks)
+
+    @property
+    def request_bytes(self):
+        return [chunk.size for chunk in self.chunks]
+
+    def summary(self):
+        sizes = self.request_bytes
+        if not sizes:
+            return "0 requests"
+        return (f"{len(sizes)} requests, {sum(sizes)} bytes total "
+                f"(min {min(sizes)}, avg {sum(sizes) // len(sizes)}, max {max(sizes)}, "
+                f"budget {self.max_bytes})")
+
+
+def iter_pieces(turns, max_bytes):
+    """Yield (speaker, text, line) pieces that each fit in a request.
+
+    turns are (speaker, text) pairs or transcript_parser.Turn objects (whose
+    line numbers are kept). Turns that do not fit in a request on their own
+    are split at sentence boundaries and the pieces keep the original
+    speaker and line.
+    """
+    for turn in turns:
+        speaker, text = turn
+        line = getattr(turn, "line", None)
+        for piece in split_text(text, max(1, max_bytes - _byte_length(speaker))):
+            yield speaker, piece, line
+
+
+def pack_pieces(pieces, max_bytes, first_bytes=None):
+    """Greedily pack consecutive (speaker, text, line) pieces into chunks.
+
+    With first_bytes, the first chunk is cut at first_bytes and each later
+    one may be twice the size of the one before, up to max_bytes, so the
+    first request is sent (and heard) long before the budget fills.
+    """
+    budget = min(first_bytes, max_bytes) if first_bytes else max_bytes
+    current = []
+    lines = []
+    current_size = 0
+    for speaker, piece, line in pieces:
+        size = turn_bytes(speaker, piece)
+        if current and current_size + size > budget:
+            yield PlannedChunk(current, current_size, lines)
+            current = []
+            lines = []
+            current_size = 0
+            budget = min(max_bytes, budget * 2)
+        current.append((speaker, piece))
+        lines.append(line)
+        current_size += size
+    if current:
+        yield PlannedChunk(current, current_size, lines)
+
+
+def iter_chunks(turns, max_bytes, first_bytes=None):
+    """Greedily pack consecutive turns into request-sized chunks"""
+    return pack_pieces(iter_pieces(turns, max_bytes), max_bytes, first_bytes)
+
+
+def plan_chunks(turns, max_bytes, transcript=None, first_bytes=None):
+    """Build the full ChunkPlan for a sequence of (speaker, text) turns"""
+    return ChunkPlan(list(iter_chunks(turns, max_bytes, first_bytes)), max_bytes, transcript)
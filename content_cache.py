@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    metadata TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at);
+"""
+
+
+def make_key(*parts):
+    """Stable hash of JSON-serializable key parts"""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, value, metadata, stored_at, fresh):
+        self.value = value
+        self.metadata = metadata
+        self.stored_at = stored_at
+        # False once the entry is older than the TTL; stale entries are still
+        # returned so callers can revalidate them
+        self.fresh = fresh
+
+
+class ContentCache:
+    """Persistent text cache with a TTL and a per-namespace byte quota.
+
+    Entries live in SQLite (WAL mode), so every thread and worker process
+    shares them. Least-recently-used entries are evicted first.
+    """
+
+    def __init__(self, db_path, namespace, max_bytes, ttl_seconds):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return the CacheEntry for key (possibly stale), or None"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, metadata, stored_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key)
+                )
+
+        if row is None:
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc(cache=self.namespace, result="miss")
+            return None
+
+        value, metadata, stored_at = row
+        fresh = now - stored_at < self.ttl_seconds
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.CACHE_REQUESTS.inc(cache=self.namespace, result="hit" if fresh else "stale")
+        return CacheEntry(value.decode('utf-8'), json.loads(metadata), stored_at, fresh)
+
+    def get_fresh(self, key):
+        """Return the cached value for key if it is within the TTL"""
+        entry = self.get(key)
+        if entry is None or not entry.fresh:
+            return None
+        return entry.value
+
+    def put(self, key, value, metadata=None):
+        data = value.encode('utf-8')
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(namespace, key, value, metadata, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, data, json.dumps(metadata or {}), size, now, now)
+            )
+            self._evict(conn)
+
+    def refresh(self, key):
+        """Restart the TTL of an entry that was revalidated upstream"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, now, self.namespace, key)
+            )
+
+    def _evict(self, conn):
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed_at",
+            (self.namespace,)
+        )
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((self.namespace, key))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", evicted)
@@ -0,0 +1,221 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app_config import Config
+import metrics
+
+_session = None
+_parse_pool = None
+_host_slots = {}
+_lock = threading.Lock()
+
+
+class ArticleResult:
+    """Outcome of ingesting one URL"""
+
+    def __init__(self, url, text=None, error=None):
+        self.url = url
+        self.text = text
+        self.error = error
+
+
+def get_session():
+    """HTTP session whose connection pool is reused by every fetch"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=Config.URL_FETCH_MAX_CONCURRENCY,
+                                  pool_maxsize=Config.URL_FETCH_PER_HOST)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers["User-Agent"] = Config.URL_FETCH_USER_AGENT
+        return _session
+
+
+def _get_parse_pool():
+    global _parse_pool
+    with _lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=Config.URL_PARSE_WORKERS,
+                                              mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def _reset_parse_pool(pool):
+    """Forget a pool whose worker died so the next call starts a new one"""
+    global _parse_pool
+    with _lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False)
+
+
+def _parse_in_pool(url, html):
+    """parse_article_html in the parse pool, retried once on a fresh pool if
+    a worker crashed"""
+    for attempt in range(2):
+        pool = _get_parse_pool()
+        try:
+            return pool.submit(parse_article_html, url, html).result()
+        except BrokenProcessPool:
+            _reset_parse_pool(pool)
+            if attempt:
+                raise
+
+
+def _host_slot(url):
+    """Semaphore limiting concurrent requests to one host"""
+    host = urlparse(url).netloc.lower()
+    with _lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(Config.URL_FETCH_PER_HOST)
+        return _host_slots[host]
+
+
+def _download(url, headers):
+    """GET url with connect/read timeouts, an overall deadline and a body
+    size cap"""
+    deadline = time.monotonic() + Config.URL_FETCH_TIMEOUT
+    with _host_slot(url):
+        response = get_session().get(
+            url,
+            headers=headers,
+            timeout=(Config.URL_CONNECT_TIMEOUT, Config.URL_FETCH_TIMEOUT),
+            stream=True
+        )
+        with response:
+            if response.status_code == 304:
+                return response, None
+            response.raise_for_status()
+
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > Config.URL_MAX_BYTES:
+                raise ValueError(f"Response too large ({declared} bytes)")
+
+            body = bytearray()
+            for block in _iter_body(response):
+                body += block
+                if len(body) > Config.URL_MAX_BYTES:
+                    raise ValueError(f"Response larger than {Config.URL_MAX_BYTES} bytes")
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Download exceeded {Config.URL_FETCH_TIMEOUT}s")
+
+        return response, _decode_body(bytes(body), response.encoding)
+
+
+def _iter_body(response, block_bytes=64 * 1024):
+    """Yield the body as it arrives so the deadline also catches servers that
+    trickle bytes just fast enough to dodge the read timeout"""
+    read1 = getattr(response.raw, "read1", None)
+    if read1 is None:
+        # urllib3 < 2.3 only offers blocking fixed-size reads
+        yield from response.iter_content(block_bytes)
+        return
+    while True:
+        block = read1(block_bytes, decode_content=True)
+        if not block:
+            return
+        yield block
+
+
+def _decode_body(body, encoding):
+    # requests reports ISO-8859-1 for any text/* without a charset; most of
+    # those pages are really UTF-8
+    if encoding and encoding.lower() != 'iso-8859-1':
+        return body.decode(encoding, errors='replace')
+    try:
+        return body.decode('utf-8')
+    except UnicodeDecodeError:
+        return body.decode('latin-1')
+
+
+def parse_article_html(url, html):
+    """Extract the main article text from downloaded HTML"""
+    # newspaper is slow to import and only needed once a URL is submitted
+    from newspaper import Article
+
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return article.text.strip()
+
+
+@metrics.timed("url_extract")
+def fetch_article_text(url, cache=None, parse_in_pool=False):
+    """Download and extract the main text of an article.
+
+    With a cache, fresh entries are returned without touching the network and
+    stale ones are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged page is neither downloaded nor parsed again.
+    """
+    entry = cache.get(url) if cache is not None else None
+    if entry is not None and entry.fresh:
+        return entry.value
+
+    headers = {}
+    if entry is not None:
+        if entry.metadata.get("etag"):
+            headers["If-None-Match"] = entry.metadata["etag"]
+        if entry.metadata.get("last_modified"):
+            headers["If-Modified-Since"] = entry.metadata["last_modified"]
+
+    response, html = _download(url, headers)
+    if response.status_code == 304:
+        if entry is None:
+            raise ValueError("Server answered 304 to an unconditional request")
+        cache.refresh(url)
+        return entry.value
+
+    if parse_in_pool:
+        content = _parse_in_pool(url, html)
+    else:
+        content = parse_article_html(url, html)
+
+    # Get the main text content
+    if not content:
+        raise Exception("No content extracted from the article")
+
+    if cache is not None:
+        cache.put(url, content, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        })
+    return content
+
+
+def fetch_articles(urls, cache=None):
+    """Ingest several URLs concurrently; returns ArticleResults in input order.
+
+    Downloads share one pooled HTTP session with per-host limits, and HTML
+    is parsed in a process pool, so one slow or huge site only costs its own
+    timeout.
+    """
+    def fetch(url):
+        try:
+            return ArticleResult(url, text=fetch_article_text(url, cache, parse_in_pool=True))
+        except Exception as e:
+            return ArticleResult(url, error=str(e))
+
+    urls = list(dict.fromkeys(urls))
+    if len(urls) == 1:
+        return [fetch(urls[0])]
+
+    max_workers = max(1, min(Config.URL_FETCH_MAX_CONCURRENCY, len(urls)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, urls))
+
+
+def merge_articles(results):
+    """Combine the extracted text of several sources into one document"""
+    texts = [result for result in results if result.text]
+    if len(texts) == 1:
+        return texts[0].text
+    return "\n\n".join(f"Source: {result.url}\n\n{result.text}" for result in texts)
@@ -0,0 +1,285 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_config import Config
+from chunk_planner import split_text
+from content_cache import make_key
+import metrics
+
+# Rough size of a token in characters, good enough to bound prompt sizes
+# without a count_tokens round-trip
+CHARS_PER_TOKEN = 4
+
+_HEADING = re.compile(r'^(#{1,6}\s+\S.*|[A-Z0-9][A-Z0-9 ,:&\-]{2,80}|(\d+(\.\d+)*|[IVX]+)\.?\s+[A-Z].{0,80})$')
+
+PROMPT_TEMPLATE = """
+Create a natural, engaging podcast conversation between two hosts - discussing the content from [INSERT URL]. The conversation should include:
+HOSTS' PERSONALITIES:
+
+{Config.SPEAKER_1_NAME}: {Config.SPEAKER_1_PERSONALITY}
+{Config.SPEAKER_2_NAME}: {Config.SPEAKER_2_PERSONALITY}
+
+CONVERSATION STRUCTURE:
+
+Opening banter ({Config.OPENING_WORDS_MIN}-{Config.OPENING_WORDS_MAX} words)
+- High-energy greeting
+- Excited sharing of their day
+- Enthusiastic pivot to topic
+
+Main Discussion ({Config.MAIN_DISCUSSION_MIN}-{Config.MAIN_DISCUSSION_MAX} words)
+- Dynamic back-and-forth exploration of points
+- Lots of "Yes, and!" moments
+- Excited interruptions to add details
+- Both hosts building on each other's enthusiasm
+- Quick-paced but clear delivery
+- Shared excitement over discoveries
+- Playful banter throughout
+
+NATURAL SPEECH ELEMENTS:
+- "!" for shared excitement
+- "!!" for extra enthusiasm
+- "Oh wow!" for amazement
+- "Yes!" for strong agreement
+- "Haha " for energetic laughter
+- "Right?!" for enthusiastic confirmation
+- "I know!!" for excited agreement
+
+Example:
+{Config.SPEAKER_1_NAME}: Oh my gosh! Jamie, you're going to LOVE this!!
+Jamie: Yes! Is this about that amazing thing you mentioned?!
+{Config.SPEAKER_1_NAME}: It totally is! And it's even better than I thought!!
+Jamie: No way! Tell me everything!!
+{Config.SPEAKER_1_NAME}: Okay, okay! So you know how... [excited explanation]
+Jamie: That's incredible! And you know what else this reminds me of?!
+
+CONVERSATION ELEMENTS:
+- High-energy exchanges
+- Enthusiastic building on each other's points
+- Excited sharing of insights
+- Quick, energetic pace
+- Shared moments of discovery
+- Playful, positive dynamics
+- Mutual enthusiasm for details
+
+STYLE GUIDELINES:
+
+Keep everything in plain text
+No special characters or markup
+Use regular punctuation for emphasis
+Write out all sounds phonetically
+Use regular quotation marks when needed
+
+The final conversation should sound like two friends genuinely excited to share interesting information with their audience. Embrace the natural messiness of real conversation while maintaining engaging content delivery.
+
+{transcript}
+
+Provide only the enhanced transcript with no additional text or formatting.
+    """
+
+
+def build_prompt(transcript_text):
+    return PROMPT_TEMPLATE.format(transcript=transcript_text, Config=Config)
+
+
+def generation_config():
+    return {
+        "temperature": Config.TEMPERATURE,
+        "top_k": Config.TOP_K,
+        "top_p": Config.TOP_P,
+        "max_output_tokens": Config.MAX_OUTPUT_TOKENS,
+    }
+
+
+def clean_enhanced_text(text):
+    # Clean up any potential formatting
+    enhanced_text = text.strip()
+    # Remove any markdown or special characters
+    enhanced_text = enhanced_text.replace('*', '').replace('#', '').replace('`', '')
+    # Remove any blank lines
+    return '\n'.join(line for line in enhanced_text.split('\n') if line.strip())
+
+
+def enhancement_cache_key(transcript_text, instructions=""):
+    """Key an enhancement by everything that changes the model's output"""
+    # The rendered template includes the configured host names and styles
+    return make_key(transcript_text, build_prompt(""), instructions,
+                    Config.VERTEX_MODEL, generation_config())
+
+
+def enhance_text(model, transcript_text, cache=None, instructions=""):
+    """Turn source text into a two-host transcript with the model.
+
+    Results are shared through cache when one is given; errors propagate.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = enhancement_cache_key(transcript_text, instructions)
+        cached = cache.get_fresh(cache_key)
+        if cached is not None:
+            return cached
+
+    prompt = build_prompt(transcript_text) + instructions
+    with metrics.span("llm_enhance"):
+        response = model.generate_content(prompt, generation_config=generation_config())
+    enhanced_text = clean_enhanced_text(response.text)
+
+    if cache_key is not None and enhanced_text:
+        cache.put(cache_key, enhanced_text)
+    return enhanced_text
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def split_sections(text, max_tokens):
+    """Split a document into sections of at most max_tokens.
+
+    Sections break at paragraph boundaries, preferably before a heading;
+    paragraphs that are too long on their own are split at sentence ends.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+
+    # Keep each heading attached to the paragraph that follows it
+    units = []
+    pending_heading = None
+    for paragraph in paragraphs:
+        if pending_heading is not None:
+            units.append((True, f"{pending_heading}\n\n{paragraph}"))
+            pending_heading = None
+        elif _HEADING.match(paragraph) and len(paragraph) <= max_chars // 2:
+            pending_heading = paragraph
+        else:
+            units.append((False, paragraph))
+    if pending_heading is not None:
+        units.append((True, pending_heading))
+
+    sections = []
+    current = []
+    current_chars = 0
+    for starts_with_heading, unit in units:
+        # Start a fresh section at a heading once the current one is
+        # reasonably full, so sections follow the document's structure
+        if current and (current_chars + len(unit) > max_chars
+                        or (starts_with_heading and current_chars > max_chars // 2)):
+            sections.append('\n\n'.join(current))
+            current = []
+            current_chars = 0
+
+        for piece in split_text(unit, max_chars):
+            if current and current_chars + len(piece) > max_chars:
+                sections.append('\n\n'.join(current))
+                current = []
+                current_chars = 0
+            current.append(piece)
+            current_chars += len(piece) + 2
+
+    if current:
+        sections.append('\n\n'.join(current))
+    return sections
+
+
+def _section_topic(section):
+    first_line = section.strip().split('\n', 1)[0]
+    return re.split(r'(?<=[.!?])\s+', first_line, maxsplit=1)[0][:200]
+
+
+def section_instructions(sections, index):
+    """Continuity hints that let independently enhanced sections read as
+    one episode"""
+    count = len(sections)
+    hints = [f"\n\nThis is part {index + 1} of {count} of one continuous episode; "
+             "only cover the content above."]
+    if index == 0:
+        hints.append("Open the show as described, but do not wrap up or say goodbye.")
+    else:
+        hints.append("Skip the opening banter and greetings; pick up the conversation mid-show, "
+                     f"moving on naturally from the previous part, which covered: {_section_topic(sections[index - 1])}")
+    if index < count - 1:
+        hints.append(f"End on a natural transition towards the next part, which covers: "
+                     f"{_section_topic(sections[index + 1])}")
+    else:
+        hints.append("Close the episode with a short wrap-up and goodbye.")
+    return "\n".join(hints)
+
+
+def _iter_section_transcripts(model, sections, cache):
+    """Enhance sections concurrently, yielding their transcripts in order"""
+    def enhance_section(index):
+        return enhance_text(model, sections[index], cache, section_instructions(sections, index))
+
+    max_workers = max(1, min(Config.ENHANCE_MAX_CONCURRENCY, len(sections)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(enhance_section, range(len(sections)))
+
+
+def is_long_document(text):
+    return estimate_tokens(text) > Config.LONG_DOC_SECTION_TOKENS
+
+
+def enhance_document(model, source_text, cache=None):
+    """Enhance source text of any length.
+
+    Long documents are split into sections that are enhanced concurrently
+    and stitched into one episode, so wall time follows the largest section
+    rather than the whole document.
+    """
+    if not is_long_document(source_text):
+        return enhance_text(model, source_text, cache)
+
+    sections = split_sections(source_text, Config.LONG_DOC_SECTION_TOKENS)
+    return '\n'.join(_iter_section_transcripts(model, sections, cache))
+
+
+def stream_enhanced_lines(model, transcript_text, cache=None):
+    """Yield cleaned transcript lines as soon as the model finishes each one.
+
+    A cached enhancement is replayed line by line; a completed stream is
+    added to the cache. Long documents are enhanced section by section and
+    each section's lines are released as soon as it and all earlier ones
+    are done.
+    """
+    if is_long_document(transcript_text):
+        sections = split_sections(transcript_text, Config.LONG_DOC_SECTION_TOKENS)
+        for section_transcript in _iter_section_transcripts(model, sections, cache):
+            yield from section_transcript.split('\n')
+        return
+
+    cache_key = None
+    if cache is not None:
+        cache_key = enhancement_cache_key(transcript_text)
+        cached = cache.get_fresh(cache_key)
+        if cached is not None:
+            yield from cached.split('\n')
+            return
+
+    start = time.perf_counter()
+    responses = model.generate_content(
+        build_prompt(transcript_text),
+        generation_config=generation_config(),
+        stream=True
+    )
+
+    lines = []
+    pending = ""
+    for response in responses:
+        if start is not None:
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_first_token")
+            start = None
+        pending += response.text
+        *complete, pending = pending.split('\n')
+        for line in complete:
+            line = clean_enhanced_text(line)
+            if line:
+                lines.append(line)
+                yield line
+
+    line = clean_enhanced_text(pending)
+    if line:
+        lines.append(line)
+        yield line
+
+    if cache_key is not None and lines:
+        cache.put(cache_key, '\n'.join(lines))
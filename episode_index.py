@@ -0,0 +1,215 @@
+import json
+import os
+import tempfile
+from difflib import SequenceMatcher
+
+from chunk_planner import ChunkPlan, PlannedChunk, iter_pieces, pack_pieces, turn_bytes
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = "_index.json"
+
+# Characters of a line shown as a chapter title
+CHAPTER_TITLE_CHARS = 60
+
+
+def index_path(directory, output_filename):
+    """Where the index of an episode rendered as output_filename is saved"""
+    return os.path.join(directory, f"{output_filename}{INDEX_SUFFIX}")
+
+
+class IndexedChunk:
+    """One synthesis request of a rendered episode: its content key, audio
+    file, turns as (voice, text, line) and [start, end) sample range in the
+    combined file"""
+
+    __slots__ = ("key", "path", "turns", "start", "end")
+
+    def __init__(self, key, path, turns, start, end):
+        self.key = key
+        self.path = path
+        self.turns = turns
+        self.start = start
+        self.end = end
+
+
+class TurnOffset:
+    """Where one transcript line is heard in the combined file"""
+
+    __slots__ = ("line", "voice", "text", "chunk", "start", "end")
+
+    def __init__(self, line, voice, text, chunk, start, end):
+        self.line = line
+        self.voice = voice
+        self.text = text
+        self.chunk = chunk
+        self.start = start
+        self.end = end
+
+
+class EpisodeIndex:
+    """Map of a rendered episode from transcript turns to chunks and samples.
+
+    Saved as JSON next to the combined file. Regenerating the episode reuses
+    the audio of every chunk whose turns are unchanged (see plan_incremental),
+    and the UI uses the offsets to seek to a line or a chapter.
+
+    Chunk boundaries are exact. TTS does not report where each turn starts
+    within a multi-speaker request, so turn offsets inside a chunk are
+    interpolated by character count.
+    """
+
+    def __init__(self, sample_rate, settings_key, chunks=None, reused=0):
+        self.sample_rate = sample_rate
+        self.settings_key = settings_key
+        self.chunks = chunks if chunks is not None else []
+        self.reused = reused
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at path, or None if it is missing or unreadable"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return None
+            chunks = [IndexedChunk(chunk["key"], chunk["path"], [tuple(turn) for turn in chunk["turns"]],
+                                   chunk["start"], chunk["end"])
+                      for chunk in data["chunks"]]
+            return cls(data["sample_rate"], data["settings_key"], chunks, data.get("reused", 0))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path):
+        data = {
+            "version": INDEX_VERSION,
+            "sample_rate": self.sample_rate,
+            "settings_key": self.settings_key,
+            "reused": self.reused,
+            "chunks": [
+                {"key": chunk.key, "path": chunk.path, "start": chunk.start, "end": chunk.end,
+                 "turns": [list(turn) for turn in chunk.turns]}
+                for chunk in self.chunks
+            ],
+            "chapters": self.chapters(),
+        }
+        # Written to a temporary file first so readers never see half an index
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def add_chunk(self, key, path, chunk):
+        """Record a planned chunk; its samples are filled in by set_spans"""
+        turns = [(voice, text, line) for (voice, text), line in zip(chunk.turns, chunk.lines)]
+        self.chunks.append(IndexedChunk(key, path, turns, 0, 0))
+
+    def set_spans(self, spans):
+        """Set each chunk's [start, end) samples from a closed assembler's
+        chunk_spans, which account for trimmed silence, gaps and crossfades"""
+        for chunk, (start, end) in zip(self.chunks, spans):
+            chunk.start = start
+            chunk.end = end
+
+    def seconds(self, sample):
+        return sample / self.sample_rate if self.sample_rate else 0.0
+
+    def turn_offsets(self):
+        """TurnOffset for every transcript line, in order. Pieces of a turn
+        that was split across requests are merged back into one entry."""
+        offsets = []
+        for index, chunk in enumerate(self.chunks):
+            characters = sum(len(text) for _, text, _ in chunk.turns) or 1
+            position = 0
+            for voice, text, line in chunk.turns:
+                start = chunk.start + (chunk.end - chunk.start) * position // characters
+                position += len(text)
+                end = chunk.start + (chunk.end - chunk.start) * position // characters
+                if offsets and line is not None and offsets[-1].line == line:
+                    offsets[-1].end = end
+                    offsets[-1].text += " " + text
+                else:
+                    offsets.append(TurnOffset(line, voice, text, index, start, end))
+        return offsets
+
+    def line_start(self, line):
+        """Seconds into the episode where a transcript line starts, or None"""
+        for offset in self.turn_offsets():
+            if offset.line == line:
+                return self.seconds(offset.start)
+        return None
+
+    def chapters(self):
+        """[{"title", "line", "start"}] with one chapter per chunk, titled
+        with the start of its first line; start is in seconds"""
+        chapters = []
+        for chunk in self.chunks:
+            if not chunk.turns:
+                continue
+            _, text, line = chunk.turns[0]
+            title = text if len(text) <= CHAPTER_TITLE_CHARS else text[:CHAPTER_TITLE_CHARS].rstrip() + "…"
+            chapters.append({"title": title, "line": line, "start": round(self.seconds(chunk.start), 3)})
+        return chapters
+
+
+def plan_incremental(turns, max_bytes, previous, settings_key, first_bytes=None):
+    """Plan an episode so that unchanged runs of turns keep the chunking
+    they had in previous, a saved EpisodeIndex.
+
+    Pieces of the new transcript are diffed against the previous render.
+    Every previous chunk whose pieces are all kept, in order, becomes a
+    PlannedChunk with audio_path set to its existing audio. Only the pieces
+    in between are packed into new requests, starting from first_bytes when
+    they open the episode (see chunk_planner.pack_pieces). Returns a
+    ChunkPlan.
+    """
+    pieces = list(iter_pieces(turns, max_bytes))
+    if previous is None or previous.settings_key != settings_key:
+        return ChunkPlan(list(pack_pieces(pieces, max_bytes, first_bytes)), max_bytes)
+
+    old_pieces = []
+    old_chunk_ranges = []
+    for chunk in previous.chunks:
+        start = len(old_pieces)
+        old_pieces.extend((voice, text) for voice, text, _ in chunk.turns)
+        old_chunk_ranges.append((start, len(old_pieces), chunk))
+
+    new_keys = [(speaker, text) for speaker, text, _ in pieces]
+    matcher = SequenceMatcher(None, old_pieces, new_keys, autojunk=False)
+    blocks = [block for block in matcher.get_matching_blocks() if block.size]
+
+    # New piece position -> (previous chunk, pieces it covers)
+    reusable = {}
+    block_index = 0
+    for start, end, chunk in old_chunk_ranges:
+        while block_index < len(blocks) and blocks[block_index].a + blocks[block_index].size < end:
+            block_index += 1
+        if block_index == len(blocks):
+            break
+        block = blocks[block_index]
+        if block.a <= start and end <= block.a + block.size and end > start and os.path.isfile(chunk.path):
+            reusable[block.b + start - block.a] = (chunk, end - start)
+
+    chunks = []
+    pending = []
+    position = 0
+    while position < len(pieces):
+        match = reusable.get(position)
+        if match is None:
+            pending.append(pieces[position])
+            position += 1
+            continue
+        chunks.extend(pack_pieces(pending, max_bytes, None if chunks else first_bytes))
+        pending = []
+        chunk, count = match
+        kept = pieces[position:position + count]
+        chunks.append(PlannedChunk([(speaker, text) for speaker, text, _ in kept],
+                                   sum(turn_bytes(speaker, text) for speaker, text, _ in kept),
+                                   [line for _, _, line in kept],
+                                   audio_path=chunk.path))
+        position += count
+    chunks.extend(pack_pieces(pending, max_bytes, None if chunks else first_bytes))
+    return ChunkPlan(chunks, max_bytes)
@@ -0,0 +1,314 @@
+import json
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+from app_config import Config
+from audio_utils import StreamEncoder
+import metrics
+
+ROUTE_PREFIX = "/episodes/"
+METRICS_ROUTE = "/metrics"
+READ_BLOCK_BYTES = 64 * 1024
+TRANSCRIPT_NAME = "transcript.txt"
+# Name of the growing stream of a job's parts
+LIVE_NAME = "live"
+# Seconds between checks for new parts while a live stream waits
+LIVE_POLL_SECONDS = 0.5
+# Published list of a job's parts, polled by the in-page live player
+MANIFEST_NAME = "parts.json"
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+# /episodes/<job id>/<file name>
+_EPISODE_PATTERN = re.compile(r'^([0-9a-f]{32})/([^/]+)$')
+
+mimetypes.add_type("audio/mp4", ".m4a")
+mimetypes.add_type("audio/ogg", ".ogg")
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def parse_range(header, size):
+    """Translate a single-range Range header into inclusive (start, end).
+
+    Returns None when the whole file should be sent and raises ValueError
+    for ranges that cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: fall back to the full body
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+def job_file(job, name):
+    """Path of the file of job that is served as name, or None.
+
+    Only a finished job's encoded episode and transcript are served (parts
+    are only reachable through the live stream). Nothing else in the output
+    directory is reachable, whatever the request path.
+    """
+    if job is None or not job.output_path:
+        return None
+    allowed = {
+        os.path.basename(job.output_path): job.output_path,
+        TRANSCRIPT_NAME: os.path.join(job.workdir, TRANSCRIPT_NAME),
+    }
+    path = allowed.get(name)
+    if path is None or not os.path.isfile(path):
+        return None
+    return path
+
+
+class EpisodeRequestHandler(BaseHTTPRequestHandler):
+    """Serve the outputs of generation jobs from disk with HTTP Range
+    support, and this process's metrics in Prometheus text format at
+    /metrics for clients that metrics.scrape_allowed lets in"""
+
+    # Job ID -> job_queue.Job or None; set by ensure_started
+    get_job = None
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        request = urlparse(self.path)
+        if request.path == METRICS_ROUTE:
+            self._serve_metrics(send_body)
+            return
+        match = None
+        if request.path.startswith(ROUTE_PREFIX):
+            match = _EPISODE_PATTERN.match(unquote(request.path[len(ROUTE_PREFIX):]))
+        if match is None:
+            self.send_error(404)
+            return
+
+        job_id, name = match.groups()
+        if name == LIVE_NAME:
+            self._serve_live(job_id, send_body)
+            return
+        path = job_file(self.get_job(job_id), name)
+        if path is None:
+            self.send_error(404)
+            return
+
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_range(self.headers.get("Range"), size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        length = end - start + 1 if size else 0
+
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", "private, max-age=3600")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        if "download" in parse_qs(request.query):
+            self.send_header("Content-Disposition",
+                             f"attachment; filename=\"{os.path.basename(path)}\"")
+        self.end_headers()
+
+        if not send_body:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                block = f.read(min(READ_BLOCK_BYTES, remaining))
+                if not block:
+                    break
+                try:
+                    self.wfile.write(block)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Browsers routinely drop a range request when seeking
+                    return
+                remaining -= len(block)
+
+    def _serve_live(self, job_id, send_body):
+        """Send a job's parts in order as one growing WAV or MP3 stream,
+        waiting for each to be synthesized; the response ends with the job"""
+        job = self._wait_for_parts(job_id, 0)
+        if job is None or not job.chunks:
+            self.send_error(404)
+            return
+
+        mime_type = job.chunks[0][2]
+        self.send_response(200)
+        self.send_header("Content-Type", mime_type)
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if not send_body:
+            return
+
+        encoder = StreamEncoder(mime_type == "audio/mpeg")
+        sent = 0
+        while job is not None:
+            for _, path, _ in job.chunks[sent:]:
+                try:
+                    with open(path, 'rb') as f:
+                        self.wfile.write(encoder.body(f.read()))
+                except OSError:
+                    # The listener went away, or the part was replaced by a
+                    # newer render of the episode
+                    return
+                sent += 1
+            if job.finished:
+                return
+            job = self._wait_for_parts(job_id, sent)
+
+    def _wait_for_parts(self, job_id, count):
+        """The job once it has more than count parts or has finished, or None
+        if it is gone"""
+        while True:
+            job = self.get_job(job_id)
+            if job is None or job.finished or len(job.chunks) > count:
+                return job
+            time.sleep(LIVE_POLL_SECONDS)
+
+    def _serve_metrics(self, send_body):
+        if not metrics.scrape_allowed(self.client_address[0], self.headers.get("Authorization"),
+                                      Config.METRICS_TOKEN):
+            self.send_error(403)
+            return
+        body = metrics.REGISTRY.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EpisodePublisher:
+    """Publish the files browsers may fetch for each job under
+    directory/<job id>/, for Streamlit's static file serving.
+
+    Only finished parts, the encoded episode, the transcript and a manifest
+    of the parts are published; job workdirs stay private. Files are hard
+    linked where the filesystem allows, so publishing copies nothing.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _job_directory(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def publish(self, job_id, path, name=None):
+        """Make the file at path available as name (its own name by default)"""
+        directory = self._job_directory(job_id)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, name or os.path.basename(path))
+        if os.path.exists(target) and os.path.samefile(path, target):
+            # Already linked (renaming a link onto itself would be a no-op)
+            return
+        temporary_path = f"{target}.tmp"
+        if os.path.lexists(temporary_path):
+            os.remove(temporary_path)
+        try:
+            os.link(path, temporary_path)
+        except OSError:
+            # Another filesystem: fall back to a copy
+            shutil.copyfile(path, temporary_path)
+        os.replace(temporary_path, target)
+
+    def write_manifest(self, job_id, parts, finished):
+        """Publish the names of the job's parts, in order, and whether more
+        are coming"""
+        directory = self._job_directory(job_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"parts": parts, "finished": finished}, f)
+            os.replace(temporary_path, os.path.join(directory, MANIFEST_NAME))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def remove(self, job_id):
+        shutil.rmtree(self._job_directory(job_id), ignore_errors=True)
+
+
+def enabled():
+    """Browsers fetch episodes from this server only when they have a URL
+    for it; otherwise the UI links to the published static copies"""
+    return bool(Config.EPISODE_PUBLIC_URL)
+
+
+def ensure_started(get_job):
+    """Start the episode server once per process, in a daemon thread.
+
+    get_job maps a job ID to its job_queue.Job, or None.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            EpisodeRequestHandler.get_job = staticmethod(get_job)
+            _server = ThreadingHTTPServer(
+                (Config.EPISODE_SERVER_HOST, Config.EPISODE_SERVER_PORT),
+                EpisodeRequestHandler
+            )
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="episode-server", daemon=True).start()
+        return _server
+
+
+def live_url(job_id):
+    """Public URL of the growing stream of a job's parts"""
+    return f"{Config.EPISODE_PUBLIC_URL.rstrip('/')}{ROUTE_PREFIX}{job_id}/{LIVE_NAME}"
+
+
+def static_url(job_id, name=""):
+    """URL, relative to the Streamlit page, of a file an EpisodePublisher
+    published for a job (of its directory when name is empty)"""
+    return f"{Config.EPISODE_STATIC_URL.strip('/')}/{job_id}/{quote(name)}"
+
+
+def episode_url(job_id, path, download=False):
+    """URL of one of a job's finished files (see job_file): on the episode
+    server when it is enabled, otherwise the published static copy"""
+    if not enabled():
+        return static_url(job_id, os.path.basename(path))
+    url = f"{Config.EPISODE_PUBLIC_URL.rstrip('/')}{ROUTE_PREFIX}{job_id}/{quote(os.path.basename(path))}"
+    return f"{url}?download=1" if download else url
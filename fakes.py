@@ -0,0 +1,165 @@
+import io
+import random
+import threading
+import time
+import wave
+from types import SimpleNamespace
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud import texttospeech_v1beta1
+
+from app_config import Config
+
+
+class FakeGenerativeModel:
+    """Local stand-in for vertexai's GenerativeModel.
+
+    Replies with a fixed transcript after latency seconds, emitted in pieces
+    of piece_chars characters with piece_delay seconds between them when
+    streaming, and all at once after the same total delay otherwise.
+    """
+
+    def __init__(self, transcript, piece_chars=40, piece_delay=0.01, latency=0.0):
+        self.transcript = transcript
+        self.piece_chars = piece_chars
+        self.piece_delay = piece_delay
+        self.latency = latency
+        self.calls = 0
+
+    def _pieces(self):
+        time.sleep(self.latency)
+        for start in range(0, len(self.transcript), self.piece_chars):
+            time.sleep(self.piece_delay)
+            yield SimpleNamespace(text=self.transcript[start:start + self.piece_chars])
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._pieces()
+        return SimpleNamespace(text="".join(piece.text for piece in self._pieces()))
+
+    def count_tokens(self, contents):
+        return SimpleNamespace(total_tokens=len(str(contents)) // 4)
+
+
+class FakeTextToSpeechClient:
+    """Local stand-in for texttospeech_v1beta1.TextToSpeechClient.
+
+    Returns LINEAR16 WAV (or MP3, when asked for) audio sized to the input
+    text, so PodcastGenerator can run without credentials or network. Each
+    call takes latency seconds plus up to latency_jitter more, and fails
+    with error (an exception class) with probability error_rate. With
+    noise=True the PCM is low-level noise instead of silence.
+    """
+
+    def __init__(self, latency=0.05, sample_rate=24000, samples_per_char=600, latency_jitter=0.0,
+                 error_rate=0.0, error=api_exceptions.ResourceExhausted, noise=False, seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.sample_rate = sample_rate
+        self.samples_per_char = samples_per_char
+        self.error_rate = error_rate
+        self.error = error
+        self.noise = noise
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        try:
+            time.sleep(delay)
+            if failed:
+                raise self.error("Injected fake TTS failure")
+            text_length = sum(len(turn.text) for turn in input.multi_speaker_markup.turns)
+            num_samples = text_length * self.samples_per_char
+            if audio_config is not None and audio_config.audio_encoding == texttospeech_v1beta1.AudioEncoding.MP3:
+                audio = _silent_mp3(num_samples)
+            else:
+                audio = pcm_wav(num_samples, self.sample_rate, noise=self.noise)
+            return SimpleNamespace(audio_content=audio)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+_QUIET_HIGH_BYTES = bytes((b & 0x07) | (0xf8 if b & 0x04 else 0) for b in range(256))
+
+
+def pcm_wav(num_samples, sample_rate=24000, noise=False):
+    """Mono LINEAR16 WAV bytes of num_samples silent (or noisy) samples"""
+    if noise:
+        rng = random.Random(num_samples)
+        frames = bytearray(num_samples * 2)
+        frames[0::2] = rng.randbytes(num_samples)
+        # Sign-extend three random bits into the high byte: peaks around -30 dBFS
+        frames[1::2] = rng.randbytes(num_samples).translate(_QUIET_HIGH_BYTES)
+    else:
+        frames = b'\x00\x00' * num_samples
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def make_transcript(turns, words_per_turn=25, seed=0):
+    """A two-host transcript of turns lines, using the configured names"""
+    rng = random.Random(seed)
+    words = ["podcast", "audio", "really", "interesting", "latency", "think", "about", "the",
+             "stream", "episode", "voice", "cache", "pipeline", "and", "so", "what", "if", "we"]
+    speakers = (Config.SPEAKER_1_NAME, Config.SPEAKER_2_NAME)
+    lines = []
+    for i in range(turns):
+        sentence = " ".join(rng.choice(words) for _ in range(words_per_turn))
+        lines.append(f"{speakers[i % 2]}: {sentence.capitalize()}{'?' if i % 3 == 0 else '.'}")
+    return "\n".join(lines)
+
+
+def make_pdf(page_texts):
+    """Bytes of a minimal PDF with one page per ASCII text in page_texts"""
+    page_ids = [4 + 2 * i for i in range(len(page_texts))]
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(page_texts)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id, text in zip(page_ids, page_texts):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
+
+
+# MPEG-2 Layer III, 32 kbps, 24 kHz, mono; an all-zero body decodes as silence
+_MP3_FRAME = b'\xff\xf3\x44\xc4' + b'\x00' * 92
+_MP3_SAMPLES_PER_FRAME = 576
+
+
+def _silent_mp3(num_samples):
+    frames = max(1, -(-num_samples // _MP3_SAMPLES_PER_FRAME))
+    return b'ID3\x03\x00\x00\x00\x00\x00\x00' + _MP3_FRAME * frames
@@ -0,0 +1,343 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from audio_utils import audio_duration
+from episode_index import index_path
+import analytics
+import episode_server
+import metrics
+import pipeline
+import resources
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    owner_pid INTEGER NOT NULL,
+    workdir TEXT NOT NULL,
+    chunks_done INTEGER NOT NULL DEFAULT 0,
+    chunks_total INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    PRIMARY KEY (job_id, chunk_index)
+);
+"""
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Job:
+    """Snapshot of a job row"""
+
+    def __init__(self, row, chunks=()):
+        self.id = row["id"]
+        self.status = row["status"]
+        self.workdir = row["workdir"]
+        self.chunks_done = row["chunks_done"]
+        self.chunks_total = row["chunks_total"]
+        self.output_path = row["output_path"]
+        self.error = row["error"]
+        self.created_at = row["created_at"]
+        self.updated_at = row["updated_at"]
+        # (chunk_index, path, mime_type) for chunks already synthesized
+        self.chunks = list(chunks)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def progress(self):
+        if not self.chunks_total:
+            return 0.0
+        return self.chunks_done / self.chunks_total
+
+
+class JobStore:
+    """Job state persisted in SQLite, shared by every thread and process"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def create(self, job_id, workdir):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, owner_pid, workdir, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, os.getpid(), workdir, now, now)
+            )
+
+    def mark_running(self, job_id, chunks_total):
+        self._update(job_id, status=RUNNING, chunks_total=chunks_total)
+
+    def add_chunk(self, job_id, chunk_index, path, mime_type):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_chunks (job_id, chunk_index, path, mime_type) VALUES (?, ?, ?, ?)",
+                (job_id, chunk_index, path, mime_type)
+            )
+            conn.execute(
+                "UPDATE jobs SET chunks_done = chunks_done + 1, updated_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def mark_done(self, job_id, output_path):
+        self._update(job_id, status=DONE, output_path=output_path)
+
+    def mark_failed(self, job_id, error):
+        self._update(job_id, status=FAILED, error=error)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            chunks = conn.execute(
+                "SELECT chunk_index, path, mime_type FROM job_chunks WHERE job_id = ? ORDER BY chunk_index",
+                (job_id,)
+            ).fetchall()
+        return Job(row, [tuple(chunk) for chunk in chunks])
+
+    def expired(self, max_age, keep):
+        """(id, workdir) of finished jobs last updated more than max_age
+        seconds ago or not among the keep most recent; 0 turns a limit off"""
+        conditions = []
+        params = [DONE, FAILED]
+        if max_age:
+            conditions.append("updated_at < ?")
+            params.append(time.time() - max_age)
+        if keep:
+            conditions.append("id NOT IN (SELECT id FROM jobs WHERE status IN (?, ?) "
+                              "ORDER BY updated_at DESC LIMIT ?)")
+            params.extend((DONE, FAILED, keep))
+        if not conditions:
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, workdir FROM jobs WHERE status IN (?, ?) AND ({' OR '.join(conditions)})",
+                params
+            ).fetchall()
+        return [(row["id"], row["workdir"]) for row in rows]
+
+    def delete(self, job_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM job_chunks WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def fail_orphaned(self):
+        """Fail unfinished jobs whose owning process is gone"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        for row in rows:
+            if not _pid_alive(row["owner_pid"]):
+                self.mark_failed(row["id"], "Interrupted by a server restart")
+
+
+class JobQueue:
+    """Run podcast generation jobs on a bounded pool of worker threads.
+
+    Each job gets its own working directory for the transcript, chunk files
+    and combined episode, so concurrent users never share files. With a
+    publisher (episode_server.EpisodePublisher), each part is published for
+    browsers as soon as it is ready and the episode and transcript once the
+    job is done. Finished jobs past retention_seconds or retention_count (0
+    for no limit) are deleted, workdir, published files and all, at
+    start-up and whenever a job finishes.
+    """
+
+    def __init__(self, store, jobs_directory, max_workers, generator_factory, analytics_store=None,
+                 retention_seconds=0, retention_count=0, publisher=None):
+        self.store = store
+        self.jobs_directory = jobs_directory
+        self.generator_factory = generator_factory
+        self.analytics_store = analytics_store
+        self.retention_seconds = retention_seconds
+        self.retention_count = retention_count
+        self.publisher = publisher
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="podcast-job")
+        store.fail_orphaned()
+        self.prune()
+
+    def submit(self, transcript_text, transcript=None, previous_job_id=None):
+        """Queue a transcript for generation and return the job ID.
+
+        transcript is transcript_text already parsed by transcript_parser,
+        if the caller has it. previous_job_id names an earlier job of the
+        same episode whose unchanged chunks are reused.
+        """
+        previous_index = None
+        previous = self.store.get(previous_job_id) if previous_job_id else None
+        if previous is not None and previous.status == DONE:
+            previous_index = index_path(previous.workdir, "episode")
+
+        def segments(generator, workdir):
+            transcript_path = os.path.join(workdir, "transcript.txt")
+            return generator.stream_podcast(transcript_path, "episode", transcript=transcript,
+                                            previous_index=previous_index)
+
+        return self._submit(segments, transcript_text)
+
+    def submit_source(self, source_text, model, llm_cache=None):
+        """Queue raw source text for pipelined enhancement and generation.
+
+        The transcript is written to the job's workdir as the model streams it.
+        """
+        def segments(generator, workdir):
+            return pipeline.stream_source_to_podcast(
+                model, source_text, generator, "episode",
+                transcript_path=os.path.join(workdir, "transcript.txt"),
+                llm_cache=llm_cache
+            )
+
+        return self._submit(segments)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def prune(self):
+        """Delete finished jobs past the retention limits; returns how many"""
+        expired = self.store.expired(self.retention_seconds, self.retention_count)
+        root = os.path.realpath(self.jobs_directory)
+        for job_id, workdir in expired:
+            # Only ever delete directories this queue created
+            if os.path.realpath(workdir).startswith(root + os.sep):
+                shutil.rmtree(workdir, ignore_errors=True)
+            if self.publisher is not None:
+                self.publisher.remove(job_id)
+        self.store.delete([job_id for job_id, _ in expired])
+        return len(expired)
+
+    def _submit(self, segments, transcript_text=None):
+        job_id = uuid.uuid4().hex
+        workdir = os.path.join(self.jobs_directory, job_id)
+        os.makedirs(workdir, exist_ok=True)
+        if transcript_text is not None:
+            with open(os.path.join(workdir, "transcript.txt"), "w", encoding='utf-8') as f:
+                f.write(transcript_text)
+
+        self.store.create(job_id, workdir)
+        self._executor.submit(self._run, job_id, workdir, segments)
+        return job_id
+
+    def _run(self, job_id, workdir, segments):
+        start = time.perf_counter()
+        # Names of the parts published so far
+        parts = []
+        try:
+            with metrics.span("episode"):
+                generator = self.generator_factory(workdir)
+                self.store.mark_running(job_id, 0)
+
+                chunks_total = chunks = 0
+                for segment in segments(generator, workdir):
+                    chunks += 1
+                    if segment.count and segment.count != chunks_total:
+                        chunks_total = segment.count
+                        self.store.mark_running(job_id, chunks_total)
+                    self.store.add_chunk(job_id, segment.index, segment.path, segment.mime_type)
+                    if self.publisher is not None:
+                        self.publisher.publish(job_id, segment.path)
+                        parts.append(os.path.basename(segment.path))
+                        self.publisher.write_manifest(job_id, parts, False)
+
+                combined_path = generator.get_output_path("episode")
+                audio_seconds = audio_duration(combined_path)
+                output_path = generator.encode_episode(combined_path).result()
+                if self.publisher is not None:
+                    self.publisher.publish(job_id, output_path)
+                    self.publisher.publish(job_id, os.path.join(workdir, "transcript.txt"))
+            self.store.mark_done(job_id, output_path)
+            if self.analytics_store is not None:
+                self.analytics_store.record_episode(
+                    "ui", chunks, analytics.text_characters(os.path.join(workdir, "transcript.txt")),
+                    audio_seconds, time.perf_counter() - start
+                )
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            self.store.mark_failed(job_id, str(e))
+        if self.publisher is not None:
+            try:
+                # Live players stop waiting for parts
+                self.publisher.write_manifest(job_id, parts, True)
+            except OSError as e:
+                print(f"Publishing job {job_id} failed: {str(e)}")
+
+        try:
+            self.prune()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Pruning finished jobs failed: {str(e)}")
+
+
+def get_job_queue():
+    """Process-wide job queue"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(
+                JobStore(Config.JOB_DATABASE),
+                Config.JOB_DIRECTORY,
+                Config.JOB_MAX_WORKERS,
+                lambda workdir: PodcastGenerator(output_directory=workdir),
+                resources.get_analytics(),
+                Config.JOB_RETENTION_SECONDS,
+                Config.JOB_RETENTION_COUNT,
+                episode_server.EpisodePublisher(Config.EPISODE_STATIC_DIRECTORY)
+            )
+        return _queue
@@ -0,0 +1,330 @@
+import bisect
+import functools
+import hmac
+import ipaddress
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for a cache hit and a multi-minute Vertex call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, value in snapshot:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class _HistogramValue:
+    def __init__(self, bucket_count):
+        self.counts = [0] * (bucket_count + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = _HistogramValue(len(self.buckets))
+            entry.counts[bisect.bisect_left(self.buckets, value)] += 1
+            entry.count += 1
+            entry.sum += value
+            entry.max = max(entry.max, value)
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile by interpolating within its bucket"""
+        entry = self._values.get(_label_key(self.labelnames, labels))
+        return self._quantile(entry, q) if entry else None
+
+    def _quantile(self, entry, q):
+        rank = q * entry.count
+        seen = 0
+        for i, count in enumerate(entry.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else entry.max
+                return min(entry.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return entry.max
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), entry.counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(entry.sum)}")
+                lines.append(f"{self.name}_count{labels} {entry.count}")
+        return lines
+
+    def summary(self):
+        """{label values: {count, sum, mean, p50, p95, max}}"""
+        with self._lock:
+            return {
+                key: {
+                    "count": entry.count,
+                    "sum": entry.sum,
+                    "mean": entry.sum / entry.count,
+                    "p50": self._quantile(entry, 0.5),
+                    "p95": self._quantile(entry, 0.95),
+                    "max": entry.max,
+                }
+                for key, entry in self._values.items()
+            }
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), entry.counts, entry.count, entry.sum, entry.max]
+                    for key, entry in self._values.items()]
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, counts, count, total, maximum in snapshot:
+                entry = self._values.setdefault(tuple(key), _HistogramValue(len(self.buckets)))
+                entry.counts = [a + b for a, b in zip(entry.counts, counts)]
+                entry.count += count
+                entry.sum += total
+                entry.max = max(entry.max, maximum)
+
+
+class Registry:
+    """Named metrics of one process"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered differently")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """JSON-serializable summary: histogram percentiles plus counter and
+        gauge values, keyed by "label=value,..." strings"""
+        report = {}
+        for name, metric in list(self._metrics.items()):
+            if isinstance(metric, Histogram):
+                values = metric.summary()
+            else:
+                with metric._lock:
+                    values = dict(metric._values)
+            report[name] = {
+                ",".join(f"{label}={value}" for label, value in zip(metric.labelnames, key)): value
+                for key, value in values.items()
+            }
+        return report
+
+    def drain(self):
+        """Snapshot every metric and reset it, for shipping to another
+        process's registry with merge()"""
+        snapshot = {}
+        for name, metric in list(self._metrics.items()):
+            snapshot[name] = metric.snapshot()
+            metric.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "podcast_stage_seconds", "Latency of each pipeline stage", ["stage"])
+STAGE_FAILURES = REGISTRY.counter(
+    "podcast_stage_failures_total", "Pipeline stage invocations that raised", ["stage"])
+CACHE_REQUESTS = REGISTRY.counter(
+    "podcast_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+TTS_IN_FLIGHT = REGISTRY.gauge(
+    "podcast_tts_requests_in_flight", "synthesize_speech calls currently in progress")
+TTS_RETRIES = REGISTRY.counter(
+    "podcast_tts_retries_total", "TTS requests retried, by error", ["error"])
+TTS_THROTTLED_SECONDS = REGISTRY.counter(
+    "podcast_tts_throttled_seconds_total", "Time TTS requests waited for quota")
+TTS_INPUT_CHARACTERS = REGISTRY.counter(
+    "podcast_tts_input_characters_total", "Characters sent to TTS")
+TTS_AUDIO_BYTES = REGISTRY.counter(
+    "podcast_tts_audio_bytes_total", "Audio bytes returned by TTS")
+TRANSCRIPT_LINES_SKIPPED = REGISTRY.counter(
+    "podcast_transcript_lines_skipped_total", "Transcript lines left out of the audio", ["reason"])
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one observation of a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    """Decorator form of span()"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe_future(future, stage):
+    """Record the time until future resolves as one observation of stage"""
+    start = time.perf_counter()
+
+    def done(completed):
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        if completed.cancelled() or completed.exception() is not None:
+            STAGE_FAILURES.inc(stage=stage)
+
+    future.add_done_callback(done)
+    return future
+
+
+def scrape_allowed(client_host, authorization, token):
+    """Whether a /metrics request may be answered: always from loopback,
+    otherwise only with "Authorization: Bearer <token>" when a token is set"""
+    try:
+        if ipaddress.ip_address(client_host).is_loopback:
+            return True
+    except ValueError:
+        pass
+    return bool(token) and hmac.compare_digest(authorization or "", f"Bearer {token}")
+
+
+def write_report(path):
+    """Write REGISTRY.report() as JSON to path, or to stdout for "-" """
+    text = json.dumps(REGISTRY.report(), indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
@@ -0,0 +1,147 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from content_cache import make_key
+import metrics
+
+# Pages handed to a worker per task; large enough to amortize re-opening the
+# document in the worker, small enough to keep results streaming in order
+PAGES_PER_TASK = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parse_page_range(text):
+    """Parse "3-10", "5" or "7-" into a zero-based (start, stop) pair; empty
+    input means all pages"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    first, separator, last = text.partition('-')
+    start = int(first) - 1 if first.strip() else 0
+    if not separator:
+        stop = start + 1
+    else:
+        stop = int(last) if last.strip() else None
+    if start < 0 or (stop is not None and stop <= start):
+        raise ValueError(f"Invalid page range: {text}")
+    return start, stop
+
+
+def _extract_pages(path, start, stop):
+    """Worker task: extract the text of pages [start, stop)"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def get_pdf_pool(max_workers):
+    """Process pool shared by every extraction in this process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def reset_pdf_pool(pool):
+    """Forget a pool whose worker died so the next call starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def iter_page_text(path, start, stop, workers):
+    """Yield page texts in order, extracting batches in the process pool"""
+    batches = [(i, min(i + PAGES_PER_TASK, stop)) for i in range(start, stop, PAGES_PER_TASK)]
+    if workers <= 1 or len(batches) <= 1:
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(path)
+        for i in range(start, stop):
+            yield reader.pages[i].extract_text() or ""
+        return
+
+    # Batches not yet yielded are resubmitted once if a worker crashes
+    position = 0
+    for attempt in range(2):
+        pool = get_pdf_pool(workers)
+        futures = []
+        try:
+            futures = [pool.submit(_extract_pages, path, batch_start, batch_stop)
+                       for batch_start, batch_stop in batches[position:]]
+            for future in futures:
+                pages = future.result()
+                position += 1
+                yield from pages
+            return
+        except BrokenProcessPool:
+            reset_pdf_pool(pool)
+            if attempt:
+                raise
+        finally:
+            # Stop pending batches once the caller has what it needs
+            for future in futures:
+                future.cancel()
+
+
+@metrics.timed("pdf_extract")
+def extract_pdf_text(data, page_range=None, max_pages=None, max_chars=None, workers=1, cache=None):
+    """Extract the text of a PDF given as bytes.
+
+    page_range is a zero-based (start, stop) pair (stop may be None). At most
+    max_pages pages and max_chars characters are extracted. Results are
+    cached by file hash and options.
+    """
+    file_hash = hashlib.sha256(data).hexdigest()
+    cache_key = make_key(file_hash, page_range, max_pages, max_chars)
+    if cache is not None:
+        cached = cache.get_fresh(cache_key)
+        if cached is not None:
+            return cached
+
+    # Workers open the document from disk instead of receiving the bytes
+    # with every task
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        # Imported on the first upload rather than at app start
+        from PyPDF2 import PdfReader
+
+        page_count = len(PdfReader(path).pages)
+        start, stop = page_range or (0, None)
+        stop = page_count if stop is None else min(stop, page_count)
+        if max_pages is not None:
+            stop = min(stop, start + max_pages)
+
+        pages = []
+        total_chars = 0
+        page_texts = iter_page_text(path, start, stop, workers)
+        try:
+            for page_text in page_texts:
+                if max_chars is not None and total_chars + len(page_text) > max_chars:
+                    pages.append(page_text[:max_chars - total_chars])
+                    break
+                pages.append(page_text)
+                total_chars += len(page_text) + 1
+        finally:
+            page_texts.close()
+    finally:
+        os.remove(path)
+
+    text = "\n".join(pages).strip()
+    if cache is not None and text:
+        cache.put(cache_key, text)
+    return text
@@ -0,0 +1,25 @@
+import enhancer
+
+
+def _write_lines(lines, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+            f.flush()
+            yield line
+
+
+def stream_source_to_podcast(model, source_text, generator, output_filename,
+                             transcript_path=None, llm_cache=None):
+    """Enhance source_text and synthesize it in a single pipelined pass.
+
+    Transcript lines are streamed from the model, packed into chunks and sent
+    to TTS while the model is still writing later turns, so total latency
+    approaches max(LLM time, TTS time) instead of their sum. Yields
+    PodcastSegments in order; the transcript is written to transcript_path
+    as it arrives.
+    """
+    lines = enhancer.stream_enhanced_lines(model, source_text, llm_cache)
+    if transcript_path:
+        lines = _write_lines(lines, transcript_path)
+    yield from generator.stream_podcast_from_lines(lines, output_filename)
@@ -0,0 +1,204 @@
+import importlib
+import threading
+
+# The Vertex AI and TTS SDKs take seconds to import, so they are imported
+# by the getters below (or by warm_up) instead of at app start
+from analytics import AnalyticsStore
+from app_config import Config
+from content_cache import ContentCache
+from tts_cache import AudioCache
+from tts_scheduler import TtsScheduler
+
+# One lock per resource, so building one (e.g. importing the Vertex AI SDK
+# in the warm-up thread) never holds up a caller that wants another
+_tts_client_lock = threading.Lock()
+_tts_scheduler_lock = threading.Lock()
+_generative_model_lock = threading.Lock()
+_audio_cache_lock = threading.Lock()
+_llm_cache_lock = threading.Lock()
+_url_cache_lock = threading.Lock()
+_pdf_cache_lock = threading.Lock()
+_analytics_lock = threading.Lock()
+_warm_up_lock = threading.Lock()
+
+_tts_client = None
+_tts_scheduler = None
+_generative_model = None
+_audio_cache = None
+_llm_cache = None
+_url_cache = None
+_pdf_cache = None
+_analytics = None
+_warm_up_thread = None
+
+
+def get_tts_client():
+    """TextToSpeechClient shared by every session and thread in the process.
+
+    gRPC clients are thread-safe, so one channel serves all requests.
+    """
+    global _tts_client
+    if _tts_client is None:
+        with _tts_client_lock:
+            if _tts_client is None:
+                from google.cloud import texttospeech_v1beta1
+
+                _tts_client = texttospeech_v1beta1.TextToSpeechClient()
+    return _tts_client
+
+
+def share_tts_quota(workers):
+    """Limit this process to its share of the TTS quota when workers
+    processes call the service at once: quotas are per project. Call before
+    get_tts_scheduler."""
+    for name in ("TTS_REQUESTS_PER_MINUTE", "TTS_CHARACTERS_PER_MINUTE"):
+        quota = getattr(Config, name)
+        if quota:
+            setattr(Config, name, max(1, quota // workers))
+
+
+def get_tts_scheduler():
+    """Rate limiter and retry policy for TTS calls.
+
+    Quotas are per project, so every generator in the process shares it.
+    """
+    global _tts_scheduler
+    if _tts_scheduler is None:
+        with _tts_scheduler_lock:
+            if _tts_scheduler is None:
+                _tts_scheduler = TtsScheduler(
+                    requests_per_minute=Config.TTS_REQUESTS_PER_MINUTE,
+                    characters_per_minute=Config.TTS_CHARACTERS_PER_MINUTE,
+                    max_retries=Config.TTS_MAX_RETRIES,
+                    base_delay=Config.TTS_RETRY_BASE_DELAY,
+                    max_delay=Config.TTS_RETRY_MAX_DELAY
+                )
+    return _tts_scheduler
+
+
+def get_generative_model():
+    """Vertex AI GenerativeModel, initialized once per process"""
+    global _generative_model
+    if _generative_model is None:
+        with _generative_model_lock:
+            if _generative_model is None:
+                import vertexai
+                from vertexai.preview.generative_models import GenerativeModel
+
+                vertexai.init(project=Config.VERTEX_PROJECT, location=Config.VERTEX_LOCATION)
+                _generative_model = GenerativeModel(Config.VERTEX_MODEL)
+    return _generative_model
+
+
+def get_audio_cache():
+    """Process-wide TTS audio cache, or None when caching is disabled"""
+    global _audio_cache
+    if _audio_cache is None and Config.TTS_CACHE_ENABLED:
+        with _audio_cache_lock:
+            if _audio_cache is None:
+                _audio_cache = AudioCache(Config.TTS_CACHE_DIRECTORY, Config.TTS_CACHE_MAX_BYTES)
+    return _audio_cache
+
+
+def get_llm_cache():
+    """Process-wide cache of enhanced transcripts"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = ContentCache(Config.CONTENT_CACHE_DATABASE, "llm",
+                                          Config.LLM_CACHE_MAX_BYTES, Config.LLM_CACHE_TTL_SECONDS)
+    return _llm_cache
+
+
+def get_url_cache():
+    """Process-wide cache of text extracted from URLs"""
+    global _url_cache
+    if _url_cache is None:
+        with _url_cache_lock:
+            if _url_cache is None:
+                _url_cache = ContentCache(Config.CONTENT_CACHE_DATABASE, "url",
+                                          Config.URL_CACHE_MAX_BYTES, Config.URL_CACHE_TTL_SECONDS)
+    return _url_cache
+
+
+def get_pdf_cache():
+    """Process-wide cache of text extracted from PDFs, keyed by file hash"""
+    global _pdf_cache
+    if _pdf_cache is None:
+        with _pdf_cache_lock:
+            if _pdf_cache is None:
+                _pdf_cache = ContentCache(Config.CONTENT_CACHE_DATABASE, "pdf",
+                                          Config.PDF_CACHE_MAX_BYTES, Config.PDF_CACHE_TTL_SECONDS)
+    return _pdf_cache
+
+
+def get_analytics():
+    """Process-wide analytics store; its batched updates are flushed by a
+    background thread"""
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                _analytics = AnalyticsStore(Config.ANALYTICS_DATABASE, Config.ANALYTICS_FLUSH_SECONDS,
+                                            legacy_counter_file=Config.VISITOR_COUNTER_FILE)
+    return _analytics
+
+
+def health_check():
+    """Exercise each shared client with a cheap call.
+
+    A client that fails its check is dropped so the next caller rebuilds it.
+    Returns {name: error message or None}.
+    """
+    global _tts_client, _generative_model
+    results = {}
+
+    try:
+        get_tts_client().list_voices(language_code=Config.TTS_LANGUAGE_CODE, timeout=10)
+        results["tts"] = None
+    except Exception as e:
+        results["tts"] = str(e)
+        with _tts_client_lock:
+            _tts_client = None
+
+    try:
+        get_generative_model().count_tokens("ping")
+        results["vertex"] = None
+    except Exception as e:
+        results["vertex"] = str(e)
+        with _generative_model_lock:
+            _generative_model = None
+
+    return results
+
+
+def warm_up():
+    """Import the deferred modules and create and health-check the shared
+    clients in a background thread, so the first request doesn't pay for them.
+
+    Safe to call repeatedly; only the first call starts the warm-up.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is not None:
+            return _warm_up_thread
+        _warm_up_thread = threading.Thread(target=_warm_up, name="resource-warm-up", daemon=True)
+    _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def _warm_up():
+    for module in Config.WARM_UP_MODULES.split(","):
+        if module.strip():
+            try:
+                importlib.import_module(module.strip())
+            except ImportError as e:
+                print(f"Warm-up: could not import {module.strip()}: {e}")
+    get_audio_cache()
+    get_llm_cache()
+    get_url_cache()
+    get_pdf_cache()
+    for name, error in health_check().items():
+        if error:
+            print(f"Warm-up: {name} health check failed: {error}")
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from analytics import VISITORS, AnalyticsStore, text_characters
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """Open stores on one database, without background flushes unless asked"""
+    stores = []
+
+    def open_store(flush_interval=3600, legacy_counter_file=None):
+        store = AnalyticsStore(str(tmp_path / "state" / "analytics.sqlite3"), flush_interval,
+                               legacy_counter_file=legacy_counter_file)
+        stores.append(store)
+        return store
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def rows(store, table):
+    with store._connect() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_text_characters(tmp_path):
+    path = tmp_path / "transcript.txt"
+    path.write_text("héllo", encoding="utf-8")
+    assert text_characters(str(path)) == 5
+    assert text_characters(str(tmp_path / "missing.txt")) == 0
+
+
+def test_updates_are_batched_until_a_flush(open_store):
+    store = open_store()
+    store.increment("downloads")
+    store.increment("downloads", 2)
+    store.record_episode("ui", 4, 1000, 60.0, 12.0)
+    store.record_session("session")
+
+    # Counters include pending updates, but nothing is written yet
+    assert store.counter("downloads") == 3
+    assert store.counter("episodes_ui") == 1
+    assert store.visitor_count() == 1
+    assert rows(store, "episodes") == 0 and rows(store, "counters") == 0
+
+    store.flush()
+    assert rows(store, "episodes") == 1
+    assert store.counter("downloads") == 3
+    assert store.episode_stats() == {"ui": {"episodes": 1, "chunks": 4, "characters": 1000,
+                                            "audio_seconds": 60.0, "generation_seconds": 12.0}}
+    # Flushing again writes nothing twice
+    store.flush()
+    assert rows(store, "episodes") == 1
+    assert store.counter("downloads") == 3
+
+
+def test_processes_add_up_without_double_counting_sessions(open_store):
+    first, second = open_store(), open_store()
+    for store in (first, second):
+        store.increment("downloads")
+        store.record_session("shared")
+    second.record_session("other")
+    first.flush()
+    second.flush()
+
+    assert second.counter("downloads") == 2
+    assert second.visitor_count() == 2
+    # Each store sees the others' writes as of its own last flush
+    first.flush()
+    assert first.visitor_count() == 2
+
+
+def test_failed_flush_keeps_the_batch(open_store, monkeypatch):
+    store = open_store()
+    store.increment("downloads")
+    store.record_episode("api", 1, 10, 1.0, 0.5)
+
+    def broken():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_connect", broken)
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    assert store.counter("downloads") == 1
+
+    monkeypatch.undo()
+    store.increment("downloads")
+    store.flush()
+    assert store.counter("downloads") == 2
+    assert rows(store, "episodes") == 1
+
+
+def test_background_thread_flushes(open_store):
+    store = open_store(flush_interval=0.02)
+    store.record_episode("batch", 2, 20, 2.0, 1.0)
+    deadline = time.monotonic() + 5
+    while not store.episode_stats() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.episode_stats()["batch"]["episodes"] == 1
+
+
+def test_close_flushes(open_store, tmp_path):
+    store = open_store()
+    store.increment("downloads")
+    store.close()
+    assert open_store().counter("downloads") == 1
+
+
+def test_visitor_counter_file_is_migrated_once(open_store, tmp_path):
+    legacy = tmp_path / "visitor_counter.json"
+    legacy.write_text(json.dumps({"visitors": 41}), encoding="utf-8")
+    store = open_store(legacy_counter_file=str(legacy))
+    assert store.visitor_count() == 41
+
+    store.record_session("new")
+    store.flush()
+    # The file is only read while the database has no visitor count
+    legacy.write_text(json.dumps({"visitors": 1000}), encoding="utf-8")
+    assert open_store(legacy_counter_file=str(legacy)).counter(VISITORS) == 42
+
+
+@pytest.mark.parametrize("content", [None, "not json", "[1, 2]", '{"visitors": "many"}'])
+def test_unreadable_counter_file_starts_from_zero(open_store, tmp_path, content):
+    legacy = tmp_path / "visitor_counter.json"
+    if content is not None:
+        legacy.write_text(content, encoding="utf-8")
+    assert open_store(legacy_counter_file=str(legacy)).visitor_count() == 0
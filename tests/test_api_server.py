@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from audio_utils import parse_wav
+from tts_scheduler import TtsScheduler
+import api_server
+import fakes
+
+TURNS = 6
+
+
+def fake_backends(llm_latency=0.0):
+    model = fakes.FakeGenerativeModel(fakes.make_transcript(TURNS), piece_delay=0.0, latency=llm_latency)
+    client = fakes.FakeTextToSpeechClient(latency=0.0, samples_per_char=10)
+    scheduler = TtsScheduler()
+    return api_server.Backends(lambda: model,
+                               lambda workdir: PodcastGenerator(client=client, scheduler=scheduler,
+                                                                output_directory=workdir))
+
+
+@pytest.fixture(autouse=True)
+def config(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FILE_FORMAT", "wav")
+    monkeypatch.setattr(Config, "API_WORK_DIRECTORY", str(tmp_path / "api"))
+    monkeypatch.setattr(Config, "API_CORS_ORIGINS", "https://allowed.example")
+
+
+@pytest.fixture
+def app():
+    return api_server.create_app(fake_backends())
+
+
+def call_all(app, *requests):
+    """Start app on a fresh event loop, send (method, path, kwargs)
+    requests concurrently and return each one's (status, headers, body)"""
+
+    async def send(client, method, path, kwargs):
+        async with client.request(method, path, **kwargs) as response:
+            return response.status, response.headers, await response.read()
+
+    async def run():
+        async with TestClient(TestServer(app)) as client:
+            return await asyncio.gather(*(send(client, *request) for request in requests))
+
+    return asyncio.run(run())
+
+
+def call(app, method, path, **kwargs):
+    return call_all(app, (method, path, kwargs))[0]
+
+
+def test_health(app):
+    status, _, body = call(app, "GET", "/healthz")
+    assert status == 200
+    assert b'"ok"' in body
+
+
+def test_generate_streams_one_wav(app):
+    transcript = f"{Config.SPEAKER_1_NAME}: Hello there.\n{Config.SPEAKER_2_NAME}: Hi, welcome back."
+    status, headers, body = call(app, "POST", "/generate", json={"text": transcript})
+
+    assert status == 200
+    assert headers["Content-Type"] == "audio/wav"
+    assert parse_wav(body).num_samples > 0
+    # Nothing outlives the request
+    assert os.listdir(app[api_server.WORK_DIRECTORY]) == []
+
+
+@pytest.mark.parametrize("kwargs", [{"json": {}}, {"json": {"text": "  "}}, {"data": b"not json"}])
+def test_generate_rejects_bad_bodies(app, kwargs):
+    status, _, body = call(app, "POST", "/generate", **kwargs)
+    assert status == 400
+    assert b"error" in body
+
+
+def test_generate_without_turns_is_a_bad_request(app):
+    status, _, body = call(app, "POST", "/generate", json={"text": "(music only)"})
+    assert status == 400
+    assert b"No audio content" in body
+
+
+def test_enhance(app):
+    status, _, body = call(app, "POST", "/enhance", json={"text": "Some source material."})
+    assert status == 200
+    assert Config.SPEAKER_1_NAME.encode() in body
+
+
+def test_enhance_streams_lines(app):
+    status, headers, body = call(app, "POST", "/enhance?stream=1", json={"text": "Some source material."})
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/plain")
+    lines = [line for line in body.decode().split("\n") if line]
+    assert len(lines) == TURNS
+    assert lines[0].startswith(f"{Config.SPEAKER_1_NAME}: ")
+
+
+def test_cancelled_iteration_waits_for_the_running_item():
+    events = []
+
+    def items():
+        try:
+            yield 1
+            time.sleep(0.2)
+            events.append("second item")
+            yield 2
+        finally:
+            events.append("closed")
+
+    async def run():
+        stream = api_server._iterate(items())
+        assert await stream.__anext__() == 1
+        task = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # By now the request's files can safely be removed
+        return list(events)
+
+    assert asyncio.run(run()) == ["second item", "closed"]
+
+
+def test_requests_beyond_the_limit_wait_for_a_slot(monkeypatch):
+    monkeypatch.setattr(Config, "API_MAX_CONCURRENT_REQUESTS", 1)
+    # Built outside any event loop, as run_app does: the semaphore has to be
+    # created on the serving loop or contended acquires fail before 3.10
+    app = api_server.create_app(fake_backends(llm_latency=0.05))
+    results = call_all(app, *[("POST", "/enhance", {"json": {"text": f"Source {i}."}}) for i in range(3)])
+    assert [status for status, _, _ in results] == [200, 200, 200]
+
+
+def test_cors_allows_configured_origins_only(app):
+    allowed, other = call_all(app, ("OPTIONS", "/generate", {"headers": {"Origin": "https://allowed.example"}}),
+                              ("OPTIONS", "/generate", {"headers": {"Origin": "https://other.example"}}))
+    assert allowed[1]["Access-Control-Allow-Origin"] == "https://allowed.example"
+    assert "Access-Control-Allow-Origin" not in other[1]
+
+
+def test_metrics_are_served_to_loopback(app):
+    status, _, body = call(app, "GET", "/metrics")
+    assert status == 200
+    assert b"# TYPE" in body
@@ -0,0 +1,75 @@
+import pytest
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from audio_utils import audio_duration, parse_wav
+from tts_scheduler import SynthesisError, TtsScheduler
+import fakes
+
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FILE_FORMAT", "wav")
+    monkeypatch.setattr(Config, "AUDIO_POSTPROCESS", False)
+
+
+def make_generator(tmp_path, client, max_concurrency=4):
+    return PodcastGenerator(client=client, max_concurrency=max_concurrency, output_directory=str(tmp_path),
+                            scheduler=TtsScheduler(base_delay=0.01))
+
+
+def write_transcript(tmp_path, turns=80):
+    path = tmp_path / "transcript.txt"
+    path.write_text(fakes.make_transcript(turns), encoding="utf-8")
+    return str(path)
+
+
+def test_chunks_are_synthesized_concurrently_and_delivered_in_order(config, tmp_path):
+    # Jitter larger than the base latency makes requests finish out of order
+    client = fakes.FakeTextToSpeechClient(latency=0.01, latency_jitter=0.05, samples_per_char=10)
+    generator = make_generator(tmp_path, client)
+
+    segments = list(generator.stream_podcast(write_transcript(tmp_path), "episode"))
+
+    count = len(segments)
+    assert count >= 5
+    # The first request is small so the episode starts playing early
+    assert len(segments[0].audio_content) < len(segments[1].audio_content) < len(segments[2].audio_content)
+    assert [segment.index for segment in segments] == list(range(count))
+    assert {segment.count for segment in segments} == {count}
+    assert client.calls == count
+    assert 1 < client.max_in_flight <= 4
+
+    # The combined file holds every chunk's samples in transcript order
+    with open(generator.get_output_path("episode"), "rb") as f:
+        combined = f.read()
+    info = parse_wav(combined)
+    chunks = b"".join(segment.audio_content[parse_wav(segment.audio_content).data_offset:]
+                      for segment in segments)
+    assert combined[info.data_offset:] == chunks
+
+
+def test_concurrency_limit_is_respected(config, tmp_path):
+    client = fakes.FakeTextToSpeechClient(latency=0.02, samples_per_char=10)
+    list(make_generator(tmp_path, client, max_concurrency=1).stream_podcast(write_transcript(tmp_path), "episode"))
+    assert client.max_in_flight == 1
+
+
+def test_create_podcast_returns_the_combined_file(config, tmp_path):
+    client = fakes.FakeTextToSpeechClient(latency=0.0, samples_per_char=10)
+    transcript = write_transcript(tmp_path, turns=6)
+    generator = make_generator(tmp_path, client)
+    output_path = generator.create_podcast(transcript, "episode")
+
+    assert output_path == generator.get_output_path("episode")
+    characters = sum(len(line.partition(": ")[2]) for line in open(transcript, encoding="utf-8"))
+    assert audio_duration(output_path) == pytest.approx(characters * 10 / 24000, abs=0.01)
+
+
+def test_failed_chunk_fails_the_episode(config, tmp_path):
+    client = fakes.FakeTextToSpeechClient(latency=0.0, error_rate=1.0)
+    generator = PodcastGenerator(client=client, output_directory=str(tmp_path),
+                                 scheduler=TtsScheduler(max_retries=1, base_delay=0.0))
+    with pytest.raises(SynthesisError):
+        list(generator.stream_podcast(write_transcript(tmp_path), "episode"))
@@ -0,0 +1,117 @@
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import audio_encoder
+import fakes
+
+
+class FakeFfmpeg:
+    """Stands in for subprocess.run: writes the output file named last in
+    the command, after delay seconds"""
+
+    def __init__(self, delay=0.0, returncode=0, stderr=""):
+        self.delay = delay
+        self.returncode = returncode
+        self.stderr = stderr
+        self.commands = []
+        self.threads = set()
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, command, **kwargs):
+        with self._lock:
+            self.commands.append(command)
+            self.threads.add(threading.get_ident())
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if self.returncode == 0:
+                with open(command[-1], 'wb') as f:
+                    f.write(b"encoded")
+            return SimpleNamespace(returncode=self.returncode, stderr=self.stderr)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    fake = FakeFfmpeg()
+    monkeypatch.setattr(audio_encoder.subprocess, "run", fake)
+    monkeypatch.setattr(audio_encoder, "_pool", None)
+    yield fake
+    if audio_encoder._pool is not None:
+        audio_encoder._pool.shutdown(wait=True)
+
+
+@pytest.fixture
+def wav_path(tmp_path):
+    path = tmp_path / "episode.wav"
+    path.write_bytes(fakes.pcm_wav(100))
+    return str(path)
+
+
+def test_format_details():
+    assert audio_encoder.mime_type("MP3") == "audio/mpeg"
+    assert audio_encoder.output_path_for("out/episode.wav", "opus") == "out/episode.ogg"
+    assert audio_encoder.output_path_for("episode.wav", "aac") == "episode.m4a"
+    with pytest.raises(ValueError, match="flac"):
+        audio_encoder.mime_type("flac")
+
+
+def test_wav_needs_no_encode(ffmpeg, wav_path):
+    assert audio_encoder.encode_file(wav_path, "wav", "32k") == wav_path
+    assert audio_encoder.encode_async(wav_path, "wav", "32k", 2).result() == wav_path
+    assert ffmpeg.commands == []
+
+
+def test_encode_file_runs_ffmpeg(ffmpeg, wav_path):
+    output_path = audio_encoder.encode_file(wav_path, "mp3", "48k")
+    assert output_path == wav_path[:-len(".wav")] + ".mp3"
+    [command] = ffmpeg.commands
+    assert command[0] == "ffmpeg"
+    assert command[command.index("-i") + 1] == wav_path
+    assert command[command.index("-c:a") + 1] == "libmp3lame"
+    assert command[command.index("-b:a") + 1] == "48k"
+
+
+def test_ffmpeg_errors_are_raised(ffmpeg, wav_path):
+    ffmpeg.returncode = 1
+    ffmpeg.stderr = "Unknown encoder\n"
+    with pytest.raises(RuntimeError, match="ffmpeg failed to encode ogg: Unknown encoder"):
+        audio_encoder.encode_async(wav_path, "opus", "32k", 2).result()
+
+
+def test_encodes_share_a_bounded_thread_pool(ffmpeg, tmp_path):
+    ffmpeg.delay = 0.05
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"episode_{index}.wav"
+        path.write_bytes(fakes.pcm_wav(100))
+        paths.append(str(path))
+
+    futures = [audio_encoder.encode_async(path, "mp3", "32k", 2) for path in paths]
+    outputs = [future.result(timeout=5) for future in futures]
+    assert outputs == [path[:-len(".wav")] + ".mp3" for path in paths]
+    # In this process, two at a time, off the caller's thread
+    assert ffmpeg.max_running == 2
+    assert threading.get_ident() not in ffmpeg.threads
+    assert audio_encoder.get_encoder_pool(2) is audio_encoder.get_encoder_pool(4)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_real_ffmpeg_encode(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_encoder, "_pool", None)
+    wav_path = tmp_path / "episode.wav"
+    wav_path.write_bytes(fakes.pcm_wav(24000, noise=True))
+    output_path = audio_encoder.encode_async(str(wav_path), "mp3", "32k", 1).result(timeout=60)
+    with open(output_path, 'rb') as f:
+        header = f.read(3)
+    assert header == b"ID3" or header[0] == 0xFF
+    audio_encoder._pool.shutdown(wait=True)
@@ -0,0 +1,131 @@
+import io
+import math
+import wave
+
+import numpy as np
+import pytest
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from audio_postprocess import ProcessedWavAssembler, db_to_amplitude
+from audio_utils import parse_wav
+
+# One frame per millisecond keeps the arithmetic readable
+RATE = 1000
+
+
+def wav(*parts):
+    """Mono LINEAR16 WAV of the given (frames, amplitude) runs"""
+    samples = np.concatenate([np.full(frames, amplitude, dtype='<i2') for frames, amplitude in parts])
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def assemble(path, chunks, **settings):
+    options = dict(crossfade_ms=0, gap_ms=0, trim_db=0, trim_pad_ms=0, target_db=0)
+    options.update(settings)
+    with ProcessedWavAssembler(str(path), **options) as assembler:
+        for chunk in chunks:
+            assembler.append(chunk)
+    data = path.read_bytes()
+    info = parse_wav(data)
+    samples = np.frombuffer(data[info.data_offset:info.data_offset + info.data_length], dtype='<i2')
+    return samples, assembler.chunk_spans
+
+
+def test_all_steps_off_concatenates(tmp_path):
+    samples, spans = assemble(tmp_path / "out.wav", [wav((30, 1000)), wav((20, -500))])
+    assert samples.tolist() == [1000] * 30 + [-500] * 20
+    assert spans == [[0, 30], [30, 50]]
+
+
+def test_trim_drops_silence_and_keeps_the_pad(tmp_path):
+    chunk = wav((100, 0), (50, 1000), (100, 3))
+    samples, spans = assemble(tmp_path / "out.wav", [chunk], trim_db=-50)
+    assert samples.tolist() == [1000] * 50
+
+    samples, spans = assemble(tmp_path / "out.wav", [chunk], trim_db=-50, trim_pad_ms=10)
+    assert samples.tolist() == [0] * 10 + [1000] * 50 + [3] * 10
+    assert spans == [[0, 70]]
+
+
+def test_gap_separates_faded_chunks(tmp_path):
+    samples, spans = assemble(tmp_path / "out.wav", [wav((50, 1000)), wav((50, 1000))],
+                              gap_ms=20, crossfade_ms=10)
+    assert len(samples) == 120
+    assert spans == [[0, 50], [70, 120]]
+    assert not samples[50:70].any()
+    # Fade out at the end of the first chunk, fade in at the start of the next
+    assert samples[39] == 1000 and 0 < samples[49] < 100
+    assert 0 < samples[70] < 100 and samples[80] == 1000
+    assert (np.diff(samples[40:50]) <= 0).all() and (np.diff(samples[70:80]) >= 0).all()
+
+
+def test_crossfade_overlaps_chunks(tmp_path):
+    samples, spans = assemble(tmp_path / "out.wav", [wav((50, 1000)), wav((50, 1000))], crossfade_ms=10)
+    assert len(samples) == 90
+    assert spans == [[0, 50], [40, 90]]
+    # Equal-power ramps: the two gains' powers sum to one
+    phase = (np.arange(10) + 0.5) * (math.pi / 20)
+    expected = np.rint(1000 * (np.sin(phase) + np.cos(phase)))
+    assert samples[40:50].tolist() == expected.astype(int).tolist()
+    assert samples[:40].tolist() == [1000] * 40 and samples[50:80].tolist() == [1000] * 30
+    # The episode ends with a fade out
+    assert (np.diff(samples[80:]) <= 0).all() and samples[-1] < 100
+
+
+def test_crossfade_is_limited_to_a_short_chunk(tmp_path):
+    samples, spans = assemble(tmp_path / "out.wav", [wav((50, 1000)), wav((4, 1000))], crossfade_ms=10)
+    assert len(samples) == 50
+    assert spans == [[0, 50], [46, 50]]
+
+
+def test_silent_chunks_get_empty_spans(tmp_path):
+    chunks = [wav((20, 0)), wav((30, 1000)), wav((20, 0)), wav((30, 1000))]
+    samples, spans = assemble(tmp_path / "out.wav", chunks, trim_db=-50, gap_ms=10)
+    assert len(samples) == 70
+    assert spans == [[0, 0], [0, 30], [30, 30], [40, 70]]
+
+
+def test_loudness_is_normalized_to_the_target(tmp_path):
+    # Silence does not count towards the measured RMS
+    samples, _ = assemble(tmp_path / "out.wav", [wav((100, 1000), (100, 0))], target_db=-18)
+    target = round(32768 * db_to_amplitude(-18))
+    assert abs(int(samples[0]) - target) <= 1
+    assert not samples[100:].any()
+
+
+def test_gain_is_capped_by_the_peak_ceiling(tmp_path):
+    samples, _ = assemble(tmp_path / "out.wav", [wav((100, 1000), (1, 10000))], target_db=-3,
+                          peak_ceiling_db=-6)
+    assert abs(int(samples[-1]) - 32768 * db_to_amplitude(-6)) <= 1
+    assert samples.max() == samples[-1]
+
+
+def test_inaudible_gain_is_skipped(tmp_path):
+    level = round(32768 * db_to_amplitude(-18.05))
+    samples, _ = assemble(tmp_path / "out.wav", [wav((100, level))], target_db=-18)
+    assert samples.tolist() == [level] * 100
+
+
+def test_rejects_compressed_formats(tmp_path):
+    with ProcessedWavAssembler(str(tmp_path / "out.wav")) as assembler:
+        with pytest.raises(ValueError):
+            assembler.append(wav((10, 0))[:20] + b'\x03\x00' + wav((10, 0))[22:])
+
+
+@pytest.mark.parametrize("volume_gain_db", [-2.0, 2.0])
+def test_normalization_does_not_depend_on_the_tts_gain(monkeypatch, tmp_path, volume_gain_db):
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "AUDIO_POSTPROCESS", True)
+    monkeypatch.setattr(Config, "TTS_FILE_FORMAT", "wav")
+    monkeypatch.setattr(Config, "TTS_VOLUME_GAIN_DB", volume_gain_db)
+    generator = PodcastGenerator(client=object(), output_directory=str(tmp_path))
+    with generator._open_assembler(str(tmp_path / "out.wav")) as assembler:
+        assert assembler.target_db == Config.AUDIO_TARGET_LOUDNESS_DB
+        assert assembler.gap_ms == Config.AUDIO_SEAM_GAP_MS
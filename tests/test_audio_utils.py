@@ -0,0 +1,125 @@
+import struct
+
+import pytest
+
+from audio_utils import (Mp3Assembler, Mp3Index, StreamEncoder, WavAssembler, audio_duration, parse_wav,
+                         wav_header)
+import fakes
+
+
+def pcm(wav):
+    info = parse_wav(wav)
+    return bytes(wav[info.data_offset:info.data_offset + info.data_length])
+
+
+def test_parse_wav_locates_samples():
+    wav = fakes.pcm_wav(1000, noise=True)
+    info = parse_wav(wav)
+    assert info.format.sample_rate == 24000
+    assert info.format.channels == 1
+    assert info.format.bits_per_sample == 16
+    assert info.num_samples == 1000
+    assert info.data_offset + info.data_length == len(wav)
+
+
+def test_parse_wav_skips_unknown_chunks():
+    wav = fakes.pcm_wav(100, noise=True)
+    # An odd-sized LIST chunk before data is padded to an even length
+    extra = b'LIST' + struct.pack('<I', 3) + b'abc\x00'
+    data_start = wav.index(b'data')
+    patched = wav[:data_start] + extra + wav[data_start:]
+    assert pcm(patched) == pcm(wav)
+
+
+@pytest.mark.parametrize("declared", [0, 0xFFFFFFFF])
+def test_parse_wav_accepts_streaming_sizes(declared):
+    wav = fakes.pcm_wav(100, noise=True)
+    info = parse_wav(wav)
+    streamed = wav_header(info.fmt_chunk, declared) + pcm(wav)
+    assert parse_wav(streamed).num_samples == 100
+
+
+@pytest.mark.parametrize("data", [b"", b"RIFF\x00\x00\x00\x00AVI ", b"RIFF\x04\x00\x00\x00WAVE"])
+def test_parse_wav_rejects_non_wav(data):
+    with pytest.raises(ValueError):
+        parse_wav(data)
+
+
+def test_assembler_joins_samples_in_order(tmp_path):
+    parts = [fakes.pcm_wav(samples, noise=True) for samples in (2400, 100, 4800)]
+    path = tmp_path / "episode.wav"
+    with WavAssembler(str(path)) as assembler:
+        assembler.append(parts[0])
+        part_path = tmp_path / "part.wav"
+        part_path.write_bytes(parts[1])
+        assembler.append_file(str(part_path))
+        assembler.append(parts[2])
+
+    combined = path.read_bytes()
+    assert pcm(combined) == b"".join(pcm(part) for part in parts)
+    assert assembler.chunk_spans == [[0, 2400], [2400, 2500], [2500, 7300]]
+    # The header is patched with the final sizes
+    assert struct.unpack_from('<I', combined, 4)[0] == len(combined) - 8
+    assert audio_duration(str(path)) == pytest.approx(7300 / 24000)
+
+
+def test_assembler_rejects_format_mismatch(tmp_path):
+    with WavAssembler(str(tmp_path / "episode.wav")) as assembler:
+        assembler.append(fakes.pcm_wav(100))
+        with pytest.raises(ValueError, match="mismatch"):
+            assembler.append(fakes.pcm_wav(100, sample_rate=16000))
+
+
+def test_stream_encoder_sends_one_wav_header():
+    parts = [fakes.pcm_wav(samples, noise=True) for samples in (300, 200)]
+    encoder = StreamEncoder(mp3=False)
+    stream = b"".join(encoder.body(part) for part in parts)
+    assert pcm(stream) == pcm(parts[0]) + pcm(parts[1])
+
+
+def test_mp3_index_skips_tags_and_info_frame():
+    frame = fakes._MP3_FRAME
+    info_frame = frame[:4] + b'\x00' * 17 + b'Info' + b'\x00' * (len(frame) - 25)
+    data = fakes._silent_mp3(576 * 3)[:10] + info_frame + frame * 3 + b'TAG' + b'\x00' * 125
+    index = Mp3Index(data)
+    assert len(index) == 3
+    assert index.sample_rate == 24000
+    assert index.channels == 1
+    assert index.num_samples == 576 * 3
+    assert list(index.runs()) == [(10 + len(frame), 10 + 4 * len(frame))]
+
+
+def test_mp3_index_resyncs_after_garbage():
+    frame = fakes._MP3_FRAME
+    data = frame + b'\xff\x00junk' + frame
+    index = Mp3Index(data)
+    assert len(index) == 2
+    assert list(index.runs()) == [(0, len(frame)), (len(frame) + 6, len(data))]
+
+
+def test_mp3_assembler_copies_frames_only(tmp_path):
+    path = tmp_path / "episode.mp3"
+    with Mp3Assembler(str(path)) as assembler:
+        assembler.append(fakes._silent_mp3(576 * 2))
+        assembler.append(fakes._silent_mp3(576 * 3))
+
+    assert path.read_bytes() == fakes._MP3_FRAME * 5
+    assert assembler.chunk_spans == [[0, 1152], [1152, 2880]]
+    assert audio_duration(str(path)) == pytest.approx(2880 / 24000)
+
+
+def test_mp3_assembler_rejects_empty_and_mismatched_chunks(tmp_path):
+    with Mp3Assembler(str(tmp_path / "episode.mp3")) as assembler:
+        with pytest.raises(ValueError, match="no audio frames"):
+            assembler.append(b"ID3\x03\x00\x00\x00\x00\x00\x00")
+        assembler.append(fakes._silent_mp3(576))
+        # MPEG-2 Layer III at 22.05 kHz
+        other = b'\xff\xf3\x40\xc4' + b'\x00' * 100
+        with pytest.raises(ValueError, match="mismatch"):
+            assembler.append(other)
+
+
+def test_stream_encoder_strips_mp3_tags():
+    encoder = StreamEncoder(mp3=True)
+    stream = encoder.body(fakes._silent_mp3(576)) + encoder.body(fakes._silent_mp3(1152))
+    assert stream == fakes._MP3_FRAME * 3
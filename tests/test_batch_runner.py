@@ -0,0 +1,188 @@
+import json
+import os
+from concurrent.futures import Future
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from tts_scheduler import TtsScheduler
+import batch_runner
+import fakes
+import resources
+
+
+class FlakyClient(fakes.FakeTextToSpeechClient):
+    """Fails every call after the first fail_after, as if the run was cut short"""
+
+    def __init__(self, fail_after=None):
+        super().__init__(latency=0.0, samples_per_char=10, noise=True)
+        self.fail_after = fail_after
+
+    def synthesize_speech(self, **request):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise api_exceptions.InvalidArgument("Run interrupted")
+        return super().synthesize_speech(**request)
+
+
+class Recorder:
+    def __init__(self):
+        self.episodes = []
+
+    def record_episode(self, *args):
+        self.episodes.append(args)
+
+
+class InlineExecutor:
+    """ProcessPoolExecutor stand-in that runs the initializer and every task
+    in this process"""
+
+    created = []
+
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        self.created.append((max_workers, initargs))
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FILE_FORMAT", "wav")
+    monkeypatch.setattr(Config, "TTS_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(resources, "get_analytics", Recorder)
+    monkeypatch.setattr(batch_runner, "_generator", None)
+    client = FlakyClient()
+    monkeypatch.setattr(batch_runner, "PodcastGenerator",
+                        lambda output_directory: PodcastGenerator(client=client, scheduler=TtsScheduler(),
+                                                                  output_directory=output_directory))
+    return client
+
+
+@pytest.fixture
+def transcripts(tmp_path):
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    for index, name in enumerate(["first", "second"]):
+        (directory / f"{name}.txt").write_text(fakes.make_transcript(30, seed=index), encoding="utf-8")
+    (directory / "notes.md").write_text("not a transcript", encoding="utf-8")
+    return directory
+
+
+def test_load_batch_items_from_a_directory(transcripts):
+    items = batch_runner.load_batch_items(str(transcripts))
+    assert [item.name for item in items] == ["first", "second"]
+    assert items[0].input_path == str(transcripts / "first.txt")
+
+
+def test_load_batch_items_from_manifests(tmp_path):
+    (tmp_path / "text.txt").write_text("# comment\nshows/a.txt\n\nb.txt\n", encoding="utf-8")
+    items = batch_runner.load_batch_items(str(tmp_path / "text.txt"))
+    assert [(item.input_path, item.name) for item in items] == [
+        (str(tmp_path / "shows" / "a.txt"), "a"), (str(tmp_path / "b.txt"), "b")]
+
+    manifest = [{"input": "a.txt", "output": "episode_a"}, "shows/b.txt"]
+    (tmp_path / "batch.json").write_text(json.dumps(manifest), encoding="utf-8")
+    items = batch_runner.load_batch_items(str(tmp_path / "batch.json"))
+    assert [(item.input_path, item.name) for item in items] == [
+        (str(tmp_path / "a.txt"), "episode_a"), (str(tmp_path / "shows" / "b.txt"), "b")]
+
+
+def test_load_batch_items_rejects_clashing_names(tmp_path):
+    (tmp_path / "batch.txt").write_text("a/show.txt\nb/show.txt\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="show"):
+        batch_runner.load_batch_items(str(tmp_path / "batch.txt"))
+
+
+def test_checkpoint_store_round_trip(tmp_path):
+    store = batch_runner.CheckpointStore(str(tmp_path / "state" / "checkpoint.sqlite3"))
+    output = tmp_path / "episode.wav"
+    output.write_bytes(b"audio")
+    store.mark_episode_done("episode", "hash", batch_runner.EpisodeResult("episode", str(output), chunks=3))
+    assert store.completed_episode("episode", "hash")["chunks"] == 3
+    # Another transcript under the same name is not complete
+    assert store.completed_episode("episode", "other") is None
+    # Nor is an episode whose output was deleted
+    output.unlink()
+    assert store.completed_episode("episode", "hash") is None
+
+    chunk = tmp_path / "chunk.wav"
+    chunk.write_bytes(b"chunk")
+    checkpoint = store.episode("episode")
+    checkpoint.record("key", str(chunk))
+    assert checkpoint.load("key") == b"chunk"
+    assert checkpoint.load("missing") is None
+    assert checkpoint.resumed == 1
+    # Chunks are kept per episode
+    assert store.chunk_path("other", "key") is None
+
+
+def test_run_batch_renders_every_episode(client, transcripts, tmp_path):
+    output = tmp_path / "output"
+    summary = batch_runner.run_batch(str(transcripts), workers=1, output_directory=str(output))
+
+    assert [result.name for result in summary.rendered] == ["first", "second"]
+    assert summary.failed == [] and summary.skipped == []
+    for result in summary.rendered:
+        assert os.path.isfile(result.output_path)
+        assert result.chunks > 1 and result.resumed == 0
+        assert result.audio_seconds > 0
+    assert client.calls == sum(result.chunks for result in summary.rendered)
+    assert "2 rendered, 0 skipped" in summary.report()
+
+
+def test_completed_episodes_are_skipped(client, transcripts, tmp_path):
+    output = str(tmp_path / "output")
+    batch_runner.run_batch(str(transcripts), workers=1, output_directory=output)
+    calls = client.calls
+
+    # An edited transcript is rendered again, the other one is skipped
+    (transcripts / "second.txt").write_text(fakes.make_transcript(30, seed=5), encoding="utf-8")
+    summary = batch_runner.run_batch(str(transcripts), workers=1, output_directory=output)
+    assert [result.name for result in summary.skipped] == ["first"]
+    assert [result.name for result in summary.rendered] == ["second"]
+    assert summary.skipped[0].chunks > 1
+    assert client.calls > calls
+
+
+def test_interrupted_episodes_resume_from_their_checkpoint(client, transcripts, tmp_path):
+    output = str(tmp_path / "output")
+    (transcripts / "second.txt").unlink()
+    client.fail_after = 3
+    summary = batch_runner.run_batch(str(transcripts), workers=1, output_directory=output)
+    assert [result.name for result in summary.failed] == ["first"]
+    assert "Run interrupted" in summary.failed[0].error
+
+    client.fail_after = None
+    client.calls = 0
+    summary = batch_runner.run_batch(str(transcripts), workers=1, output_directory=output)
+    [result] = summary.rendered
+    assert result.resumed == 3
+    assert client.calls == result.chunks - 3
+    assert "3 resumed from checkpoint" in summary.report()
+
+
+def test_worker_processes_split_the_tts_quota(client, transcripts, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_REQUESTS_PER_MINUTE", 300)
+    monkeypatch.setattr(batch_runner, "ProcessPoolExecutor", InlineExecutor)
+    monkeypatch.setattr(InlineExecutor, "created", [])
+    summary = batch_runner.run_batch(str(transcripts), workers=8, output_directory=str(tmp_path / "output"))
+
+    assert len(summary.rendered) == 2
+    # No more workers than episodes, each with its share of the quota
+    assert InlineExecutor.created == [(2, (2,))]
+    assert Config.TTS_REQUESTS_PER_MINUTE == 150
@@ -0,0 +1,37 @@
+import sys
+
+import pytest
+
+from app_config import Config
+import benchmark
+
+
+def test_percentile_interpolates():
+    samples = [4, 1, 3, 2]
+    assert benchmark.percentile(samples, 0.0) == 1
+    assert benchmark.percentile(samples, 0.5) == 2.5
+    assert benchmark.percentile(samples, 1.0) == 4
+    assert benchmark.percentile([7], 0.95) == 7
+
+
+def test_time_runs_skips_warmup():
+    calls = []
+    durations = benchmark.time_runs(lambda: calls.append(1), repeat=3, warmup=2)
+    assert len(calls) == 5
+    assert len(durations) == 3
+
+
+@pytest.mark.parametrize("argv, rows", [
+    (["end-to-end", "--turns", "4", "8", "--repeat", "1", "--latency", "0", "--jitter", "0"], ["4", "8"]),
+    (["combine", "--chunks", "2", "--chunk-seconds", "0.5", "--repeat", "1"], ["2"]),
+    (["combine", "--chunks", "2", "--chunk-seconds", "0.5", "--repeat", "1", "--postprocess"], ["2"]),
+    (["parse", "--lines", "50", "--repeat", "1"], ["50", "50"]),
+])
+def test_offline_benchmarks_run(argv, rows, monkeypatch, capsys):
+    # Benchmarks toggle the audio cache on Config; restored afterwards
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", Config.TTS_CACHE_ENABLED)
+    monkeypatch.setattr(sys, "argv", ["benchmark.py"] + argv)
+    benchmark.main()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines if line.strip() and line.split()[0].isdigit()] == rows
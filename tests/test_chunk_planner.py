@@ -0,0 +1,84 @@
+import pytest
+
+from chunk_planner import iter_chunks, plan_chunks, split_text, turn_bytes
+import fakes
+from transcript_parser import parse_transcript
+
+
+def byte_length(text):
+    return len(text.encode('utf-8'))
+
+
+def test_short_text_is_one_piece():
+    assert split_text("Hello there. How are you?", 100) == ["Hello there. How are you?"]
+
+
+def test_long_text_is_split_at_sentence_ends():
+    text = "First sentence here. Second one is a bit longer! Is this the third? Yes."
+    pieces = split_text(text, 40)
+    assert pieces == ["First sentence here.", "Second one is a bit longer!", "Is this the third? Yes."]
+
+
+def test_long_sentence_is_split_between_words():
+    text = "word " * 30 + "end."
+    pieces = split_text(text.strip(), 24)
+    assert all(byte_length(piece) <= 24 for piece in pieces)
+    assert " ".join(pieces) == text.strip()
+
+
+@pytest.mark.parametrize("word, max_bytes", [("é" * 40, 15), ("日本語" * 10, 10), ("🎙" * 9, 6)])
+def test_oversized_words_are_cut_on_character_boundaries(word, max_bytes):
+    pieces = split_text(word, max_bytes)
+    assert len(pieces) > 1
+    # Every piece is whole characters, so nothing is lost or garbled
+    assert "".join(pieces) == word
+    assert all(0 < byte_length(piece) <= max_bytes for piece in pieces)
+
+
+def test_oversized_turn_is_spread_over_chunks():
+    text = " ".join(f"Sentence number {i} is about the podcast café." for i in range(100))
+    chunks = list(iter_chunks([("Alex", text)], 500))
+    assert len(chunks) > 1
+    assert all(chunk.size <= 500 for chunk in chunks)
+    assert all(speaker == "Alex" for chunk in chunks for speaker, _ in chunk.turns)
+    assert " ".join(piece for chunk in chunks for _, piece in chunk.turns) == text
+
+
+@pytest.mark.parametrize("first_bytes", [None, 300])
+def test_every_chunk_fits_the_budget(first_bytes):
+    turns = [("Alex", "Short."), ("Sam", "Ünïcödé " * 200), ("Alex", "日本語のテキスト。" * 50),
+             ("Sam", "x" * 3000), ("Alex", "Done.")]
+    plan = plan_chunks(turns, 1000, first_bytes=first_bytes)
+    assert all(size <= 1000 for size in plan.request_bytes)
+    assert all(chunk.size == sum(turn_bytes(speaker, text) for speaker, text in chunk.turns)
+               for chunk in plan.chunks)
+    # Turns stay in order and keep their speaker
+    speakers = [speaker for chunk in plan.chunks for speaker, _ in chunk.turns]
+    assert speakers[0] == "Alex" and speakers[-1] == "Alex"
+    assert plan.chunks[-1].turns[-1] == ("Alex", "Done.")
+
+
+def test_chunks_keep_transcript_lines():
+    transcript = parse_transcript(fakes.make_transcript(10))
+    plan = plan_chunks(transcript.turns, 300, transcript)
+    lines = [line for chunk in plan.chunks for line in chunk.lines]
+    assert lines == sorted(lines)
+    assert set(lines) == {turn.line for turn in transcript.turns}
+    assert plan.summary().startswith(f"{plan.request_count} requests")
+
+
+def test_first_chunk_is_small_and_later_ones_ramp_up():
+    turns = parse_transcript(fakes.make_transcript(40)).turns
+    sizes = [chunk.size for chunk in iter_chunks(turns, 4500, first_bytes=500)]
+
+    # Each budget doubles from the first: 500, 1000, 2000, then 4500
+    for size, budget in zip(sizes, (500, 1000, 2000, 4500, 4500)):
+        assert size <= budget
+    assert sizes == sorted(sizes)
+    assert sum(sizes) == sum(chunk.size for chunk in iter_chunks(turns, 4500))
+
+
+def test_without_first_bytes_chunks_fill_the_budget():
+    turns = parse_transcript(fakes.make_transcript(40)).turns
+    sizes = [chunk.size for chunk in iter_chunks(turns, 4500)]
+    assert sizes[0] > 4000
@@ -0,0 +1,98 @@
+import pytest
+
+from content_cache import ContentCache, make_key
+import content_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(content_cache.time, "time", lambda: now[0])
+    return now
+
+
+def make_cache(tmp_path, namespace="llm", max_bytes=100, ttl_seconds=60):
+    return ContentCache(str(tmp_path / "state" / "content.sqlite3"), namespace, max_bytes, ttl_seconds)
+
+
+def test_make_key_is_stable():
+    assert make_key("a", {"x": 1, "y": 2}) == make_key("a", {"y": 2, "x": 1})
+    assert make_key("a", 1) != make_key("a", "1")
+
+
+def test_round_trip_and_counts(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    assert cache.get("key") is None
+    cache.put("key", "välue", {"source": "test"})
+    entry = cache.get("key")
+    assert entry.value == "välue"
+    assert entry.metadata == {"source": "test"}
+    assert entry.fresh and entry.stored_at == 1000.0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_go_stale_after_the_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.put("key", "value")
+    clock[0] += 59
+    assert cache.get_fresh("key") == "value"
+
+    clock[0] += 1
+    # Stale entries are still returned for revalidation, but not as fresh
+    entry = cache.get("key")
+    assert entry.value == "value" and not entry.fresh
+    assert cache.get_fresh("key") is None
+    assert cache.misses == 2
+
+    cache.refresh("key")
+    assert cache.get_fresh("key") == "value"
+
+
+def test_values_over_the_bound_are_not_stored(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=10)
+    cache.put("key", "x" * 11)
+    assert cache.get("key") is None
+    # The bound is in UTF-8 bytes, not characters
+    cache.put("key", "é" * 6)
+    assert cache.get("key") is None
+    cache.put("key", "é" * 5)
+    assert cache.get_fresh("key") == "é" * 5
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=100)
+    for key in "abc":
+        clock[0] += 1
+        cache.put(key, "x" * 30)
+    # Reading "a" makes "b" the least recently used
+    clock[0] += 1
+    cache.get("a")
+    clock[0] += 1
+    cache.put("d", "x" * 30)
+    assert [key for key in "abcd" if cache.get(key) is not None] == ["a", "c", "d"]
+
+    # Eviction goes as far as needed
+    clock[0] += 1
+    cache.put("e", "x" * 90)
+    assert [key for key in "acde" if cache.get(key) is not None] == ["e"]
+
+
+def test_replacing_an_entry_does_not_count_twice(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=100)
+    cache.put("a", "x" * 60)
+    cache.put("a", "y" * 60)
+    assert cache.get_fresh("a") == "y" * 60
+
+
+def test_namespaces_have_separate_quotas(tmp_path, clock):
+    llm = make_cache(tmp_path, "llm", max_bytes=50)
+    url = make_cache(tmp_path, "url", max_bytes=50)
+    llm.put("key", "x" * 40)
+    url.put("key", "y" * 40)
+    assert llm.get_fresh("key") == "x" * 40
+    assert url.get_fresh("key") == "y" * 40
+
+
+def test_entries_are_shared_through_the_database(tmp_path, clock):
+    make_cache(tmp_path).put("key", "value")
+    assert make_cache(tmp_path).get_fresh("key") == "value"
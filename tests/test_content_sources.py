@@ -0,0 +1,123 @@
+import time
+
+import pytest
+import requests
+
+from app_config import Config
+from content_cache import ContentCache
+import content_sources
+
+ARTICLE = "<html><body><p>Local article</p></body></html>"
+
+
+@pytest.fixture(autouse=True)
+def parse_body(monkeypatch):
+    # Stands in for newspaper so the tests only exercise the download side
+    monkeypatch.setattr(content_sources, "parse_article_html", lambda url, html: f"parsed {len(html)}")
+
+
+def send_body(body, headers=(), content_length=True):
+    def route(handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        if content_length:
+            handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+    return route
+
+
+def test_fetch_returns_parsed_text(http_server):
+    http_server.routes["/article"] = send_body(ARTICLE.encode())
+    assert content_sources.fetch_article_text(http_server.url("/article")) == f"parsed {len(ARTICLE)}"
+
+
+def test_declared_length_over_cap_is_refused(http_server, monkeypatch):
+    monkeypatch.setattr(Config, "URL_MAX_BYTES", 1000)
+    http_server.routes["/big"] = send_body(b"x" * 2000)
+    with pytest.raises(ValueError, match="too large"):
+        content_sources.fetch_article_text(http_server.url("/big"))
+
+
+def test_undeclared_body_over_cap_is_cut_off(http_server, monkeypatch):
+    monkeypatch.setattr(Config, "URL_MAX_BYTES", 1000)
+    # HTTP/1.0 without Content-Length: the body runs until the connection closes
+    http_server.routes["/big"] = send_body(b"x" * 200_000, content_length=False)
+    with pytest.raises(ValueError, match="larger than"):
+        content_sources.fetch_article_text(http_server.url("/big"))
+
+
+def test_trickling_server_hits_the_deadline(http_server, monkeypatch):
+    monkeypatch.setattr(Config, "URL_FETCH_TIMEOUT", 0.5)
+
+    def trickle(handler):
+        handler.send_response(200)
+        handler.send_header("Content-Length", "100")
+        handler.end_headers()
+        # Each byte arrives well within the read timeout
+        for _ in range(100):
+            try:
+                handler.wfile.write(b"x")
+                handler.wfile.flush()
+            except OSError:
+                return
+            time.sleep(0.05)
+
+    http_server.routes["/slow"] = trickle
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        content_sources.fetch_article_text(http_server.url("/slow"))
+    assert time.monotonic() - start < 2
+
+
+def test_http_error_is_raised(http_server):
+    with pytest.raises(requests.HTTPError):
+        content_sources.fetch_article_text(http_server.url("/missing"))
+
+
+def revalidating_route(etag):
+    def route(handler):
+        if handler.headers.get("If-None-Match") == etag:
+            handler.send_response(304)
+            handler.end_headers()
+            return
+        send_body(ARTICLE.encode(), headers=[("ETag", etag)])(handler)
+    return route
+
+
+def test_stale_entry_is_revalidated_with_etag(http_server, tmp_path, monkeypatch):
+    cache = ContentCache(str(tmp_path / "content.sqlite3"), "url", 1024 * 1024, ttl_seconds=0)
+    http_server.routes["/article"] = revalidating_route('"v1"')
+    url = http_server.url("/article")
+
+    first = content_sources.fetch_article_text(url, cache)
+    parsed = []
+    monkeypatch.setattr(content_sources, "parse_article_html", lambda url, html: parsed.append(html))
+    second = content_sources.fetch_article_text(url, cache)
+
+    assert second == first
+    assert parsed == []
+    assert http_server.requests[-1][1].get("If-None-Match") == '"v1"'
+
+
+def test_fresh_entry_skips_the_network(http_server, tmp_path):
+    cache = ContentCache(str(tmp_path / "content.sqlite3"), "url", 1024 * 1024, ttl_seconds=3600)
+    http_server.routes["/article"] = revalidating_route('"v1"')
+    url = http_server.url("/article")
+
+    content_sources.fetch_article_text(url, cache)
+    content_sources.fetch_article_text(url, cache)
+
+    assert len(http_server.requests) == 1
+
+
+def test_unconditional_304_is_an_error(http_server):
+    def not_modified(handler):
+        handler.send_response(304)
+        handler.end_headers()
+
+    http_server.routes["/article"] = not_modified
+    with pytest.raises(ValueError, match="304"):
+        content_sources.fetch_article_text(http_server.url("/article"))
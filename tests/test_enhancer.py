@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app_config import Config
+from enhancer import CHARS_PER_TOKEN, split_sections
+import enhancer
+
+
+def paragraph(index, sentences=3):
+    return " ".join(f"Paragraph {index} sentence {n} has some words in it." for n in range(sentences))
+
+
+class SectionModel:
+    """Answers each section's prompt with a line naming the part, finishing
+    later parts first so results complete out of order"""
+
+    def __init__(self):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        part, count = map(int, re.search(r"part (\d+) of (\d+)", prompt).groups())
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02 * (count - part))
+        with self._lock:
+            self.in_flight -= 1
+        return SimpleNamespace(text=f"**{Config.SPEAKER_1_NAME}**: Part {part}.\n\n"
+                                    f"{Config.SPEAKER_2_NAME}: Indeed, part {part}.")
+
+
+@pytest.fixture
+def long_documents(monkeypatch):
+    monkeypatch.setattr(Config, "LONG_DOC_SECTION_TOKENS", 100)
+    monkeypatch.setattr(Config, "ENHANCE_MAX_CONCURRENCY", 4)
+
+
+def test_short_document_is_one_section():
+    text = paragraph(0) + "\n\n" + paragraph(1)
+    assert split_sections(text, 1000) == [text]
+
+
+def test_sections_fit_and_keep_every_paragraph_in_order():
+    paragraphs = [paragraph(i) for i in range(20)]
+    sections = split_sections("\n\n".join(paragraphs), 100)
+    assert len(sections) > 1
+    assert all(len(section) <= 100 * CHARS_PER_TOKEN for section in sections)
+    # Sections only break between paragraphs
+    assert [p for section in sections for p in section.split("\n\n")] == paragraphs
+
+
+def test_sections_start_at_headings():
+    text = "\n\n".join([
+        "# Introduction", paragraph(0, 5),
+        "# Methods", paragraph(1, 5), paragraph(2, 5),
+        "RESULTS AND DISCUSSION", paragraph(3, 5),
+    ])
+    sections = split_sections(text, 100)
+    # A heading starts a new section once the current one is half full
+    assert [section.split("\n\n", 1)[0] for section in sections] == [
+        "# Introduction", "# Methods", paragraph(2, 5), "RESULTS AND DISCUSSION"]
+
+
+def test_small_sections_are_merged_across_headings():
+    text = "\n\n".join(["# One", "Short.", "# Two", "Also short.", "# Three", "Tiny."])
+    assert split_sections(text, 100) == [text]
+
+
+def test_heading_stays_with_the_paragraph_after_it():
+    # A heading that would end a full section moves to the next one
+    text = "\n\n".join([paragraph(0, 6), "2. Background", paragraph(1, 2)])
+    sections = split_sections(text, 100)
+    assert sections[-1].startswith("2. Background\n\n" + paragraph(1, 2)[:20])
+    assert not any(section.endswith("2. Background") for section in sections)
+
+
+def test_oversized_paragraph_is_split_at_sentence_ends():
+    long_paragraph = paragraph(0, 40)
+    sections = split_sections(long_paragraph, 50)
+    assert len(sections) > 1
+    assert all(len(section) <= 50 * CHARS_PER_TOKEN for section in sections)
+    assert all(section.endswith(".") for section in sections)
+    assert " ".join(sections) == long_paragraph
+
+
+def test_section_instructions_link_neighbours():
+    sections = ["First topic. More.", "Second topic.", "Third topic."]
+    first, middle, last = (enhancer.section_instructions(sections, i) for i in range(3))
+    assert "part 1 of 3" in first and "do not wrap up" in first
+    assert "Second topic." in first
+    assert "First topic." in middle and "Third topic." in middle
+    assert "Skip the opening" in last and "goodbye" in last
+
+
+def test_long_document_is_merged_in_section_order(long_documents):
+    model = SectionModel()
+    text = "\n\n".join(paragraph(i) for i in range(20))
+    count = len(split_sections(text, Config.LONG_DOC_SECTION_TOKENS))
+    assert count > 2
+
+    enhanced = enhancer.enhance_document(model, text)
+    # Sections ran concurrently and finished in reverse, but come back in order
+    assert model.max_in_flight > 1
+    expected = []
+    for part in range(1, count + 1):
+        expected += [f"{Config.SPEAKER_1_NAME}: Part {part}.", f"{Config.SPEAKER_2_NAME}: Indeed, part {part}."]
+    assert enhanced.split("\n") == expected
+    assert list(enhancer.stream_enhanced_lines(SectionModel(), text)) == expected
+
+
+def test_short_document_is_enhanced_in_one_call(long_documents):
+    calls = []
+
+    class Model:
+        def generate_content(self, prompt, generation_config=None):
+            calls.append(prompt)
+            return SimpleNamespace(text=f"{Config.SPEAKER_1_NAME}: Hello.")
+
+    assert enhancer.enhance_document(Model(), paragraph(0)) == f"{Config.SPEAKER_1_NAME}: Hello."
+    assert len(calls) == 1
+    assert "part 1 of" not in calls[0]
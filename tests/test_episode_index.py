@@ -0,0 +1,109 @@
+import pytest
+
+from episode_index import EpisodeIndex, plan_incremental
+from transcript_parser import Turn
+
+MAX_BYTES = 120
+SETTINGS = "settings-v1"
+
+
+def make_turns(texts):
+    return [Turn("voice-a" if i % 2 == 0 else "voice-b", text, i + 1) for i, text in enumerate(texts)]
+
+
+TEXTS = [f"Line number {i} talks about topic {i} for a little while." for i in range(12)]
+
+
+def render(turns, directory, previous=None):
+    """Plan like a render would and index the result, writing a stand-in
+    audio file for every newly synthesized chunk"""
+    plan = plan_incremental(turns, MAX_BYTES, previous, SETTINGS)
+    index = EpisodeIndex(24000, SETTINGS)
+    spans = []
+    for i, chunk in enumerate(plan.chunks):
+        path = chunk.audio_path
+        if path is None:
+            path = directory / f"chunk_{len(list(directory.iterdir()))}.wav"
+            path.write_bytes(b"audio")
+            path = str(path)
+        index.add_chunk(f"key{i}", path, chunk)
+        start = spans[-1][1] if spans else 0
+        spans.append([start, start + 1000])
+    index.set_spans(spans)
+    return plan, index
+
+
+@pytest.fixture
+def first(tmp_path):
+    plan, index = render(make_turns(TEXTS), tmp_path)
+    assert len(plan.chunks) > 3
+    return index
+
+
+def reused(plan):
+    return [chunk.audio_path for chunk in plan.chunks if chunk.audio_path]
+
+
+def test_unchanged_transcript_reuses_every_chunk(first, tmp_path):
+    plan, _ = render(make_turns(TEXTS), tmp_path, first)
+    assert reused(plan) == [chunk.path for chunk in first.chunks]
+
+
+def test_one_line_edit_resynthesizes_its_chunk_only(first, tmp_path):
+    texts = list(TEXTS)
+    texts[5] = "This line was rewritten."
+    plan, _ = render(make_turns(texts), tmp_path, first)
+
+    edited = [chunk for chunk in first.chunks if any(line == 6 for _, _, line in chunk.turns)]
+    assert len(edited) == 1
+    assert reused(plan) == [chunk.path for chunk in first.chunks if chunk is not edited[0]]
+    new = [chunk for chunk in plan.chunks if chunk.audio_path is None]
+    assert any("rewritten" in text for chunk in new for _, text in chunk.turns)
+
+
+def test_insert_at_top_keeps_later_chunks(first, tmp_path):
+    turns = [Turn("voice-c", "A brand new opening line.", 1)]
+    turns += [Turn(turn.voice, turn.text, turn.line + 1) for turn in make_turns(TEXTS)]
+    plan, _ = render(turns, tmp_path, first)
+
+    assert plan.chunks[0].audio_path is None
+    assert reused(plan) == [chunk.path for chunk in first.chunks]
+    # Reused chunks carry the new line numbers
+    assert plan.chunks[-1].lines[-1] == 13
+
+
+def test_settings_change_reuses_nothing(first, tmp_path):
+    plan = plan_incremental(make_turns(TEXTS), MAX_BYTES, first, "settings-v2")
+    assert reused(plan) == []
+
+
+def test_missing_audio_is_resynthesized(first, tmp_path):
+    missing = first.chunks[1].path
+    (tmp_path / missing.rsplit("/", 1)[-1]).unlink()
+    plan, _ = render(make_turns(TEXTS), tmp_path, first)
+    assert missing not in reused(plan)
+    assert len(reused(plan)) == len(first.chunks) - 1
+    assert [text for chunk in plan.chunks for _, text in chunk.turns] == \
+        [text for chunk in first.chunks for _, text, _ in chunk.turns]
+
+
+def test_index_round_trips_with_offsets(first, tmp_path):
+    path = str(tmp_path / "episode.wav_index.json")
+    first.save(path)
+    loaded = EpisodeIndex.load(path)
+
+    assert [chunk.path for chunk in loaded.chunks] == [chunk.path for chunk in first.chunks]
+    offsets = loaded.turn_offsets()
+    assert [offset.line for offset in offsets] == list(range(1, 13))
+    assert offsets[0].start == 0
+    assert offsets[-1].end == 1000 * len(loaded.chunks)
+    assert loaded.line_start(1) == 0.0
+    assert [chapter["start"] for chapter in loaded.chapters()] == \
+        [round(i * 1000 / 24000, 3) for i in range(len(loaded.chunks))]
+
+
+def test_unreadable_index_loads_as_none(tmp_path):
+    path = tmp_path / "episode.wav_index.json"
+    assert EpisodeIndex.load(str(path)) is None
+    path.write_text("{not json", encoding="utf-8")
+    assert EpisodeIndex.load(str(path)) is None
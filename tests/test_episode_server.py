@@ -0,0 +1,181 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app_config import Config
+from audio_utils import parse_wav
+import episode_server
+import fakes
+
+JOB_ID = "a" * 32
+
+
+def pcm(wav):
+    info = parse_wav(wav)
+    return bytes(wav[info.data_offset:info.data_offset + info.data_length])
+
+
+def test_parse_range():
+    assert episode_server.parse_range(None, 100) is None
+    assert episode_server.parse_range("bytes=0-9", 100) == (0, 9)
+    assert episode_server.parse_range("bytes=90-", 100) == (90, 99)
+    assert episode_server.parse_range("bytes=90-500", 100) == (90, 99)
+    assert episode_server.parse_range("bytes=-10", 100) == (90, 99)
+    assert episode_server.parse_range("bytes=-500", 100) == (0, 99)
+    # Multiple ranges and other units fall back to the whole file
+    assert episode_server.parse_range("bytes=0-1,5-6", 100) is None
+    assert episode_server.parse_range("items=0-1", 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=20-10", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        episode_server.parse_range(header, 100)
+
+
+@pytest.fixture
+def job(tmp_path):
+    workdir = tmp_path / JOB_ID
+    workdir.mkdir()
+    (workdir / "episode.wav").write_bytes(bytes(range(256)) * 4)
+    (workdir / "transcript.txt").write_text("Alex: Hi", encoding="utf-8")
+    (workdir / "secret.sqlite3").write_bytes(b"private")
+    return SimpleNamespace(id=JOB_ID, workdir=str(workdir), output_path=str(workdir / "episode.wav"),
+                           chunks=[], finished=True)
+
+
+@pytest.fixture
+def server(job, monkeypatch):
+    jobs = {job.id: job}
+    monkeypatch.setattr(episode_server.EpisodeRequestHandler, "get_job", staticmethod(jobs.get))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), episode_server.EpisodeRequestHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fetch(url, method="GET", headers=None):
+    request = urllib.request.Request(url, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, b""
+
+
+def test_whole_file(server):
+    status, headers, body = fetch(f"{server}/episodes/{JOB_ID}/episode.wav")
+    assert status == 200
+    assert body == bytes(range(256)) * 4
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["Content-Type"].startswith("audio/")
+
+
+def test_byte_range(server):
+    status, headers, body = fetch(f"{server}/episodes/{JOB_ID}/episode.wav", headers={"Range": "bytes=10-19"})
+    assert status == 206
+    assert body == bytes(range(10, 20))
+    assert headers["Content-Range"] == "bytes 10-19/1024"
+
+
+def test_suffix_range(server):
+    status, headers, body = fetch(f"{server}/episodes/{JOB_ID}/episode.wav", headers={"Range": "bytes=-4"})
+    assert status == 206
+    assert body == bytes(range(252, 256))
+
+
+def test_unsatisfiable_range(server):
+    status, headers, _ = fetch(f"{server}/episodes/{JOB_ID}/episode.wav", headers={"Range": "bytes=5000-"})
+    assert status == 416
+    assert headers["Content-Range"] == "bytes */1024"
+
+
+def test_head_sends_no_body(server):
+    status, headers, body = fetch(f"{server}/episodes/{JOB_ID}/episode.wav", method="HEAD")
+    assert status == 200
+    assert headers["Content-Length"] == "1024"
+    assert body == b""
+
+
+def test_download_sets_attachment(server):
+    status, headers, _ = fetch(f"{server}/episodes/{JOB_ID}/transcript.txt?download=1")
+    assert status == 200
+    assert headers["Content-Disposition"] == 'attachment; filename="transcript.txt"'
+
+
+@pytest.mark.parametrize("path", [
+    f"/episodes/{JOB_ID}/secret.sqlite3",
+    f"/episodes/{JOB_ID}/../{JOB_ID}/episode.wav",
+    f"/episodes/{JOB_ID}/%2e%2e%2fjobs.sqlite3",
+    f"/episodes/{'b' * 32}/episode.wav",
+    "/episodes/episode.wav",
+    "/jobs.sqlite3",
+])
+def test_only_job_outputs_are_served(server, path):
+    assert fetch(server + path)[0] == 404
+
+
+def test_unfinished_job_files_are_not_served(server, job):
+    job.output_path = None
+    assert fetch(f"{server}/episodes/{JOB_ID}/episode.wav")[0] == 404
+    assert fetch(f"{server}/episodes/{JOB_ID}/transcript.txt")[0] == 404
+
+
+def test_live_stream_joins_parts_as_they_arrive(server, job, tmp_path, monkeypatch):
+    monkeypatch.setattr(episode_server, "LIVE_POLL_SECONDS", 0.01)
+    parts = []
+    for i, samples in enumerate((2400, 4800, 1200)):
+        path = tmp_path / f"part{i}.wav"
+        path.write_bytes(fakes.pcm_wav(samples, noise=True))
+        parts.append((i, str(path), "audio/wav"))
+
+    job.finished = False
+    job.chunks = parts[:1]
+
+    def finish():
+        job.chunks = parts
+        job.finished = True
+
+    timer = threading.Timer(0.2, finish)
+    timer.start()
+    status, headers, body = fetch(f"{server}/episodes/{JOB_ID}/live")
+    timer.join()
+
+    assert status == 200
+    assert headers["Content-Type"] == "audio/wav"
+    # One header, then every part's samples in order
+    assert pcm(body) == b"".join(pcm(fakes.pcm_wav(samples, noise=True)) for samples in (2400, 4800, 1200))
+
+
+def test_publisher_links_files_and_writes_a_manifest(tmp_path, job):
+    publisher = episode_server.EpisodePublisher(str(tmp_path / "static"))
+    publisher.publish(JOB_ID, job.output_path)
+    publisher.publish(JOB_ID, job.output_path)
+    publisher.write_manifest(JOB_ID, ["episode.wav"], False)
+
+    published = tmp_path / "static" / JOB_ID
+    assert sorted(path.name for path in published.iterdir()) == ["episode.wav", episode_server.MANIFEST_NAME]
+    assert (published / "episode.wav").stat().st_ino == (tmp_path / JOB_ID / "episode.wav").stat().st_ino
+    assert json.loads((published / episode_server.MANIFEST_NAME).read_text()) == \
+        {"parts": ["episode.wav"], "finished": False}
+
+    publisher.remove(JOB_ID)
+    assert not published.exists()
+
+
+def test_urls_fall_back_to_published_static_files(monkeypatch):
+    monkeypatch.setattr(Config, "EPISODE_PUBLIC_URL", "")
+    assert episode_server.episode_url(JOB_ID, "/x/episode 1.wav", download=True) == \
+        f"app/static/episodes/{JOB_ID}/episode%201.wav"
+    assert episode_server.static_url(JOB_ID) == f"app/static/episodes/{JOB_ID}/"
+
+    monkeypatch.setattr(Config, "EPISODE_PUBLIC_URL", "https://example.com/")
+    assert episode_server.episode_url(JOB_ID, "/x/episode.wav", download=True) == \
+        f"https://example.com/episodes/{JOB_ID}/episode.wav?download=1"
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+
+import pytest
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from tts_scheduler import TtsScheduler
+import episode_server
+import fakes
+import job_queue
+
+
+class Recorder:
+    def __init__(self):
+        self.episodes = []
+
+    def record_episode(self, *args):
+        self.episodes.append(args)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return job_queue.JobStore(str(tmp_path / "state" / "jobs.sqlite3"))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FILE_FORMAT", "wav")
+    return fakes.FakeTextToSpeechClient(latency=0.0, samples_per_char=10, noise=True)
+
+
+def make_queue(tmp_path, store, client, **options):
+    return job_queue.JobQueue(
+        store, str(tmp_path / "jobs"), 2,
+        lambda workdir: PodcastGenerator(client=client, scheduler=TtsScheduler(), output_directory=workdir),
+        **options)
+
+
+def wait(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def finish(queue, job_id):
+    """Wait until the job and its follow-up (publishing, pruning) are done"""
+    queue._executor.shutdown(wait=True)
+    return queue.get(job_id)
+
+
+def test_job_store_tracks_progress(store, tmp_path):
+    store.create("job", str(tmp_path))
+    job = store.get("job")
+    assert job.status == job_queue.QUEUED
+    assert not job.finished and job.progress == 0.0
+
+    store.mark_running("job", 4)
+    store.add_chunk("job", 1, "b.wav", "audio/wav")
+    store.add_chunk("job", 0, "a.wav", "audio/wav")
+    job = store.get("job")
+    assert job.status == job_queue.RUNNING
+    assert job.chunks_done == 2 and job.progress == 0.5
+    assert job.chunks == [(0, "a.wav", "audio/wav"), (1, "b.wav", "audio/wav")]
+
+    store.mark_done("job", "episode.wav")
+    job = store.get("job")
+    assert job.finished and job.output_path == "episode.wav"
+    assert store.get("missing") is None
+
+
+def test_job_store_expiry(store, tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_queue.time, "time", lambda: now[0])
+    for job_id in ("old", "middle", "new", "running"):
+        store.create(job_id, str(tmp_path / job_id))
+    for job_id in ("old", "middle", "new"):
+        now[0] += 10
+        store.mark_failed(job_id, "error")
+
+    now[0] += 5
+    assert store.expired(0, 0) == []
+    assert store.expired(0, 2) == [("old", str(tmp_path / "old"))]
+    assert sorted(job_id for job_id, _ in store.expired(10, 0)) == ["middle", "old"]
+    # Unfinished jobs are never expired
+    now[0] += 1000
+    assert "running" not in [job_id for job_id, _ in store.expired(1, 1)]
+
+    store.delete(["old"])
+    assert store.get("old") is None
+
+
+def test_orphaned_jobs_fail(store, tmp_path, monkeypatch):
+    store.create("job", str(tmp_path))
+    store.fail_orphaned()
+    assert store.get("job").status == job_queue.QUEUED
+
+    monkeypatch.setattr(job_queue, "_pid_alive", lambda pid: False)
+    store.fail_orphaned()
+    job = store.get("job")
+    assert job.status == job_queue.FAILED
+    assert "restart" in job.error
+
+
+def test_job_renders_and_publishes_its_parts(store, client, tmp_path):
+    publisher = episode_server.EpisodePublisher(str(tmp_path / "static"))
+    analytics_store = Recorder()
+    queue = make_queue(tmp_path, store, client, publisher=publisher, analytics_store=analytics_store)
+
+    job = finish(queue, queue.submit(fakes.make_transcript(40)))
+    assert job.status == job_queue.DONE, job.error
+    assert job.chunks_done == job.chunks_total == len(job.chunks) > 1
+    assert os.path.isfile(job.output_path)
+    assert job.workdir.startswith(str(tmp_path / "jobs"))
+
+    published = tmp_path / "static" / job.id
+    manifest = json.loads((published / episode_server.MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest == {"parts": [os.path.basename(path) for _, path, _ in job.chunks], "finished": True}
+    assert (published / os.path.basename(job.output_path)).is_file()
+    assert (published / "transcript.txt").is_file()
+    assert len(analytics_store.episodes) == 1
+
+
+def test_failed_jobs_record_the_error(store, client, tmp_path):
+    publisher = episode_server.EpisodePublisher(str(tmp_path / "static"))
+    queue = make_queue(tmp_path, store, client, publisher=publisher)
+    job = finish(queue, queue.submit("(no spoken lines)"))
+    assert job.status == job_queue.FAILED
+    assert "No audio content" in job.error
+    manifest = json.loads((tmp_path / "static" / job.id / episode_server.MANIFEST_NAME).read_text())
+    assert manifest == {"parts": [], "finished": True}
+
+
+def test_resubmitted_episode_reuses_unchanged_chunks(store, client, tmp_path):
+    queue = make_queue(tmp_path, store, client)
+    transcript = fakes.make_transcript(40)
+    first = wait(queue, queue.submit(transcript))
+    calls = client.calls
+
+    edited = transcript.rsplit("\n", 2)[0] + f"\n{Config.SPEAKER_1_NAME}: A new ending."
+    second = wait(queue, queue.submit(edited, previous_job_id=first.id))
+    assert second.status == job_queue.DONE, second.error
+    assert 0 < client.calls - calls < first.chunks_total
+
+
+def test_finished_jobs_past_retention_are_pruned(store, client, tmp_path):
+    publisher = episode_server.EpisodePublisher(str(tmp_path / "static"))
+    queue = make_queue(tmp_path, store, client, publisher=publisher, retention_count=1)
+    first = wait(queue, queue.submit(fakes.make_transcript(4)))
+    second = finish(queue, queue.submit(fakes.make_transcript(4, seed=1)))
+
+    # Pruned once the second job finished
+    assert queue.get(first.id) is None
+    assert not os.path.exists(first.workdir)
+    assert not (tmp_path / "static" / first.id).exists()
+    assert queue.get(second.id) is not None
+    assert os.path.isdir(second.workdir)
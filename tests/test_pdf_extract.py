@@ -0,0 +1,81 @@
+import pytest
+
+from content_cache import ContentCache
+from pdf_extract import PAGES_PER_TASK, extract_pdf_text, parse_page_range
+import fakes
+import pdf_extract
+
+PAGES = [f"Page {i} text" for i in range(1, 41)]
+
+
+@pytest.fixture(scope="module")
+def pdf():
+    return fakes.make_pdf(PAGES)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ContentCache(str(tmp_path / "content.sqlite3"), "pdf", 1024 * 1024, ttl_seconds=3600)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", None), ("  ", None), (None, None),
+    ("5", (4, 5)), ("3-10", (2, 10)), (" 7- ", (6, None)), ("-4", (0, 4)), ("2-2", (1, 2)),
+])
+def test_parse_page_range(text, expected):
+    assert parse_page_range(text) == expected
+
+
+@pytest.mark.parametrize("text", ["0", "5-3", "0-4", "abc", "1-x"])
+def test_parse_page_range_rejects_bad_input(text):
+    with pytest.raises(ValueError):
+        parse_page_range(text)
+
+
+def test_extracts_every_page_in_order(pdf):
+    assert extract_pdf_text(pdf).split("\n") == PAGES
+
+
+def test_page_range_and_page_cap(pdf):
+    assert extract_pdf_text(pdf, (2, 5)).split("\n") == PAGES[2:5]
+    # Open-ended and past-the-end ranges stop at the last page
+    assert extract_pdf_text(pdf, (37, None)).split("\n") == PAGES[37:]
+    assert extract_pdf_text(pdf, (38, 100)).split("\n") == PAGES[38:]
+    # max_pages counts from the start of the range
+    assert extract_pdf_text(pdf, (10, None), max_pages=3).split("\n") == PAGES[10:13]
+    assert extract_pdf_text(pdf, (10, 12), max_pages=5).split("\n") == PAGES[10:12]
+
+
+def test_character_cap_truncates(pdf):
+    text = extract_pdf_text(pdf, max_chars=30)
+    assert len(text) <= 30
+    assert text.startswith(PAGES[0] + "\n" + PAGES[1])
+    assert "Page 4" not in text
+
+
+def test_worker_processes_return_pages_in_order(pdf):
+    assert len(PAGES) > 2 * PAGES_PER_TASK
+    try:
+        assert extract_pdf_text(pdf, workers=3).split("\n") == PAGES
+        assert extract_pdf_text(pdf, (5, None), max_pages=PAGES_PER_TASK + 2, workers=2).split("\n") == \
+            PAGES[5:7 + PAGES_PER_TASK]
+    finally:
+        if pdf_extract._pool is not None:
+            pdf_extract._pool.shutdown(wait=True)
+            pdf_extract._pool = None
+
+
+def test_results_are_cached_by_file_hash_and_options(pdf, cache, monkeypatch):
+    first = extract_pdf_text(pdf, (0, 2), cache=cache)
+
+    def fail(*args):
+        raise AssertionError("extracted again")
+
+    monkeypatch.setattr(pdf_extract, "iter_page_text", fail)
+    # The same bytes with the same options come from the cache
+    assert extract_pdf_text(bytes(pdf), (0, 2), cache=cache) == first
+    # Other options, or another document, are extracted again
+    with pytest.raises(AssertionError, match="extracted again"):
+        extract_pdf_text(pdf, (0, 3), cache=cache)
+    with pytest.raises(AssertionError, match="extracted again"):
+        extract_pdf_text(fakes.make_pdf(PAGES[:2]), (0, 2), cache=cache)
@@ -0,0 +1,72 @@
+import pytest
+
+from app_config import Config
+from app_generic import PodcastGenerator
+from episode_index import EpisodeIndex
+from transcript_parser import parse_transcript
+from tts_scheduler import TtsScheduler
+import fakes
+import pipeline
+
+
+class CountingModel(fakes.FakeGenerativeModel):
+    """Records how many streamed pieces the caller has pulled so far"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pieces_sent = 0
+        self.total_pieces = -(-len(self.transcript) // self.piece_chars)
+
+    def _pieces(self):
+        for piece in super()._pieces():
+            self.pieces_sent += 1
+            yield piece
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FILE_FORMAT", "wav")
+    client = fakes.FakeTextToSpeechClient(latency=0.0, samples_per_char=10)
+    return PodcastGenerator(client=client, output_directory=str(tmp_path), scheduler=TtsScheduler())
+
+
+def test_first_segment_arrives_while_the_model_is_still_writing(generator, tmp_path):
+    # A default-sized reply at the default request budget
+    model = CountingModel(fakes.make_transcript(40), piece_chars=40, piece_delay=0.0)
+    transcript_path = str(tmp_path / "transcript.txt")
+    first_call = []
+    synthesize = generator.client.synthesize_speech
+
+    def record_first_call(**request):
+        first_call.append(model.pieces_sent)
+        return synthesize(**request)
+
+    generator.client.synthesize_speech = record_first_call
+
+    segments = pipeline.stream_source_to_podcast(model, "Some source material.", generator, "episode",
+                                                 transcript_path=transcript_path)
+    first = next(segments)
+    assert first.index == 0
+    assert first.count is None
+    # The first request is sent after a few turns, not a full budget's worth,
+    # and its audio is out while most of the reply is still to come
+    assert first_call[0] < model.total_pieces * 0.1
+    assert model.pieces_sent < model.total_pieces * 0.3
+
+    rest = list(segments)
+    assert [segment.index for segment in rest] == list(range(1, len(rest) + 1))
+    assert model.pieces_sent == model.total_pieces
+
+
+def test_transcript_is_written_and_spoken_in_order(generator, tmp_path):
+    transcript_path = tmp_path / "transcript.txt"
+    model = fakes.FakeGenerativeModel(fakes.make_transcript(8))
+    segments = list(pipeline.stream_source_to_podcast(model, "Source.", generator, "episode",
+                                                      transcript_path=str(transcript_path)))
+    assert len(segments) > 1
+
+    written = parse_transcript(transcript_path.read_text(encoding="utf-8"))
+    index = EpisodeIndex.load(generator.get_index_path("episode"))
+    spoken = [text for chunk in index.chunks for _, text, _ in chunk.turns]
+    assert spoken == [turn.text for turn in written.turns]
@@ -0,0 +1,99 @@
+import pytest
+
+from app_config import Config
+import metrics
+from transcript_parser import (NO_SPEAKER, STAGE_DIRECTION, UNKNOWN_SPEAKER, Transcript, TranscriptParser,
+                               parse_transcript, speaker_voices)
+
+VOICES = {"alex": "voice-a", "emma": "voice-e"}
+
+TRANSCRIPT = """Alex: Welcome to the show.
+
+(music fades in)
+Emma:   Thanks, glad to be here.
+[laughs]
+Just some narration without a speaker.
+Sam: I was not invited.
+EMMA: Speaker names are matched case-insensitively.
+Alex:missing space
+"""
+
+
+@pytest.fixture
+def transcript():
+    return TranscriptParser(VOICES).parse(TRANSCRIPT)
+
+
+def test_turns_keep_voice_text_and_line(transcript):
+    assert [(turn.voice, turn.text, turn.line) for turn in transcript.turns] == [
+        ("voice-a", "Welcome to the show.", 1),
+        ("voice-e", "Thanks, glad to be here.", 4),
+        ("voice-e", "Speaker names are matched case-insensitively.", 8),
+    ]
+    # Turns unpack as the (voice, text) pairs chunk planning takes
+    assert [tuple(turn) for turn in transcript.turns][0] == ("voice-a", "Welcome to the show.")
+    assert transcript.characters == sum(len(turn.text) for turn in transcript.turns)
+
+
+def test_skipped_lines_are_reported_with_reasons(transcript):
+    assert [(skipped.line, skipped.reason) for skipped in transcript.skipped] == [
+        (3, STAGE_DIRECTION),
+        (5, STAGE_DIRECTION),
+        (6, NO_SPEAKER),
+        (7, UNKNOWN_SPEAKER),
+        (9, NO_SPEAKER),
+    ]
+    assert transcript.skipped_counts() == {STAGE_DIRECTION: 2, NO_SPEAKER: 2, UNKNOWN_SPEAKER: 1}
+    assert transcript.unknown_speakers() == {"Sam": 1}
+    assert transcript.line_count == 9
+
+
+def test_summary(transcript):
+    assert transcript.summary() == ("3 turns from 9 lines; 5 skipped (2 no speaker, 2 stage direction, "
+                                    "1 unknown speaker); unknown speakers: Sam")
+    assert TranscriptParser(VOICES).parse("Alex: Hi").summary() == "1 turns from 1 lines"
+
+
+def test_skipped_lines_are_counted_in_metrics():
+    before = metrics.TRANSCRIPT_LINES_SKIPPED.value(reason=UNKNOWN_SPEAKER)
+    TranscriptParser(VOICES).parse(TRANSCRIPT)
+    assert metrics.TRANSCRIPT_LINES_SKIPPED.value(reason=UNKNOWN_SPEAKER) == before + 1
+
+
+def test_iter_turns_yields_as_lines_arrive():
+    received = []
+
+    def lines():
+        for line in TRANSCRIPT.splitlines():
+            received.append(line)
+            yield line
+
+    turns = TranscriptParser(VOICES).iter_turns(lines())
+    first = next(turns)
+    assert first.line == 1
+    assert len(received) == 1
+    assert [turn.line for turn in turns] == [4, 8]
+
+
+def test_iter_turns_fills_a_transcript_when_closed_early():
+    transcript = Transcript()
+    turns = TranscriptParser(VOICES).iter_turns(TRANSCRIPT.splitlines(), transcript)
+    next(turns)
+    next(turns)
+    turns.close()
+    assert len(transcript.turns) == 2
+    assert [skipped.line for skipped in transcript.skipped] == [3]
+    assert transcript.line_count == 4
+
+
+def test_speaker_voices_adds_extra_speakers(monkeypatch):
+    monkeypatch.setattr(Config, "SPEAKER_1_NAME", "Alex")
+    monkeypatch.setattr(Config, "SPEAKER_2_NAME", "Emma")
+    monkeypatch.setattr(Config, "SPEAKER_VOICES", " Sam = voice-s ,broken,=voice-x,Lee=, Kim=voice-k")
+    voices = speaker_voices()
+    assert voices == {"alex": Config.SPEAKER_1_VOICE, "emma": Config.SPEAKER_2_VOICE,
+                      "sam": "voice-s", "kim": "voice-k"}
+
+    transcript = parse_transcript("Sam: Now I am.\nKim: Me too.\nLee: Not me.")
+    assert [turn.voice for turn in transcript.turns] == ["voice-s", "voice-k"]
+    assert transcript.unknown_speakers() == {"Lee": 1}
@@ -0,0 +1,77 @@
+import os
+
+from tts_cache import AudioCache, make_cache_key
+
+
+def age(cache, key, mtime):
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def on_disk(directory):
+    return sorted(name[:-len(AudioCache.SUFFIX)] for name in os.listdir(directory)
+                  if name.endswith(AudioCache.SUFFIX))
+
+
+def test_cache_key_depends_on_turns_and_voice():
+    turns = [("Host", "Hello"), ("Guest", "Hi")]
+    key = make_cache_key(turns, {"voice": "a"})
+    assert key == make_cache_key(list(turns), {"voice": "a"})
+    assert key != make_cache_key(turns, {"voice": "b"})
+    assert key != make_cache_key(turns[::-1], {"voice": "a"})
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    assert cache.get("a") is None
+    cache.put("a", b"x" * 10)
+    assert cache.get("a") == b"x" * 10
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 10, "max_bytes": 1000}
+
+
+def test_entries_larger_than_the_bound_are_not_stored(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"x" * 11)
+    assert cache.get("a") is None
+    assert on_disk(tmp_path) == []
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=100)
+    for mtime, key in enumerate("abc", start=1):
+        cache.put(key, b"x" * 30)
+        age(cache, key, mtime)
+    # Reading "a" makes "b" the oldest
+    assert cache.get("a") is not None
+    cache.put("d", b"x" * 30)
+    assert on_disk(tmp_path) == ["a", "c", "d"]
+    assert cache.stats()["bytes"] == 90
+
+
+def test_entries_and_order_survive_a_restart(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=100)
+    cache.put("a", b"x" * 30)
+    cache.put("b", b"x" * 30)
+    age(cache, "a", 2)
+    age(cache, "b", 1)
+
+    reopened = AudioCache(str(tmp_path), max_bytes=100)
+    assert reopened.stats()["bytes"] == 60
+    reopened.put("c", b"x" * 50)
+    assert on_disk(tmp_path) == ["a", "c"]
+
+
+def test_bound_holds_across_processes_sharing_the_directory(tmp_path):
+    # Two instances stand in for two worker processes
+    first = AudioCache(str(tmp_path), max_bytes=100)
+    second = AudioCache(str(tmp_path), max_bytes=100)
+    for mtime, key in enumerate("abc", start=1):
+        first.put(key, b"x" * 30)
+        age(first, key, mtime)
+    # The second one started out empty, but counts what the first wrote
+    second.put("d", b"x" * 30)
+    assert on_disk(tmp_path) == ["b", "c", "d"]
+    assert second.stats()["bytes"] == 90
+
+    # The first instance's stale view corrects itself on a miss
+    assert first.get("a") is None
+    assert first.stats()["misses"] == 1
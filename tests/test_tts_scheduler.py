@@ -0,0 +1,137 @@
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from app_config import Config
+import resources
+import tts_scheduler
+from tts_scheduler import SynthesisError, TokenBucket, TtsScheduler
+
+
+class FakeClock:
+    """Stands in for the time module: sleep advances monotonic instantly"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tts_scheduler, "time", clock)
+    return clock
+
+
+def test_burst_up_to_capacity_is_free(clock):
+    bucket = TokenBucket(60, capacity=5)
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert clock.sleeps == []
+
+
+def test_empty_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60, capacity=2)
+    bucket.acquire(2)
+    # One token per second
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire(2) == pytest.approx(2.0)
+    assert clock.now == pytest.approx(1003.0)
+
+
+def test_idle_time_refills_up_to_capacity(clock):
+    bucket = TokenBucket(60, capacity=3)
+    bucket.acquire(3)
+    clock.now += 3600
+    assert bucket.tokens == 0
+    for _ in range(3):
+        assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_oversize_request_waits_for_full_bucket_then_owes(clock):
+    bucket = TokenBucket(60, capacity=10)
+    bucket.acquire(5)
+    # Larger than the bucket: let through once it is full, leaving a debt
+    assert bucket.acquire(25) == pytest.approx(5.0)
+    assert bucket.tokens == pytest.approx(-15.0)
+    # The debt is paid off before the next token is granted
+    assert bucket.acquire() == pytest.approx(16.0)
+
+
+def test_default_capacity_is_ten_seconds_of_quota(clock):
+    assert TokenBucket(600).capacity == 100
+    assert TokenBucket(3).capacity == 1.0
+
+
+class FlakyClient:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def synthesize_speech(self, **request):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "audio"
+
+
+def test_retryable_errors_are_retried(clock):
+    scheduler = TtsScheduler(max_retries=3, base_delay=1.0)
+    client = FlakyClient([api_exceptions.ServiceUnavailable("down"), api_exceptions.InternalServerError("oops")])
+    assert scheduler.synthesize(client, 10) == "audio"
+    assert client.calls == 3
+    assert scheduler.retries == 2
+
+
+def test_persistent_errors_give_up(clock):
+    scheduler = TtsScheduler(max_retries=2)
+    client = FlakyClient([api_exceptions.ServiceUnavailable("down")] * 5)
+    with pytest.raises(SynthesisError, match="after 3 attempts"):
+        scheduler.synthesize(client, 10)
+    assert client.calls == 3
+
+
+def test_other_errors_fail_immediately(clock):
+    scheduler = TtsScheduler(max_retries=5)
+    client = FlakyClient([api_exceptions.InvalidArgument("bad ssml")])
+    with pytest.raises(SynthesisError, match="bad ssml"):
+        scheduler.synthesize(client, 10)
+    assert client.calls == 1
+
+
+def test_quota_error_pauses_every_caller(clock, monkeypatch):
+    monkeypatch.setattr(tts_scheduler.random, "uniform", lambda low, high: high)
+    scheduler = TtsScheduler(max_retries=1, base_delay=4.0)
+    scheduler.synthesize(FlakyClient([api_exceptions.ResourceExhausted("quota")]), 10)
+    assert scheduler._paused_until == pytest.approx(1004.0)
+    # Another caller arriving a second into that backoff waits out the rest
+    clock.now = 1001.0
+    scheduler.synthesize(FlakyClient([]), 10)
+    assert clock.now == pytest.approx(1004.0)
+    assert scheduler.throttled_seconds == pytest.approx(3.0)
+
+
+def test_character_quota_is_enforced(clock):
+    scheduler = TtsScheduler(characters_per_minute=600, max_retries=0)
+    client = FlakyClient([])
+    for _ in range(3):
+        scheduler.synthesize(client, 50)
+    # 100 characters of burst, then ten characters a second
+    assert scheduler.throttled_seconds == pytest.approx(5.0)
+
+
+def test_worker_processes_share_the_project_quota(monkeypatch):
+    monkeypatch.setattr(Config, "TTS_REQUESTS_PER_MINUTE", 500)
+    monkeypatch.setattr(Config, "TTS_CHARACTERS_PER_MINUTE", 0)
+    resources.share_tts_quota(4)
+    assert Config.TTS_REQUESTS_PER_MINUTE == 125
+    # 0 stays "no limit"
+    assert Config.TTS_CHARACTERS_PER_MINUTE == 0
+    resources.share_tts_quota(1000)
+    assert Config.TTS_REQUESTS_PER_MINUTE == 1
@@ -0,0 +1,168 @@
+from app_config import Config
+import metrics
+
+STAGE_DIRECTION = "stage_direction"
+UNKNOWN_SPEAKER = "unknown_speaker"
+NO_SPEAKER = "no_speaker"
+
+_STAGE_DIRECTION_PREFIXES = ("(", "[")
+
+
+def speaker_voices():
+    """{lowercased speaker name: TTS voice} for every configured speaker.
+
+    Speakers 1 and 2 come from SPEAKER_{1,2}_NAME/VOICE; SPEAKER_VOICES adds
+    more as "Name=Voice,Name=Voice".
+    """
+    voices = {
+        Config.SPEAKER_1_NAME.lower(): Config.SPEAKER_1_VOICE,
+        Config.SPEAKER_2_NAME.lower(): Config.SPEAKER_2_VOICE,
+    }
+    for entry in Config.SPEAKER_VOICES.split(","):
+        name, separator, voice = entry.partition("=")
+        if separator and name.strip() and voice.strip():
+            voices[name.strip().lower()] = voice.strip()
+    return voices
+
+
+class Turn:
+    """One spoken line: the voice that reads it, its text and its 1-based
+    line number in the transcript"""
+
+    __slots__ = ("voice", "text", "line")
+
+    def __init__(self, voice, text, line):
+        self.voice = voice
+        self.text = text
+        self.line = line
+
+    def __iter__(self):
+        # Unpacks as a (voice, text) pair, the form chunk_planner takes
+        yield self.voice
+        yield self.text
+
+    def __repr__(self):
+        return f"Turn({self.voice!r}, {self.text!r}, line={self.line})"
+
+
+class SkippedLine:
+    """A non-blank line that is left out of the audio, and why"""
+
+    __slots__ = ("line", "reason", "text")
+
+    def __init__(self, line, reason, text):
+        self.line = line
+        self.reason = reason
+        self.text = text
+
+
+class Transcript:
+    """Parsed transcript: its turns in order plus the lines that were skipped.
+
+    Built once per transcript and shared by chunk planning, the audio cache,
+    the episode index and the UI's report.
+    """
+
+    __slots__ = ("turns", "skipped", "line_count")
+
+    def __init__(self):
+        self.turns = []
+        self.skipped = []
+        self.line_count = 0
+
+    @property
+    def characters(self):
+        return sum(len(turn.text) for turn in self.turns)
+
+    def unknown_speakers(self):
+        """{speaker name as written: lines} for lines whose speaker has no voice"""
+        speakers = {}
+        for skipped in self.skipped:
+            if skipped.reason == UNKNOWN_SPEAKER:
+                name = skipped.text.partition(": ")[0].strip()
+                speakers[name] = speakers.get(name, 0) + 1
+        return speakers
+
+    def skipped_counts(self):
+        counts = {}
+        for skipped in self.skipped:
+            counts[skipped.reason] = counts.get(skipped.reason, 0) + 1
+        return counts
+
+    def summary(self):
+        text = f"{len(self.turns)} turns from {self.line_count} lines"
+        if self.skipped:
+            reasons = ", ".join(f"{count} {reason.replace('_', ' ')}"
+                                for reason, count in sorted(self.skipped_counts().items()))
+            text += f"; {len(self.skipped)} skipped ({reasons})"
+        unknown = self.unknown_speakers()
+        if unknown:
+            text += "; unknown speakers: " + ", ".join(sorted(unknown))
+        return text
+
+
+class TranscriptParser:
+    """Turn "Speaker: text" lines into Turns in a single pass.
+
+    Lines starting with "(" or "[" are stage directions; lines without a
+    "Speaker: " prefix or whose speaker has no voice are skipped and
+    reported. The speaker lookup is one dict access per line.
+    """
+
+    def __init__(self, voices=None):
+        self.voices = voices if voices is not None else speaker_voices()
+
+    def parse(self, text):
+        """Parse a whole transcript string"""
+        transcript = Transcript()
+        for _ in self.iter_turns(text.splitlines(), transcript):
+            pass
+        return transcript
+
+    def parse_file(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.parse(f.read())
+
+    def iter_turns(self, lines, transcript=None):
+        """Lazily parse lines that may still be arriving (e.g. streamed from
+        the LLM), yielding each Turn. Turns and skipped lines are also
+        collected into transcript when one is given.
+        """
+        voices = self.voices
+        turns = transcript.turns if transcript is not None else None
+        skipped = []
+        number = 0
+        try:
+            for number, line in enumerate(lines, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(_STAGE_DIRECTION_PREFIXES):
+                    skipped.append(SkippedLine(number, STAGE_DIRECTION, line))
+                    continue
+                speaker, separator, text = line.partition(": ")
+                if not separator:
+                    skipped.append(SkippedLine(number, NO_SPEAKER, line))
+                    continue
+                voice = voices.get(speaker.lower())
+                if voice is None:
+                    skipped.append(SkippedLine(number, UNKNOWN_SPEAKER, line))
+                    continue
+                turn = Turn(voice, text.strip(), number)
+                if turns is not None:
+                    turns.append(turn)
+                yield turn
+        finally:
+            counts = {}
+            for skipped_line in skipped:
+                counts[skipped_line.reason] = counts.get(skipped_line.reason, 0) + 1
+            for reason, count in counts.items():
+                metrics.TRANSCRIPT_LINES_SKIPPED.inc(count, reason=reason)
+            if transcript is not None:
+                transcript.skipped.extend(skipped)
+                transcript.line_count = number
+
+
+def parse_transcript(text):
+    """Parse a transcript with the configured speakers"""
+    return TranscriptParser().parse(text)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import metrics
+
+
+def make_cache_key(turns, voice_params):
+    """Hash the (speaker, text) turns of a chunk together with the voice settings"""
+    payload = {
+        "turns": [[speaker, text] for speaker, text in turns],
+        "voice": voice_params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class AudioCache:
+    """Content-addressed on-disk cache for synthesized audio.
+
+    Entries are evicted least-recently-used first once the total size exceeds
+    max_bytes. Access times are kept in file mtimes so the LRU order survives
+    restarts and is shared by every process using the same directory. The
+    directory is re-measured on every put, so entries written by other
+    processes count towards max_bytes as well.
+    """
+
+    SUFFIX = ".audio"
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index(self._scan())
+
+    def _scan(self):
+        """(mtime, key, size) of every entry on disk"""
+        entries = []
+        with os.scandir(self.directory) as names:
+            for entry in names:
+                if not entry.name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.name[:-len(self.SUFFIX)], stat.st_size))
+        return entries
+
+    def _load_index(self, entries):
+        self._entries.clear()
+        self._total_bytes = 0
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """Return cached audio for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            metrics.CACHE_REQUESTS.inc(cache="tts", result="miss")
+            with self._lock:
+                self.misses += 1
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        metrics.CACHE_REQUESTS.inc(cache="tts", result="hit")
+        with self._lock:
+            self.hits += 1
+            if key not in self._entries:
+                self._total_bytes += len(data)
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        """Store audio under key, evicting old entries to stay under quota"""
+        if len(data) > self.max_bytes:
+            return
+
+        # Write to a temp file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # Other processes add and evict entries too: go by what is on disk
+        entries = self._scan()
+        with self._lock:
+            self._load_index(entries)
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+
+import metrics
+
+_error_types = None
+
+
+def error_types():
+    """(retryable errors, quota errors) as tuples of exception classes.
+
+    Retryable errors are quota exhaustion and transient server or network
+    failures; anything else (bad input, auth) fails immediately. Built on
+    first use so importing this module doesn't load google.api_core.
+    """
+    global _error_types
+    if _error_types is None:
+        from google.api_core import exceptions as api_exceptions
+
+        _error_types = (
+            (
+                api_exceptions.ResourceExhausted,
+                api_exceptions.TooManyRequests,
+                api_exceptions.ServiceUnavailable,
+                api_exceptions.DeadlineExceeded,
+                api_exceptions.GatewayTimeout,
+                api_exceptions.BadGateway,
+                api_exceptions.InternalServerError,
+                api_exceptions.Aborted,
+            ),
+            (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests),
+        )
+    return _error_types
+
+
+class SynthesisError(Exception):
+    """A chunk could not be synthesized, even after retries"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    capacity bounds the burst; a request larger than the capacity is let
+    through once the bucket is full and leaves it in debt.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        # Default burst: ten seconds' worth of quota
+        self.capacity = capacity or max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Block until amount tokens are available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class TtsScheduler:
+    """Admit synthesize_speech calls at the project's quota and retry the
+    retryable failures with exponential backoff and full jitter.
+
+    One scheduler is shared by every generator in the process (see
+    resources.get_tts_scheduler) so the quota is enforced across threads.
+    A quota error pauses all callers for the backoff delay, not just the one
+    that hit it.
+    """
+
+    def __init__(self, requests_per_minute=0, characters_per_minute=0, max_retries=5,
+                 base_delay=1.0, max_delay=32.0):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.character_bucket = TokenBucket(characters_per_minute) if characters_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _acquire(self, characters):
+        waited = 0.0
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            waited += pause
+        if self.request_bucket is not None:
+            waited += self.request_bucket.acquire()
+        if self.character_bucket is not None:
+            waited += self.character_bucket.acquire(characters)
+        if waited:
+            metrics.TTS_THROTTLED_SECONDS.inc(waited)
+            with self._lock:
+                self.throttled_seconds += waited
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        metrics.TTS_RETRIES.inc(error=type(error).__name__)
+        with self._lock:
+            self.retries += 1
+            if isinstance(error, error_types()[1]):
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        time.sleep(delay)
+
+    def synthesize(self, client, characters, **request):
+        """Call client.synthesize_speech(**request) within the quota.
+
+        Raises SynthesisError once a retryable error persists past
+        max_retries, or immediately for any other error.
+        """
+        retryable_errors, _ = error_types()
+        for attempt in range(self.max_retries + 1):
+            self._acquire(characters)
+            try:
+                with metrics.TTS_IN_FLIGHT.track():
+                    return client.synthesize_speech(**request)
+            except retryable_errors as e:
+                if attempt == self.max_retries:
+                    raise SynthesisError(f"Giving up after {attempt + 1} attempts: {e}") from e
+                print(f"Retrying TTS request after error: {e}")
+                self._backoff(attempt, e)
+            except Exception as e:
+                raise SynthesisError(str(e)) from e
+
+    def stats(self):
+        return {"retries": self.retries, "throttled_seconds": self.throttled_seconds}